@@ -0,0 +1 @@
+"""Initialization of package resources."""
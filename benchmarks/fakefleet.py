@@ -0,0 +1,272 @@
+"""Synthetic EC2/SSM backend of a game server fleet for benchmarks.
+
+A FakeFleet answers the SDK calls of the handlers from botocore's own
+'before-call' event (like botocore.stub.Stubber), so clients still build,
+validate and serialize every request but nothing leaves the process.
+Snapshot data is generated page by page, so fleets with 100k snapshots
+cost no more memory than the page being listed.
+"""
+
+import collections
+import botocore.awsrequest
+
+ADDRESS = '127.0.0.1'
+PASSWORD = 'foobar'
+DATA_DEVICE = '/dev/sdm'
+ROOT_DEVICE = '/dev/xvda'
+PAGE_SIZE = 1000
+
+
+class FakeFleet:
+    """Synthetic fleet of game servers (every fourth one stopped).
+
+    Parameters
+    ----------
+    servers: int, required
+        Number of game server instances
+
+    snapshots: int, optional
+        Number of snapshots (spread evenly across the servers)
+
+    address: str, optional
+        Public IP address of every running server (e.g. a fake RCON server)
+    """
+
+    def __init__(self, servers, snapshots=0, address=ADDRESS):
+        """Generate the instances of the fleet."""
+        self.servers = servers
+        self.snapshots = snapshots
+        self.address = address
+        self.calls = collections.Counter()
+        self.created = 0
+        self.instances = [self.make_instance(i) for i in range(servers)]
+        self._by_id = {
+            instance['InstanceId']: instance for instance in self.instances
+        }
+
+    def attach(self, client):
+        """Answer the SDK calls of a client (returns the client)."""
+        service = client.meta.service_model.service_id.hyphenize()
+        client.meta.events.register(
+            'before-parameter-build.' + service, self._keep_params)
+        client.meta.events.register('before-call.' + service, self._respond)
+        return client
+
+    def reset_calls(self):
+        """Forget the SDK calls counted so far."""
+        self.calls.clear()
+
+    @staticmethod
+    def _keep_params(params, context, **kwargs):
+        """Keep the API parameters of a call for its response."""
+        context['fakefleet_params'] = params
+
+    def _respond(self, model, context, **kwargs):
+        """Return the synthetic response of an SDK call."""
+        self.calls[model.name] += 1
+        method = getattr(self, 'do_' + botocore.xform_name(model.name))
+        parsed = method(**context.get('fakefleet_params', {}))
+        parsed.setdefault('ResponseMetadata', {'HTTPStatusCode': 200})
+        return botocore.awsrequest.AWSResponse(None, 200, {}, None), parsed
+
+    # =========================================================================
+    # synthetic resources
+    # =========================================================================
+
+    def make_instance(self, index):
+        """Return the EC2 data of the instance of a server."""
+        state = 'stopped' if index % 4 == 3 else 'running'
+        instance = {
+            'InstanceId': 'i-{:017x}'.format(index),
+            'State': {'Name': state},
+            'RootDeviceName': ROOT_DEVICE,
+            'BlockDeviceMappings': [
+                {
+                    'DeviceName': ROOT_DEVICE,
+                    'Ebs': {'VolumeId': 'vol-{:017x}'.format(2 * index)}
+                },
+                {
+                    'DeviceName': DATA_DEVICE,
+                    'Ebs': {'VolumeId': 'vol-{:017x}'.format(2 * index + 1)}
+                }
+            ],
+            'Tags': [
+                {
+                    'Key': 'Name',
+                    'Value': 'mcservers-main-hosts/world{}/instance'.format(
+                        index)
+                },
+                {'Key': 'Application', 'Value': 'mcservers'},
+                {'Key': 'Environment', 'Value': 'main'}
+            ]
+        }
+        if state == 'running':
+            instance['PublicIpAddress'] = self.address
+        return instance
+
+    def make_snapshot(self, index):
+        """Return the EBS data of a snapshot."""
+        server = index % max(self.servers, 1)
+        timestamp = '2022-03-{:02d}T06:00:00.{:06d}'.format(
+            index // max(self.servers, 1) % 28 + 1, index % 1000000)
+        return {
+            'SnapshotId': 'snap-{:017x}'.format(index),
+            'VolumeId': 'vol-{:017x}'.format(2 * server + 1),
+            'State': 'completed',
+            'Tags': [
+                {
+                    'Key': 'Name',
+                    'Value': 'mcservers-main-world{}-{}.0'.format(
+                        server, 1646000000 + index)
+                },
+                {'Key': 'Application', 'Value': 'mcservers'},
+                {'Key': 'Event', 'Value': 'nightly'},
+                {'Key': 'Server', 'Value': 'world{}'.format(server)},
+                {'Key': 'Timestamp', 'Value': timestamp}
+            ]
+        }
+
+    # =========================================================================
+    # EC2 and SSM operations
+    # =========================================================================
+
+    def do_describe_instances(self, Filters=(), InstanceIds=(),
+                              MaxResults=None, NextToken=None, **kwargs):
+        """Answer describe_instances (one reservation per instance)."""
+        instances = [
+            instance for instance in self.instances
+            if (not InstanceIds or instance['InstanceId'] in InstanceIds)
+            and all(match(instance, item) for item in Filters)
+        ]
+        page, token = paginate(instances, MaxResults, NextToken)
+        response = {
+            'Reservations': [{'Instances': [instance]} for instance in page]
+        }
+        if token is not None:
+            response['NextToken'] = token
+        return response
+
+    def do_describe_instance_status(self, InstanceIds=(), **kwargs):
+        """Answer describe_instance_status."""
+        return {'InstanceStatuses': [
+            {
+                'InstanceId': instance_id,
+                'InstanceState': self._by_id[instance_id]['State']
+            }
+            for instance_id in InstanceIds if instance_id in self._by_id
+        ]}
+
+    def do_start_instances(self, InstanceIds=(), **kwargs):
+        """Answer start_instances (without changing the fleet)."""
+        return {'StartingInstances': self._changes(InstanceIds, 'pending')}
+
+    def do_stop_instances(self, InstanceIds=(), **kwargs):
+        """Answer stop_instances (without changing the fleet)."""
+        return {'StoppingInstances': self._changes(InstanceIds, 'stopping')}
+
+    def _changes(self, instance_ids, state):
+        """Return the state changes of instances."""
+        return [
+            {
+                'InstanceId': instance_id,
+                'PreviousState': self._by_id[instance_id]['State'],
+                'CurrentState': {'Name': state}
+            }
+            for instance_id in instance_ids if instance_id in self._by_id
+        ]
+
+    def do_describe_snapshots(self, Filters=(), MaxResults=None,
+                              NextToken=None, **kwargs):
+        """Answer describe_snapshots (tag filters on generated snapshots)."""
+        servers = max(self.servers, 1)
+        indexes = range(self.snapshots)
+        filters = []
+        for item in Filters:
+            if item['Name'] == 'tag:Server':
+                # snapshots of one server are every n-th one
+                names = set(item['Values'])
+                indexes = [
+                    index for server in range(servers)
+                    if 'world{}'.format(server) in names
+                    for index in range(server, self.snapshots, servers)
+                ]
+                indexes.sort()
+            elif item['Name'] != 'tag:Application':
+                filters.append(item)
+
+        page = []
+        start = int(NextToken or 0)
+        limit = MaxResults or PAGE_SIZE
+        position = start
+        while position < len(indexes) and len(page) < limit:
+            snapshot = self.make_snapshot(indexes[position])
+            position += 1
+            if all(match(snapshot, item) for item in filters):
+                page.append(snapshot)
+        response = {'Snapshots': page}
+        if position < len(indexes):
+            response['NextToken'] = str(position)
+        return response
+
+    def do_describe_volumes(self, Filters=(), **kwargs):
+        """Answer describe_volumes (data volumes of instances)."""
+        instance_ids = next(
+            item['Values'] for item in Filters
+            if item['Name'] == 'attachment.instance-id')
+        return {'Volumes': [
+            {
+                'VolumeId': mapping['Ebs']['VolumeId'],
+                'Attachments': [{
+                    'InstanceId': instance_id,
+                    'Device': DATA_DEVICE
+                }]
+            }
+            for instance_id in instance_ids if instance_id in self._by_id
+            for mapping in self._by_id[instance_id]['BlockDeviceMappings']
+            if mapping['DeviceName'] == DATA_DEVICE
+        ]}
+
+    def do_create_snapshot(self, VolumeId, Description='',
+                           TagSpecifications=(), **kwargs):
+        """Answer create_snapshot (without adding it to the fleet)."""
+        self.created += 1
+        return {
+            'SnapshotId': 'snap-{:017x}'.format(
+                self.snapshots + self.created),
+            'VolumeId': VolumeId,
+            'Description': Description,
+            'State': 'pending',
+            'Tags': [
+                tag for spec in TagSpecifications for tag in spec['Tags']
+            ]
+        }
+
+    def do_get_parameter(self, Name, **kwargs):
+        """Answer get_parameter (the RCON password)."""
+        return {'Parameter': {'Name': Name, 'Value': PASSWORD}}
+
+
+def match(resource, item):
+    """Return True if EC2 data matches a filter (tags and instance state)."""
+    name = item['Name']
+    if name.startswith('tag:'):
+        values = [
+            tag['Value'] for tag in resource.get('Tags', [])
+            if tag['Key'] == name[4:]
+        ]
+    elif name == 'instance-state-name':
+        values = [resource['State']['Name']]
+    else:
+        return True
+    return any(
+        value.startswith(pattern[:-1]) if pattern.endswith('*')
+        else value == pattern
+        for value in values for pattern in item['Values']
+    )
+
+
+def paginate(items, limit, token):
+    """Return a page of items and the token of the next page."""
+    start = int(token or 0)
+    end = len(items) if limit is None else start + limit
+    return items[start:end], (str(end) if end < len(items) else None)
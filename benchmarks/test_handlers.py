@@ -0,0 +1,217 @@
+"""Benchmark every API handler offline against synthetic fleets.
+
+Each scenario invokes a handler with cold container state (caches, index
+and catalog discarded before every invocation) and warm state, and
+reports latency percentiles, SDK calls per operation, and the memory
+retained and peaking (tracemalloc) during one invocation.
+
+SDK calls and memory are compared with handler_baselines.json; rerun with
+BENCHMARK_UPDATE_BASELINES=true to record new baselines (and review the
+diff of that file like any other change).
+"""
+
+import contextlib
+import json
+import logging
+import os
+import statistics
+import time
+import tracemalloc
+import boto3
+import pytest
+import awsclients
+import mcserver
+import mcservers
+import mcsnapshots
+import mcusers
+import snapshotcatalog
+import ttlcache
+from benchmarks import fakefleet
+from tests import fakercon
+
+BASELINES = os.path.join(os.path.dirname(__file__), 'handler_baselines.json')
+UPDATE = os.getenv('BENCHMARK_UPDATE_BASELINES', 'false').lower() == 'true'
+
+# memory may grow this much over its baseline (plus some slack in KiB)
+MEMORY_TOLERANCE = 1.5
+MEMORY_SLACK_KIB = 64
+
+SERVER = {'pathParameters': {'name': 'world1'}}
+
+# (scenario, handler, event, servers, snapshots, invocations)
+SCENARIOS = [
+    ('get-servers', mcservers.get_handler, {}, 10, 0, 20),
+    ('get-servers', mcservers.get_handler, {}, 100, 0, 20),
+    ('get-servers', mcservers.get_handler, {}, 1000, 0, 5),
+    ('post-servers', mcservers.post_handler,
+     {'body': '{"state": "running"}'}, 100, 0, 20),
+    ('post-servers', mcservers.post_handler,
+     {'body': '{"state": "running"}'}, 1000, 0, 5),
+    ('get-server', mcserver.get_handler, SERVER, 10, 0, 20),
+    ('get-server', mcserver.get_handler, SERVER, 1000, 0, 5),
+    ('get-server-state', mcserver.state_handler, SERVER, 1000, 0, 5),
+    ('post-server', mcserver.post_handler,
+     dict(SERVER, body='{"state": "running"}'), 1000, 0, 5),
+    ('get-users', mcusers.get_handler, SERVER, 10, 0, 20),
+    ('get-all-users', mcusers.get_all_handler, {}, 10, 0, 20),
+    ('get-all-users', mcusers.get_all_handler, {}, 100, 0, 5),
+    ('get-all-users', mcusers.get_all_handler, {}, 1000, 0, 3),
+    ('get-snapshots', mcsnapshots.get_handler, {}, 10, 1000, 20),
+    ('get-snapshots', mcsnapshots.get_handler, {}, 100, 100000, 3),
+    ('get-snapshots-page', mcsnapshots.get_handler,
+     {'queryStringParameters': {'limit': '100'}}, 100, 100000, 20),
+    ('get-server-snapshots', mcsnapshots.get_handler,
+     SERVER, 100, 100000, 5),
+    ('post-snapshot', mcsnapshots.post_handler,
+     dict(SERVER, body='{"event": "benchmark"}'), 1000, 0, 5),
+    ('post-snapshots', mcsnapshots.post_all_handler,
+     {'body': '{"event": "benchmark"}'}, 10, 0, 20),
+    ('post-snapshots', mcsnapshots.post_all_handler,
+     {'body': '{"event": "benchmark"}'}, 100, 0, 5),
+]
+
+
+def get_key(scenario, servers, snapshots, mode):
+    """Return the baseline key of a scenario."""
+    return '{} servers={} snapshots={} {}'.format(
+        scenario, servers, snapshots, mode)
+
+
+def reset_container():
+    """Discard per-container state (like a cold start, imports aside)."""
+    ttlcache.clear_all()
+    mcserver.INSTANCE_INDEX.clear()
+    snapshotcatalog.close_all()
+
+
+@contextlib.contextmanager
+def lambda_logging():
+    """Write logs to nowhere (as Lambda would) instead of capturing them."""
+    root = logging.getLogger()
+    handlers = root.handlers
+    with open(os.devnull, 'w') as sink:
+        handler = logging.StreamHandler(sink)
+        handler.setFormatter(
+            logging.Formatter('%(levelname)s %(message)s\n'))
+        root.handlers = [handler]
+        try:
+            yield
+        finally:
+            root.handlers = handlers
+
+
+def percentile(values, fraction):
+    """Return a percentile of values (nearest rank)."""
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def measure(fleet, handler, event, invocations, cold):
+    """Return the latencies and metrics of one invocation of a handler."""
+    latencies = []
+    if not cold:
+        handler(event, None)
+    for _ in range(invocations):
+        if cold:
+            reset_container()
+        start = time.perf_counter()
+        response = handler(event, None)
+        latencies.append(time.perf_counter() - start)
+        assert response['statusCode'] == 200
+
+    # count SDK calls and trace memory of one more invocation
+    if cold:
+        reset_container()
+    fleet.reset_calls()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    handler(event, None)
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'p50Ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p90Ms': round(percentile(latencies, 0.90) * 1000, 2),
+        'p99Ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'meanMs': round(statistics.mean(latencies) * 1000, 2),
+        'sdkCalls': dict(sorted(fleet.calls.items())),
+        'retainedKiB': max(after - before, 0) // 1024,
+        'peakKiB': (peak - before) // 1024
+    }
+
+
+def load_baselines():
+    """Return the recorded metrics by scenario key."""
+    try:
+        with open(BASELINES) as baselines:
+            return json.load(baselines)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(key, result):
+    """Record the metrics of a scenario."""
+    baselines = load_baselines()
+    baselines[key] = result
+    with open(BASELINES, 'w') as output:
+        json.dump(baselines, output, indent=4, sort_keys=True)
+        output.write('\n')
+
+
+@pytest.fixture(name='rcon', scope='module')
+def fixture_rcon():
+    """Serve the RCON endpoint of every running server."""
+    with fakercon.FakeRconServer(password=fakefleet.PASSWORD, responses={
+        'list': 'There are 1 of a max of 20 players online: Steve'
+    }) as server:
+        yield server
+
+
+@pytest.fixture(name='backend')
+def fixture_backend(monkeypatch, rcon):
+    """Return a function deploying a fleet behind shared SDK clients."""
+    monkeypatch.setattr(mcusers, 'RCON_PORT', rcon.port)
+    monkeypatch.setattr(mcsnapshots, 'CATALOG_PATH', '')
+
+    def deploy(servers, snapshots):
+        fleet = fakefleet.FakeFleet(
+            servers, snapshots, rcon.server_address[0])
+        for service in ['ec2', 'ssm']:
+            awsclients.set_client(service, fleet.attach(
+                boto3.client(service, region_name='us-east-1')))
+        return fleet
+
+    yield deploy
+    awsclients.reset()
+    reset_container()
+
+
+@pytest.mark.parametrize('mode', ['cold', 'warm'])
+@pytest.mark.parametrize(
+    'scenario, handler, event, servers, snapshots, invocations', SCENARIOS,
+    ids=['{}-{}-{}'.format(*s[:1], *s[3:5]) for s in SCENARIOS])
+def test_handler(backend, monkeypatch, mode, scenario, handler, event,
+                 servers, snapshots, invocations):
+    """SDK calls and memory of a handler must not regress."""
+    # pylint: disable=too-many-arguments
+    fleet = backend(servers, snapshots)
+    if mode == 'warm':
+        # caches must not expire between invocations of a slow scenario
+        for cache in ttlcache._caches:  # pylint: disable=protected-access
+            monkeypatch.setattr(cache, 'ttl', 3600.0)
+    with lambda_logging():
+        result = measure(
+            fleet, handler, event, invocations, mode == 'cold')
+
+    key = get_key(scenario, servers, snapshots, mode)
+    print('\n{}: p50 {p50Ms} ms, p90 {p90Ms} ms, p99 {p99Ms} ms, '
+          'peak {peakKiB} KiB, SDK calls {sdkCalls}'.format(key, **result))
+    if UPDATE:
+        save_baseline(key, result)
+        return
+
+    baseline = load_baselines().get(key)
+    assert baseline is not None, 'no baseline (see BENCHMARK_UPDATE_BASELINES)'
+    assert result['sdkCalls'] == baseline['sdkCalls']
+    assert result['peakKiB'] <= \
+        baseline['peakKiB'] * MEMORY_TOLERANCE + MEMORY_SLACK_KIB
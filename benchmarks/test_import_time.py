@@ -0,0 +1,97 @@
+"""Benchmark the cold-start import time of every Lambda handler module.
+
+Median import times are compared with import_baselines.json; rerun with
+BENCHMARK_UPDATE_BASELINES=true to record new baselines (and review the
+diff of that file like any other change).
+"""
+
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, 'src')
+RUNS = 5
+BASELINES = os.path.join(os.path.dirname(__file__), 'import_baselines.json')
+UPDATE = os.getenv('BENCHMARK_UPDATE_BASELINES', 'false').lower() == 'true'
+
+# import time may grow this much over its baseline (imports of a cold
+# interpreter vary a lot with the load of the host)
+IMPORT_TOLERANCE = 2.0
+
+# dependencies that must only load once a handler actually needs them
+HEAVY_MODULES = ['boto3', 'botocore', 'asyncio', 'mcrcon', 'parse', 'sqlite3']
+
+
+def get_handler_modules():
+    """Return the modules of all Lambda handlers in the SAM template."""
+    with open(os.path.join(ROOT, 'template.yaml')) as template:
+        handlers = re.findall(r'Handler: (\w+)\.', template.read())
+    return sorted(set(handlers))
+
+
+def load_baselines():
+    """Return the recorded median import time (microseconds) by module."""
+    try:
+        with open(BASELINES) as baselines:
+            return json.load(baselines)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(module, elapsed):
+    """Record the median import time of a module."""
+    baselines = load_baselines()
+    baselines[module] = elapsed
+    with open(BASELINES, 'w') as output:
+        json.dump(baselines, output, indent=4, sort_keys=True)
+        output.write('\n')
+
+
+def run_python(*args):
+    """Run a fresh interpreter with the *src* directory on its path."""
+    return subprocess.run(
+        [sys.executable, *args], cwd=SRC, check=True,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True)
+
+
+def measure_import(module):
+    """Return the cumulative import time (microseconds) of a module."""
+    stderr = run_python('-X', 'importtime', '-c', 'import ' + module).stderr
+    for line in stderr.splitlines():
+        fields = line.split('|')
+        if len(fields) == 3 and fields[2].rstrip() == ' ' + module:
+            return int(fields[1])
+    raise AssertionError('no import time reported for ' + module)
+
+
+@pytest.mark.parametrize('module', get_handler_modules())
+def test_import_budget(module):
+    """Importing a handler module must stay close to its baseline."""
+    elapsed = int(statistics.median(
+        measure_import(module) for _ in range(RUNS)))
+    if UPDATE:
+        save_baseline(module, elapsed)
+
+    baseline = load_baselines().get(module)
+    assert baseline is not None, 'no baseline (see BENCHMARK_UPDATE_BASELINES)'
+    budget = baseline * IMPORT_TOLERANCE
+    print('\n{}: {:.1f} ms (baseline {:.1f} ms, budget {:.1f} ms)'.format(
+        module, elapsed / 1000, baseline / 1000, budget / 1000))
+    assert elapsed <= budget
+
+
+@pytest.mark.parametrize('module', get_handler_modules())
+def test_import_is_lazy(module):
+    """Importing a handler module must not load heavy dependencies."""
+    stdout = run_python('-c', '; '.join([
+        'import sys, types, ' + module,
+        'print(" ".join(name for name in {!r} if type(sys.modules.get(name))'
+        ' is types.ModuleType))'.format(HEAVY_MODULES)
+    ])).stdout
+    assert stdout.split() == []
@@ -0,0 +1,106 @@
+"""Benchmark 'myutils.log_calls' overhead on the snapshot mapping loop."""
+
+import functools
+import io
+import logging
+import timeit
+import ebsmapper
+from benchmarks import test_tags
+
+
+def log_calls_eager(func=None, level=logging.INFO):
+    """Define the previous decorator that formats payloads on every call."""
+    if not func:
+        return functools.partial(log_calls_eager, level=level)
+
+    logger = logging.getLogger(func.__module__)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwds):
+        start = {
+            'method': '{}.{}'.format(func.__module__, func.__name__),
+            'state': 'entering',
+            'args': [*args]
+        }
+        logger.log(level, '%s', start)
+        result = func(*args, **kwds)
+        if result is not None:
+            end = {
+                'method': '{}.{}'.format(func.__module__, func.__name__),
+                'state': 'exited',
+                'args': [*args],
+                'result': result
+            }
+            logger.log(level, '%s', end)
+        return result
+    return wrapper
+
+
+def time_loop(func, snapshots):
+    """Return the best time to map all snapshots with the given function."""
+    return min(timeit.repeat(
+        lambda: list(map(func, snapshots)), number=1, repeat=5))
+
+
+def test_log_calls_disabled_overhead():
+    """A disabled log_calls level must add (almost) nothing per call."""
+    snapshots = test_tags.make_snapshots()
+    undecorated = ebsmapper.map_snapshot.__wrapped__
+    eager = log_calls_eager(undecorated, level=logging.DEBUG)
+
+    logger = logging.getLogger(ebsmapper.__name__)
+    level = logger.level
+    logger.setLevel(logging.INFO)
+    try:
+        bare = time_loop(undecorated, snapshots)
+        lazy = time_loop(ebsmapper.map_snapshot, snapshots)
+        previous = time_loop(eager, snapshots)
+    finally:
+        logger.setLevel(level)
+
+    print('\nundecorated: {:.1f} ms, log_calls: {:.1f} ms, '
+          'previous log_calls: {:.1f} ms'.format(
+              bare * 1000, lazy * 1000, previous * 1000))
+    assert lazy < previous
+    assert lazy < bare * 1.5
+
+
+def test_log_calls_enabled_overhead():
+    """An enabled log_calls level must bound the formatted payloads."""
+    snapshots = test_tags.make_snapshots()[:1000]
+    eager = log_calls_eager(
+        ebsmapper.map_snapshot.__wrapped__, level=logging.DEBUG)
+
+    logger = logging.getLogger(ebsmapper.__name__)
+    handler = logging.StreamHandler(io.StringIO())
+    logger.addHandler(handler)
+    propagate = logger.propagate
+    logger.propagate = False
+    try:
+        lazy = time_loop(ebsmapper.map_snapshot, snapshots)
+        previous = time_loop(eager, snapshots)
+    finally:
+        logger.removeHandler(handler)
+        logger.propagate = propagate
+
+    print('\nlog_calls: {:.1f} ms, previous log_calls: {:.1f} ms'.format(
+        lazy * 1000, previous * 1000))
+    assert lazy < previous * 2
+
+    parse = ebsmapper.parse.__wrapped__
+    response = {'Snapshots': test_tags.make_snapshots()}
+    eager = log_calls_eager(parse, level=logging.DEBUG)
+    logger.addHandler(handler)
+    logger.propagate = False
+    try:
+        lazy = min(timeit.repeat(
+            lambda: ebsmapper.parse(response), number=1, repeat=3))
+        previous = min(timeit.repeat(
+            lambda: eager(response), number=1, repeat=3))
+    finally:
+        logger.removeHandler(handler)
+        logger.propagate = propagate
+
+    print('parse: log_calls: {:.1f} ms, previous log_calls: {:.1f} ms'.format(
+        lazy * 1000, previous * 1000))
+    assert lazy < previous
@@ -0,0 +1,64 @@
+"""Benchmark name parsing in the 'naming' module against the original code."""
+
+import timeit
+import naming
+
+RECORDS = 10000
+SERVERS = 50
+
+
+def get_short_name_split(full_name):
+    """Parse an instance name with split() calls (previous code)."""
+    if full_name.startswith('mcservers-'):
+        name = full_name.split('/')[1]
+    else:
+        name = full_name.split('-')[-1]
+    return name
+
+
+def get_server_name_split(name):
+    """Parse a snapshot name with split() calls (previous code)."""
+    name_parts = name.split('-')
+    prefix = name_parts[0] if len(name_parts) > 0 else ''
+    if prefix == 'minecraft':
+        return name_parts[3] if len(name_parts) > 3 else ''
+    return name_parts[2] if len(name_parts) > 2 else ''
+
+
+def measure(func):
+    """Return the best time (seconds) of a few runs."""
+    return min(timeit.repeat(func, number=1, repeat=7))
+
+
+def test_instance_names():
+    """Memoized parsing must beat splitting every fleet listing again."""
+    names = [
+        'mcservers-main-hosts/world{}/instance'.format(i % SERVERS)
+        if i % 2 else 'minecraft-main-server-world{}'.format(i % SERVERS)
+        for i in range(RECORDS)
+    ]
+    expected = list(map(get_short_name_split, names))
+    assert list(map(naming.get_instance_name, names)) == expected
+    assert naming.get_instance_names(names) == expected
+
+    split = measure(lambda: list(map(get_short_name_split, names)))
+    memo = measure(lambda: list(map(naming.get_instance_name, names)))
+    batch = measure(lambda: naming.get_instance_names(names))
+    print('\nsplit: {:.1f} ms, memoized: {:.1f} ms, batch: {:.1f} ms'.format(
+        split * 1000, memo * 1000, batch * 1000))
+    assert memo * 2 < split
+
+
+def test_snapshot_names():
+    """Bounded splitting of unique snapshot names (reported only)."""
+    names = [
+        'mcservers-main-world{}-{}.0'.format(i % SERVERS, 1618900000 + i)
+        for i in range(RECORDS)
+    ]
+    expected = list(map(get_server_name_split, names))
+    assert list(map(naming.get_snapshot_server, names)) == expected
+
+    split = measure(lambda: list(map(get_server_name_split, names)))
+    bounded = measure(lambda: list(map(naming.get_snapshot_server, names)))
+    print('\nsplit: {:.1f} ms, bounded split: {:.1f} ms'.format(
+        split * 1000, bounded * 1000))
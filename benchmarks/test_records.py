@@ -0,0 +1,86 @@
+"""Benchmark the memory of snapshot records against plain dicts."""
+
+import json
+import os
+import subprocess
+import sys
+import timeit
+import records
+
+SNAPSHOTS = 50000
+SERVERS = 50
+
+# builds the snapshots in a fresh interpreter and prints its peak RSS (KiB)
+SCRIPT = '''
+import resource, sys
+sys.path.insert(0, {src!r})
+import records
+snapshots = [
+    ({factory})(
+        'mcservers-main-world{{}}-{{}}.0'.format(i % {servers}, i),
+        'world{{}}'.format(i % {servers}),
+        'snap-{{:017x}}'.format(i),
+        'nightly',
+        '2022-03-{{:02d}}T06:00:00+00:00'.format(i % 28 + 1))
+    for i in range({count})
+]
+try:
+    # ru_maxrss survives exec(), so it may report the (larger) parent
+    with open('/proc/self/status') as status:
+        print(next(line.split()[1] for line in status
+                   if line.startswith('VmHWM:')))
+except OSError:
+    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+'''
+
+DICT_FACTORY = 'lambda *values: dict(zip(records.Snapshot.__slots__, values))'
+
+
+def measure_rss(factory):
+    """Return the peak RSS (KiB) of a process holding the snapshots."""
+    src = os.path.dirname(os.path.abspath(__file__)) + '/../src/'
+    script = SCRIPT.format(
+        src=src, factory=factory, servers=SERVERS, count=SNAPSHOTS)
+    output = subprocess.run(
+        [sys.executable, '-c', script],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return int(output)
+
+
+def make_snapshots():
+    """Return snapshot records of a large application."""
+    return [
+        records.Snapshot(
+            'mcservers-main-world{}-{}.0'.format(i % SERVERS, i),
+            'world{}'.format(i % SERVERS),
+            'snap-{:017x}'.format(i),
+            'nightly',
+            '2022-03-{:02d}T06:00:00+00:00'.format(i % 28 + 1))
+        for i in range(SNAPSHOTS)
+    ]
+
+
+def test_memory():
+    """Slotted records must hold 50k snapshots in much less memory."""
+    dicts = measure_rss(DICT_FACTORY)
+    slotted = measure_rss('records.Snapshot')
+    print('\npeak RSS with dicts: {:.1f} MiB, records: {:.1f} MiB'.format(
+        dicts / 1024, slotted / 1024))
+    # a 5-key dict costs well over 64 bytes more than a 5-slot object
+    assert (dicts - slotted) * 1024 > SNAPSHOTS * 64
+
+
+def test_encoding():
+    """Records encode exactly like dicts (encoding times reported only)."""
+    snapshots = make_snapshots()
+    dicts = [dict(snapshot) for snapshot in snapshots]
+    assert records.dumps({'snapshots': snapshots}) == \
+        json.dumps({'snapshots': dicts})
+
+    plain = min(timeit.repeat(
+        lambda: json.dumps({'snapshots': dicts}), number=1, repeat=5))
+    slotted = min(timeit.repeat(
+        lambda: records.dumps({'snapshots': snapshots}), number=1, repeat=5))
+    print('\njson.dumps: {:.1f} ms, records.dumps: {:.1f} ms'.format(
+        plain * 1000, slotted * 1000))
@@ -0,0 +1,61 @@
+"""Benchmark tag lookups in the 'ebsmapper' mapping layer."""
+
+import timeit
+import ebsmapper
+import myutils
+
+SNAPSHOTS = 10000
+TAGS = 20
+
+
+def make_snapshots():
+    """Create synthetic snapshots carrying many tags each."""
+    snapshots = []
+    for i in range(SNAPSHOTS):
+        tags = [
+            {'Key': 'Extra{}'.format(t), 'Value': str(t)}
+            for t in range(TAGS - 5)
+        ]
+        tags.extend([
+            {'Key': 'Name', 'Value': 'mcservers-main-world{}-0'.format(i)},
+            {'Key': 'Application', 'Value': 'mcservers'},
+            {'Key': 'Event', 'Value': 'nightly'},
+            {'Key': 'Timestamp', 'Value': '2021-04-20T06:26:40'},
+            {'Key': 'Server', 'Value': 'world{}'.format(i)}
+        ])
+        snapshots.append({'SnapshotId': 'snap-{}'.format(i), 'Tags': tags})
+    return snapshots
+
+
+def map_snapshot_get_first(snapshot):
+    """Map a snapshot with one get_first() scan per tag (previous code)."""
+    tags = snapshot.get('Tags', [])
+    server = myutils.get_first('Server', tags)
+    if server is None or server == '':
+        server = myutils.get_first('Name', tags).split('-')[2]
+    return {
+        'name': myutils.get_first('Name', tags),
+        'server': server,
+        'snapshotId': snapshot.get('SnapshotId', ''),
+        'event': myutils.get_first('Event', tags),
+        'timestamp': myutils.get_first('Timestamp', tags)
+    }
+
+
+def test_map_snapshot_tags():
+    """Indexing tags once must beat scanning the tag list per key."""
+    snapshots = make_snapshots()
+    map_snapshot = ebsmapper.map_snapshot.__wrapped__
+
+    expected = list(map(map_snapshot_get_first, snapshots))
+    assert list(map(map_snapshot, snapshots)) == expected
+
+    scan = min(timeit.repeat(
+        lambda: list(map(map_snapshot_get_first, snapshots)),
+        number=1, repeat=5))
+    index = min(timeit.repeat(
+        lambda: list(map(map_snapshot, snapshots)),
+        number=1, repeat=5))
+    print('\nget_first: {:.1f} ms, index_tags: {:.1f} ms ({:.1f}x)'.format(
+        scan * 1000, index * 1000, scan / index))
+    assert index * 2 < scan
@@ -0,0 +1,101 @@
+"""Minimal asyncio client for the Minecraft RCON protocol."""
+
+import struct
+import myutils
+
+asyncio = myutils.lazy_import('asyncio')
+
+# RCON packet types
+RESPONSE = 0
+COMMAND = 2
+LOGIN = 3
+
+# request IDs used within a single connection
+LOGIN_ID = 1
+COMMAND_ID = 2
+SENTINEL_ID = 3
+
+
+class RconError(Exception):
+    """Raised when the game server rejects or garbles an RCON exchange."""
+
+
+class LoginError(RconError):
+    """Raised when the game server rejects the RCON password."""
+
+
+async def command(host, port, password, text, timeout):
+    """Log in, run one RCON command and return its response.
+
+    Parameters
+    ----------
+    host: str, required
+        Address of the game server
+
+    port: int, required
+        RCON port of the game server
+
+    password: str, required
+        RCON password
+
+    text: str, required
+        Command to run (e.g. 'list')
+
+    timeout: float, required
+        Seconds allowed for the whole exchange (asyncio.TimeoutError)
+
+    Returns
+    -------
+    Command response: str
+    """
+    return await asyncio.wait_for(
+        _command(host, port, password, text), timeout)
+
+
+async def _command(host, port, password, text):
+    """Run one RCON command without a time limit."""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        write_packet(writer, LOGIN_ID, LOGIN, password)
+        request_id, _, _ = await read_packet(reader)
+        if request_id != LOGIN_ID:
+            raise LoginError('login failed')
+
+        # long responses are split across packets, so a sentinel request
+        # marks the end of the command response
+        write_packet(writer, COMMAND_ID, COMMAND, text)
+        write_packet(writer, SENTINEL_ID, RESPONSE, '')
+        response = ''
+        while True:
+            request_id, _, payload = await read_packet(reader)
+            if request_id == SENTINEL_ID:
+                return response
+            if request_id != COMMAND_ID:
+                raise RconError('unexpected request ID {}'.format(request_id))
+            response += payload
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+
+
+def write_packet(writer, request_id, packet_type, payload):
+    """Queue an RCON packet for sending."""
+    body = struct.pack('<ii', request_id, packet_type) \
+        + payload.encode('utf8') + b'\x00\x00'
+    writer.write(struct.pack('<i', len(body)) + body)
+
+
+async def read_packet(reader):
+    """Return (request ID, type, payload) of the next RCON packet."""
+    try:
+        (length,) = struct.unpack('<i', await reader.readexactly(4))
+        body = await reader.readexactly(length)
+    except asyncio.IncompleteReadError as error:
+        raise RconError('connection closed by game server') from error
+    if length < 10 or body[-2:] != b'\x00\x00':
+        raise RconError('malformed packet')
+    request_id, packet_type = struct.unpack('<ii', body[:8])
+    return request_id, packet_type, body[8:-2].decode('utf8')
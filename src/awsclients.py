@@ -0,0 +1,136 @@
+"""Registry of AWS SDK clients shared across warm Lambda invocations."""
+
+import json
+import logging
+import os
+import threading
+import myutils
+
+logger = myutils.get_logger(__name__, logging.INFO)
+
+# default client configuration (overridable with environment variables)
+MAX_POOL_CONNECTIONS = int(os.getenv('AWS_MAX_POOL_CONNECTIONS', '10'))
+RETRY_MODE = os.getenv('AWS_RETRY_MODE', 'standard')
+MAX_ATTEMPTS = int(os.getenv('AWS_MAX_ATTEMPTS', '3'))
+
+# clients of calls within a deadline: the time left is rounded down to one
+# of two budgets (so that a service has few clients sharing the state of
+# adaptive retries), split across the attempts of the retry mode, and each
+# attempt may take this long to connect and at least this long to read a
+# response (e.g. a page of 1000 snapshots)
+DEADLINE_RETRY_MODE = os.getenv('AWS_DEADLINE_RETRY_MODE', 'adaptive')
+DEADLINE_BUDGETS = (4.0, 16.0)
+CONNECT_TIMEOUT_SECONDS = float(os.getenv('AWS_CONNECT_TIMEOUT_SECONDS', '1'))
+MIN_READ_TIMEOUT_SECONDS = float(
+    os.getenv('AWS_MIN_READ_TIMEOUT_SECONDS', '3'))
+
+_clients = {}
+_overrides = {}
+_lock = threading.Lock()
+
+
+def get_client(service, region_name=None, deadline=None, **config):
+    """Return a shared AWS SDK client (created lazily once per container).
+
+    Parameters
+    ----------
+    service: str, required
+        AWS service name (e.g. 'ec2' or 'ssm')
+
+    region_name: str, optional
+        AWS region; defaults to the region of the Lambda environment
+
+    deadline: deadlines.Deadline, optional
+        Deadline of the calls, whose timeouts and retries must fit the time
+        left (raises deadlines.DeadlineExceeded if there is none)
+
+    config: dict, optional
+        botocore client configuration that overrides the defaults
+
+    Returns
+    -------
+    botocore client: object
+    """
+    if deadline is not None:
+        deadline.check('AWS call')
+    override = _overrides.get(service)
+    if override is not None:
+        return override
+
+    region_name = region_name or get_default_region()
+    options = get_default_config()
+    if deadline is not None:
+        options.update(get_deadline_config(deadline))
+    options.update(config)
+    key = (service, region_name, json.dumps(options, sort_keys=True))
+
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = create_client(service, region_name, options)
+                _clients[key] = client
+    return client
+
+
+def create_client(service, region_name, options):
+    """Create an AWS SDK client (loading the SDK on first use)."""
+    # pylint: disable=import-outside-toplevel
+    import boto3
+    import botocore.config
+
+    logger.debug('creating %s client in %s', service, region_name)
+    return myutils.instrument_client(boto3.client(
+        service,
+        region_name=region_name,
+        config=botocore.config.Config(**options)
+    ))
+
+
+def get_default_region():
+    """Return the AWS region defined in the environment (if any)."""
+    return os.getenv('AWS_REGION', os.getenv('AWS_DEFAULT_REGION'))
+
+
+def get_default_config():
+    """Return the default botocore configuration for shared clients."""
+    return {
+        'max_pool_connections': MAX_POOL_CONNECTIONS,
+        'retries': {
+            'mode': RETRY_MODE,
+            'max_attempts': MAX_ATTEMPTS
+        }
+    }
+
+
+def get_deadline_config(deadline):
+    """Return the timeouts and retries of calls within a deadline."""
+    remaining = deadline.get_timeout(operation='AWS call')
+    if remaining is None:
+        return {}
+    budget = max(
+        [budget for budget in DEADLINE_BUDGETS if budget <= remaining],
+        default=DEADLINE_BUDGETS[0])
+    attempt = budget / MAX_ATTEMPTS
+    connect = min(CONNECT_TIMEOUT_SECONDS, attempt / 2)
+    return {
+        'connect_timeout': connect,
+        'read_timeout': max(attempt - connect, MIN_READ_TIMEOUT_SECONDS),
+        'retries': {
+            'mode': DEADLINE_RETRY_MODE,
+            'max_attempts': MAX_ATTEMPTS
+        }
+    }
+
+
+def set_client(service, client):
+    """Inject a client for a service (e.g. a Stubber-backed test client)."""
+    _overrides[service] = myutils.instrument_client(client)
+
+
+def reset():
+    """Discard all shared and injected clients."""
+    with _lock:
+        _clients.clear()
+        _overrides.clear()
@@ -0,0 +1,123 @@
+"""Time budget of a Lambda invocation shared by the calls it makes."""
+
+import functools
+import os
+import time
+import myutils
+
+# only needed once a call has failed
+asyncio = myutils.lazy_import('asyncio')
+socket = myutils.lazy_import('socket')
+
+# seconds kept back from the Lambda timeout to return a degraded response
+RESERVE_SECONDS = float(os.getenv('DEADLINE_RESERVE_SECONDS', '1'))
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a call cannot start before the deadline."""
+
+
+class Deadline:
+    """Point in time by which an invocation must have responded.
+
+    Parameters
+    ----------
+    seconds: float, optional
+        Seconds left before the deadline (no deadline if None)
+
+    timer: callable, optional
+        Clock returning seconds (defaults to time.monotonic)
+    """
+
+    def __init__(self, seconds=None, timer=time.monotonic):
+        """Start the countdown."""
+        self.timer = timer
+        self.expires = None if seconds is None else timer() + seconds
+
+    @classmethod
+    def from_context(cls, context, reserve=None):
+        """Return the deadline of a Lambda invocation (less a reserve).
+
+        There is no deadline when the context has no remaining time (e.g.
+        in tests).
+        """
+        reserve = RESERVE_SECONDS if reserve is None else reserve
+        return cls(myutils.get_time_budget(context, reserve))
+
+    def remaining(self, reserve=0.0):
+        """Return seconds left before the deadline less a reserve (or None).
+
+        None means there is no deadline.
+        """
+        if self.expires is None:
+            return None
+        return max(self.expires - self.timer() - reserve, 0.0)
+
+    def shorten(self, seconds):
+        """Return a deadline passing seconds earlier (e.g. to clean up)."""
+        deadline = Deadline(timer=self.timer)
+        if self.expires is not None:
+            deadline.expires = self.expires - seconds
+        return deadline
+
+    def expired(self):
+        """Return True if the deadline has passed."""
+        return self.remaining() == 0.0
+
+    def check(self, operation='call'):
+        """Raise DeadlineExceeded if the deadline has passed."""
+        if self.expired():
+            raise DeadlineExceeded('no time left for ' + operation)
+
+    def get_timeout(self, limit=None, operation='call'):
+        """Return the seconds allowed for a call (at most limit).
+
+        Raises DeadlineExceeded if the deadline has passed.
+        """
+        self.check(operation)
+        remaining = self.remaining()
+        if remaining is None or (limit is not None and limit < remaining):
+            return limit
+        return remaining
+
+    def iterate(self, items, operation='page'):
+        """Yield items (e.g. SDK pages) while the deadline has not passed.
+
+        The deadline is checked before each item is requested, so a slow
+        paginator stops between pages with DeadlineExceeded.
+        """
+        iterator = iter(items)
+        while True:
+            self.check(operation)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            yield item
+
+
+@functools.lru_cache(maxsize=None)
+def get_timeout_errors():
+    """Return the errors of calls that ran out of time (for except clauses).
+
+    botocore is only imported once a call has failed.
+    """
+    # pylint: disable=import-outside-toplevel
+    import botocore.exceptions
+    return (
+        DeadlineExceeded,
+        socket.timeout,
+        asyncio.TimeoutError,
+        botocore.exceptions.ConnectTimeoutError,
+        botocore.exceptions.ReadTimeoutError
+    )
+
+
+def describe(error):
+    """Return the message of a degraded response for a timed out call."""
+    message = str(error)
+    if isinstance(error, DeadlineExceeded):
+        return 'deadline exceeded ({})'.format(message)
+    if message in ('', 'timed out'):
+        return 'timed out'
+    return 'timed out ({})'.format(message)
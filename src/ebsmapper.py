@@ -2,6 +2,8 @@
 
 import logging
 import myutils
+import naming
+import records
 
 logger = myutils.get_logger(__name__, logging.DEBUG)
 
@@ -9,34 +11,41 @@ logger = myutils.get_logger(__name__, logging.DEBUG)
 @myutils.log_calls(level=logging.DEBUG)
 def parse(sdk_snapshots):
     """Process raw EBS snapshot data."""
-    snapshots = []
-    snapshots.extend(
-        map(map_snapshot, sdk_snapshots.get('Snapshots', []))
-    )
-    return snapshots
+    return list(parse_pages([sdk_snapshots]))
+
+
+def parse_pages(pages):
+    """Yield snapshot data as each page of EBS snapshot data arrives."""
+    for page in pages:
+        yield from map(map_snapshot, page.get('Snapshots', []))
 
 
 @myutils.log_calls(level=logging.DEBUG)
 def map_snapshot(snapshot):
     """Map AWS EBS snapshot data to response message format."""
-    tags = snapshot.get('Tags', [])
-    return {
-        'name': myutils.get_first('Name', tags),
-        'server': get_server_name(tags),
-        'snapshotId': snapshot.get('SnapshotId', ''),
-        'event': myutils.get_first('Event', tags),
-        'timestamp': myutils.get_first('Timestamp', tags)
-    }
+    tags = myutils.index_tags(snapshot.get('Tags', []))
+    return records.Snapshot(
+        tags.get('Name', ''),
+        get_server_name(tags),
+        snapshot.get('SnapshotId', ''),
+        tags.get('Event', ''),
+        tags.get('Timestamp', '')
+    )
 
 
 def get_server_name(tags):
-    """Retrieve server name from across different tag scenarios."""
-    server = myutils.get_first('Server', tags)
+    """Retrieve server name from across different tag scenarios.
+
+    Parameters
+    ----------
+    tags: dict, required
+        Tag values by tag key (see myutils.index_tags)
+
+    Returns
+    -------
+    Short name of the game server: str
+    """
+    server = tags.get('Server', '')
     if server is None or server == '':
-        name_parts = myutils.get_first('Name', tags).split('-')
-        prefix = name_parts[0] if len(name_parts) > 0 else ''
-        if prefix == 'minecraft':
-            server = name_parts[3] if len(name_parts) > 3 else ''
-        else:
-            server = name_parts[2] if len(name_parts) > 2 else ''
+        server = naming.get_snapshot_server(tags.get('Name', ''))
     return server
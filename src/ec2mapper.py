@@ -2,6 +2,8 @@
 
 import logging
 import myutils
+import naming
+import records
 
 logger = myutils.get_logger(__name__, logging.INFO)
 
@@ -10,33 +12,45 @@ logger = myutils.get_logger(__name__, logging.INFO)
 def parse(reservations):
     """Process raw EC2 instance data."""
     # consolidate the game server data
-    servers = []
-    for reservation in reservations.get('Reservations', []):
-        servers.extend(
-            map(map_instance, reservation.get('Instances', []))
-        )
-    return servers
+    return list(parse_pages([reservations]))
+
+
+def parse_pages(pages):
+    """Yield game server data as each page of EC2 instance data arrives."""
+    for page in pages:
+        for reservation in page.get('Reservations', []):
+            yield from map(map_instance, reservation.get('Instances', []))
 
 
 @myutils.log_calls(level=logging.DEBUG)
 def map_instance(instance):
     """Map AWS EC2 instance data to response message format."""
-    tags = instance.get('Tags', [])
-    full_name = myutils.get_first('Name', tags)
-    return {
-        'name': get_short_name(full_name),
-        'fullName': full_name,
-        'environment': myutils.get_first('Environment', tags),
-        'instanceId': instance.get('InstanceId', ''),
-        'state': instance.get('State', {}).get('Name', ''),
-        'publicIpAddress': instance.get('PublicIpAddress', '')
-    }
+    tags = myutils.index_tags(instance.get('Tags', []))
+    full_name = tags.get('Name', '')
+    return records.Server(
+        get_short_name(full_name),
+        full_name,
+        tags.get('Environment', ''),
+        instance.get('InstanceId', ''),
+        instance.get('State', {}).get('Name', ''),
+        instance.get('PublicIpAddress', '')
+    )
+
+
+@myutils.log_calls(level=logging.DEBUG)
+def map_volumes(instance, data_device):
+    """Map the attached EBS volumes of an AWS EC2 instance by purpose."""
+    root_device = instance.get('RootDeviceName')
+    volumes = {'rootVolumeId': '', 'dataVolumeId': ''}
+    for mapping in instance.get('BlockDeviceMappings', []):
+        volume_id = mapping.get('Ebs', {}).get('VolumeId', '')
+        if mapping.get('DeviceName') == root_device:
+            volumes['rootVolumeId'] = volume_id
+        elif mapping.get('DeviceName') == data_device:
+            volumes['dataVolumeId'] = volume_id
+    return volumes
 
 
 def get_short_name(full_name):
-    """Retrieve short server name from full name."""
-    if full_name.startswith('mcservers-'):
-        name = full_name.split('/')[1]
-    else:
-        name = full_name.split('-')[-1]
-    return name
+    """Retrieve server name from full name."""
+    return naming.get_instance_name(full_name)
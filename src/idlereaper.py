@@ -0,0 +1,149 @@
+"""Handler for stopping idle Minecraft game servers (scheduled workflow)."""
+
+import logging
+import os
+import deadlines
+import idletracker
+import mcserver
+import mcservers
+import mcusers
+import myutils
+
+logger = myutils.get_logger(__name__, logging.INFO)
+
+# report idle servers without stopping them (overridable per event)
+DRY_RUN = os.getenv('IDLE_REAPER_DRY_RUN', 'false').lower() == 'true'
+
+
+@myutils.emit_metrics
+@myutils.log_calls(level=logging.DEBUG)
+def handler(event, context):
+    """Stop every running Minecraft game server without users.
+
+    Parameters
+    ----------
+    event: dict, required
+        Optional 'servers' already gathered by the workflow (see
+        mcservers.gather) and an optional 'dryRun' flag
+
+    context: object, required
+        Lambda Context runtime methods and attributes
+
+    Returns
+    -------
+    Structured report of the checked servers: dict (nothing is checked
+    but the report is 'degraded' if the servers could not be listed within
+    the invocation's time budget)
+    """
+    event = event or {}
+    servers = event.get('servers')
+    dry_run = event.get('dryRun', DRY_RUN)
+    deadline = deadlines.Deadline.from_context(context)
+    if servers is None:
+        try:
+            servers = mcservers.gather(deadline=deadline)
+        except deadlines.get_timeout_errors() as error:
+            logger.warning('servers not listed (%s)', error)
+            return {
+                'dryRun': dry_run,
+                'checked': 0,
+                'idle': [],
+                'stopped': [],
+                'servers': [],
+                'degraded': True,
+                'error': deadlines.describe(error)
+            }
+
+    return reap(servers, dry_run, deadline.remaining(), deadline=deadline)
+
+
+@myutils.log_calls
+def reap(servers, dry_run=False, budget=None, grace=None, store=None,
+         deadline=None):
+    """Stop (with one batched EC2 call) servers idle beyond the grace period.
+
+    Parameters
+    ----------
+    servers: list, required
+        Server data (see mcservers.gather)
+
+    dry_run: bool, optional
+        Report idle servers without stopping them or recording observations
+
+    budget: float, optional
+        Seconds allowed for the user census
+
+    grace: datetime.timedelta, optional
+        Idle period before a server is stopped (IDLE_GRACE_MINUTES)
+
+    store: object, optional
+        Store of idle start times (see idletracker.get_store)
+
+    deadline: deadlines.Deadline, optional
+        Deadline of the EC2 call stopping the idle servers (which keep an
+        'error' if it could not be made in time)
+
+    Returns
+    -------
+    Report of the action taken for each server: dict
+    """
+    grace = idletracker.get_grace_period() if grace is None else grace
+    users = mcusers.census(servers, budget=budget)
+    idle_times = idletracker.observe(
+        servers, users, store=store, save=not dry_run)
+
+    entries = []
+    idle = []
+    for server in servers:
+        name = server.get('name')
+        count = users.get(name, {}).get('count')
+        entry = {
+            'name': name,
+            'instanceId': server.get('instanceId'),
+            'state': server.get('state'),
+            'users': count,
+            'action': 'keep'
+        }
+        if server.get('state') != 'running':
+            entry['reason'] = 'not running'
+        elif count is None:
+            entry['reason'] = users.get(name, {}).get('error', 'unknown')
+        elif count > 0:
+            entry['reason'] = 'active users'
+        elif idle_times.get(server.get('instanceId'), grace) < grace:
+            entry['reason'] = 'idle for {}s (grace period {}s)'.format(
+                int(idle_times[server.get('instanceId')].total_seconds()),
+                int(grace.total_seconds()))
+        else:
+            entry['action'] = 'stop'
+            entry['reason'] = 'no users'
+            idle.append(server)
+        entries.append(entry)
+
+    stopped = []
+    if len(idle) > 0 and not dry_run:
+        try:
+            new_states, errors = mcserver.change_servers_state(
+                idle, 'stopped', deadline)
+        except deadlines.get_timeout_errors() as error:
+            logger.warning('idle servers not stopped (%s)', error)
+            new_states, errors = {}, {}
+            for entry in entries:
+                if entry['action'] == 'stop':
+                    entry['error'] = deadlines.describe(error)
+        for entry in entries:
+            if entry['instanceId'] in errors:
+                entry['error'] = str(errors[entry['instanceId']])
+            if entry['instanceId'] in new_states:
+                entry['state'] = new_states[entry['instanceId']]
+                stopped.append(entry['name'])
+
+    logger.info('idle servers = %s (dry run = %s)',
+                [server.get('name') for server in idle], dry_run)
+    return {
+        'dryRun': dry_run,
+        'checked': len(servers),
+        'idle': [server.get('name') for server in idle],
+        'stopped': stopped,
+        'servers': entries
+    }
@@ -0,0 +1,195 @@
+"""Tracking of since when Minecraft game servers have had no users."""
+
+import datetime
+import logging
+import os
+import awsclients
+import myutils
+
+logger = myutils.get_logger(__name__, logging.INFO)
+
+# only needed by the local store
+sqlite3 = myutils.lazy_import('sqlite3')
+
+# idle settings (overridable with environment variables)
+IDLE_GRACE_MINUTES = float(os.getenv('IDLE_GRACE_MINUTES', '30'))
+IDLE_STORE = os.getenv('IDLE_STORE', 'ec2')
+IDLE_TAG = 'IdleSince'
+
+
+class Ec2TagStore:
+    """Idle start times kept as a tag on each EC2 instance."""
+
+    def load(self, instance_ids):
+        """Return the idle start time by instance ID (one paged call)."""
+        times = {}
+        if len(instance_ids) == 0:
+            return times
+        ec2_client = awsclients.get_client('ec2')
+        paginator = ec2_client.get_paginator('describe_tags')
+        pages = paginator.paginate(Filters=[
+            {'Name': 'resource-id', 'Values': list(instance_ids)},
+            {'Name': 'key', 'Values': [IDLE_TAG]}
+        ])
+        for page in pages:
+            for tag in page.get('Tags', []):
+                seen = parse_time(tag.get('Value', ''))
+                if seen is not None:
+                    times[tag['ResourceId']] = seen
+        return times
+
+    def save(self, times):
+        """Tag instances with their idle start time (one call per time)."""
+        ec2_client = awsclients.get_client('ec2')
+        for seen, instance_ids in group_by_time(times).items():
+            ec2_client.create_tags(
+                Resources=instance_ids,
+                Tags=[{'Key': IDLE_TAG, 'Value': format_time(seen)}]
+            )
+
+    def delete(self, instance_ids):
+        """Remove the idle start time of instances (one call)."""
+        if len(instance_ids) > 0:
+            ec2_client = awsclients.get_client('ec2')
+            ec2_client.delete_tags(
+                Resources=list(instance_ids),
+                Tags=[{'Key': IDLE_TAG}]
+            )
+
+
+class SqliteStore:
+    """Idle start times kept in a local SQLite file (e.g. for tests)."""
+
+    def __init__(self, path):
+        """Open (and initialize) the SQLite database."""
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS idle_since ('
+            'instance_id TEXT PRIMARY KEY, seen TEXT NOT NULL)'
+        )
+
+    def load(self, instance_ids):
+        """Return the idle start time by instance ID."""
+        ids = list(instance_ids)
+        rows = self.connection.execute(
+            'SELECT instance_id, seen FROM idle_since '
+            'WHERE instance_id IN ({})'.format(','.join('?' * len(ids))),
+            ids
+        )
+        return {instance_id: parse_time(seen) for instance_id, seen in rows}
+
+    def save(self, times):
+        """Store the idle start time of instances."""
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO idle_since VALUES (?, ?)',
+                [(key, format_time(seen)) for key, seen in times.items()]
+            )
+
+    def delete(self, instance_ids):
+        """Remove the idle start time of instances."""
+        with self.connection:
+            self.connection.executemany(
+                'DELETE FROM idle_since WHERE instance_id = ?',
+                [(instance_id,) for instance_id in instance_ids]
+            )
+
+
+def get_store(spec=None):
+    """Return the store named by spec ('ec2' or 'sqlite:<path>')."""
+    spec = IDLE_STORE if spec is None else spec
+    if spec.startswith('sqlite:'):
+        return SqliteStore(spec[len('sqlite:'):])
+    return Ec2TagStore()
+
+
+@myutils.log_calls
+def observe(servers, users, now=None, store=None, save=True):
+    """Record the latest user observations and return the idle periods.
+
+    A running server starts its idle period the first time it is seen
+    without users, and ends it whenever it has users again (so with hourly
+    checks, a server is only idle for an hour at its second empty check).
+    A stopped server forgets its idle period so the next start begins a
+    fresh one. Servers without a user count (e.g. RCON timed out) are
+    left untouched.
+
+    Parameters
+    ----------
+    servers: list, required
+        Server data (see mcservers.gather)
+
+    users: dict, required
+        Users by server name (see mcusers.census)
+
+    Returns
+    -------
+    Time since the server was first seen without users by instance ID
+    (zero for servers with users): dict
+    """
+    now = now or utcnow()
+    store = store or get_store()
+    ids = [s.get('instanceId') for s in servers if s.get('instanceId')]
+    idle_since = store.load(ids)
+
+    updates = {}
+    forget = []
+    active = []
+    for server in servers:
+        instance_id = server.get('instanceId')
+        count = users.get(server.get('name'), {}).get('count')
+        if not instance_id:
+            continue
+        if server.get('state') != 'running' or (
+                count is not None and count > 0):
+            if instance_id in idle_since:
+                forget.append(instance_id)
+            if server.get('state') == 'running':
+                active.append(instance_id)
+        elif count is not None and instance_id not in idle_since:
+            updates[instance_id] = now
+
+    if save:
+        store.save(updates)
+        store.delete(forget)
+    idle_since.update(updates)
+    idle = {
+        instance_id: now - since
+        for instance_id, since in idle_since.items()
+        if instance_id not in forget
+    }
+    idle.update(dict.fromkeys(active, datetime.timedelta(0)))
+    return idle
+
+
+def get_grace_period(minutes=None):
+    """Return how long a server may stay idle before it is stopped."""
+    minutes = IDLE_GRACE_MINUTES if minutes is None else minutes
+    return datetime.timedelta(minutes=minutes)
+
+
+def group_by_time(times):
+    """Group instance IDs by their idle start time."""
+    groups = {}
+    for instance_id, seen in times.items():
+        groups.setdefault(seen, []).append(instance_id)
+    return groups
+
+
+def utcnow():
+    """Return the current time (UTC, second precision)."""
+    return datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+
+
+def format_time(value):
+    """Return the ISO 8601 representation of a time."""
+    return value.isoformat()
+
+
+def parse_time(value):
+    """Return the time of an ISO 8601 string (or None if malformed)."""
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        logger.warning('ignoring malformed %s value = %s', IDLE_TAG, value)
+        return None
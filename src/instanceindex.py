@@ -0,0 +1,135 @@
+"""Index of Minecraft game server instances and volumes by short name."""
+
+import logging
+import os
+import threading
+import time
+import awsclients
+import ec2mapper
+import myutils
+
+logger = myutils.get_logger(__name__, logging.INFO)
+
+# default index settings (overridable with environment variables)
+REFRESH_SECONDS = float(os.getenv('INSTANCE_INDEX_REFRESH_SECONDS', '900'))
+MISS_REFRESH_SECONDS = float(
+    os.getenv('INSTANCE_INDEX_MISS_REFRESH_SECONDS', '30'))
+DATA_DEVICE = os.getenv('DATA_DEVICE_NAME', '/dev/sdm')
+
+
+class InstanceIndex:
+    """Per-container index of game server instances (refreshed in batches).
+
+    Entries hold the 'name', 'instanceId', 'environment', 'rootVolumeId'
+    and 'dataVolumeId' (volume attached as DATA_DEVICE) of each server.
+
+    Parameters
+    ----------
+    refresh: float, optional
+        Seconds before the whole index is rebuilt (REFRESH_SECONDS)
+
+    miss_refresh: float, optional
+        Seconds before a lookup of an unknown name rebuilds the index (e.g.
+        a server launched since the last refresh; MISS_REFRESH_SECONDS)
+
+    timer: callable, optional
+        Clock returning seconds (defaults to time.monotonic)
+    """
+
+    def __init__(self, refresh=None, miss_refresh=None, timer=time.monotonic):
+        """Initialize an empty index (built on the first lookup)."""
+        self.refresh_seconds = REFRESH_SECONDS if refresh is None else refresh
+        self.miss_refresh_seconds = MISS_REFRESH_SECONDS \
+            if miss_refresh is None else miss_refresh
+        self.timer = timer
+        self._entries = {}
+        self._refreshed = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Return the number of indexed servers."""
+        return len(self._entries)
+
+    def get(self, name, deadline=None):
+        """Return the entry of a game server (or None if unknown).
+
+        A rebuild of the index needed by the lookup must fit the deadline
+        (see deadlines.Deadline) if any.
+        """
+        refreshed = self._refreshed
+        age = self.get_age()
+        if age is None or age >= self.refresh_seconds or \
+                (name not in self._entries
+                 and age >= self.miss_refresh_seconds):
+            with self._lock:
+                # concurrent callers share the refresh of the first one
+                if self._refreshed == refreshed:
+                    self._rebuild(deadline)
+        entry = self._entries.get(name)
+        return None if entry is None else dict(entry)
+
+    def refresh(self):
+        """Rebuild the index with one paginated describe_instances call."""
+        with self._lock:
+            self._rebuild()
+
+    def _rebuild(self, deadline=None):
+        """Rebuild the index (with the lock held)."""
+        self._entries = build(paginate(deadline))
+        self._refreshed = self.timer()
+        logger.info('indexed %d game servers', len(self._entries))
+
+    def get_age(self):
+        """Return seconds since the last refresh (None if never built)."""
+        if self._refreshed is None:
+            return None
+        return self.timer() - self._refreshed
+
+    def invalidate(self):
+        """Rebuild the index on the next lookup (e.g. a replaced instance)."""
+        with self._lock:
+            self._refreshed = None
+
+    def clear(self):
+        """Discard all entries."""
+        with self._lock:
+            self._entries = {}
+            self._refreshed = None
+
+
+def build(pages):
+    """Return index entries by short name from pages of EC2 instances."""
+    entries = {}
+    for page in pages:
+        for reservation in page.get('Reservations', []):
+            for instance in reservation.get('Instances', []):
+                entry = map_entry(instance)
+                if entry['name'] in entries:
+                    logger.warning('%s: ignoring duplicate instance %s',
+                                   entry['name'], entry['instanceId'])
+                    continue
+                entries[entry['name']] = entry
+    return entries
+
+
+def map_entry(instance):
+    """Map AWS EC2 instance data to an index entry."""
+    server = ec2mapper.map_instance(instance)
+    entry = {
+        'name': server['name'],
+        'instanceId': server['instanceId'],
+        'environment': server['environment']
+    }
+    entry.update(ec2mapper.map_volumes(instance, DATA_DEVICE))
+    return entry
+
+
+def paginate(deadline=None):
+    """Return an iterator over pages of all game server EC2 instances."""
+    filters = []
+    filters.append(myutils.get_application_filter())
+    filters.append(myutils.get_instance_filter())
+    ec2_client = awsclients.get_client('ec2', deadline=deadline)
+    paginator = ec2_client.get_paginator('describe_instances')
+    pages = paginator.paginate(Filters=filters)
+    return pages if deadline is None else deadline.iterate(pages)
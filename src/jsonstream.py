@@ -0,0 +1,111 @@
+"""Incremental JSON encoding of API listings within the payload limit."""
+
+import functools
+import json
+import logging
+import os
+import myutils
+import records
+
+logger = myutils.get_logger(__name__, logging.INFO)
+
+# Lambda proxy responses (including the JSON-escaped body) are limited to
+# 6 MB, so listings stop short of it (less a reserve for the envelope and
+# the 'nextToken' of the rest)
+MAX_RESPONSE_BYTES = int(os.getenv('MAX_RESPONSE_BYTES', '6291456'))
+RESERVE_BYTES = 4096
+
+# encoder of listed items: 'json' (standard library, same bytes as
+# json.dumps), 'orjson' (faster and compact, if installed) or 'auto'
+JSON_BACKEND = os.getenv('JSON_BACKEND', 'json')
+
+# JSON encoding of strings matching json.dumps defaults (ensure_ascii)
+encode_string = json.encoder.encode_basestring_ascii
+
+
+class Listing:
+    """JSON body of an API listing, encoded one item at a time.
+
+    Only the encoded items are kept, so items can come straight out of a
+    generator (e.g. one page of SDK data at a time) and be dropped.
+
+    Parameters
+    ----------
+    key: str, required
+        Key of the items in the body (e.g. 'snapshots')
+
+    max_bytes: float, optional
+        Size of the Lambda response at most (MAX_RESPONSE_BYTES)
+
+    backend: str, optional
+        Encoder of the items (JSON_BACKEND)
+    """
+
+    def __init__(self, key, max_bytes=None, backend=None):
+        """Initialize an empty listing."""
+        self.key = key
+        self.max_bytes = MAX_RESPONSE_BYTES if max_bytes is None \
+            else max_bytes
+        self.size = RESERVE_BYTES
+        self._encode = get_encoder(backend or JSON_BACKEND)
+        self._items = []
+
+    def __len__(self):
+        """Return the number of listed items."""
+        return len(self._items)
+
+    def add(self, item):
+        """Encode an item unless the listing is full (return False if so).
+
+        The first item is always listed, so a listing never stalls.
+        """
+        text = self._encode(item)
+        size = get_size(text) + 2
+        if self.size + size > self.max_bytes and len(self._items) > 0:
+            return False
+        self._items.append(text)
+        self.size += size
+        return True
+
+    def extend(self, items):
+        """Encode items until the listing is full (return False if so)."""
+        return all(map(self.add, items))
+
+    def to_json(self, **extra):
+        """Return the JSON body with extra keys (None values are left out).
+
+        The body is the same as json.dumps() of the equivalent dict.
+        """
+        body = '{' + encode_string(self.key) + ': [' + \
+            ', '.join(self._items) + ']'
+        for key, value in extra.items():
+            if value is not None:
+                body += ', ' + encode_string(key) + ': ' + json.dumps(value)
+        return body + '}'
+
+
+@functools.lru_cache(maxsize=None)
+def get_encoder(backend):
+    """Return the function encoding one listed item (see JSON_BACKEND)."""
+    if backend in ('orjson', 'auto'):
+        try:
+            import orjson  # pylint: disable=import-outside-toplevel
+        except ImportError:
+            if backend == 'orjson':
+                logger.warning('orjson is not installed (using json)')
+        else:
+            # orjson is a C extension that pylint cannot inspect
+            dumps = orjson.dumps  # pylint: disable=no-member
+
+            def encode(item):
+                return dumps(item, default=dict).decode('utf-8')
+            return encode
+    return records.dumps
+
+
+def get_size(text):
+    """Return the size of JSON text once escaped in the Lambda response."""
+    if text.isascii():
+        # JSON text holds no control characters, only quotes to escape
+        return len(text) + text.count('"') + text.count('\\')
+    return len(encode_string(text)) - 2
@@ -2,19 +2,49 @@
 
 import json
 import logging
-import boto3
+import os
+import awsclients
+import deadlines
 import ec2mapper
+import instanceindex
 import myutils
+import singleflight
+import ttlcache
 
 logger = myutils.get_logger(__name__, logging.INFO)
 
+# server states that can be requested by API clients
+STATES = ('running', 'stopped', 'rebooting')
 
+# server data by short name (invalidated whenever a state changes)
+SERVER_CACHE = ttlcache.TTLCache()
+
+# instance and volume IDs by short name (rebuilt in one batch when stale)
+INSTANCE_INDEX = instanceindex.InstanceIndex()
+
+# EC2 lookups shared by concurrent requests for the same instances
+LOOKUPS = singleflight.SingleFlight()
+
+# EC2 waiters used to wait for a requested state (seconds between polls)
+WAITERS = {'running': 'instance_running', 'stopped': 'instance_stopped'}
+WAITER_DELAY = int(os.getenv('WAITER_DELAY_SECONDS', '5'))
+
+
+@myutils.emit_metrics
 @myutils.log_calls(level=logging.DEBUG)
-def get_handler(event, context):  # pylint: disable=unused-argument
-    """REST API GET method to get data about a Minecraft game server."""
+def get_handler(event, context):
+    """REST API GET method to get data about a Minecraft game server.
+
+    A server that cannot be gathered within the invocation's time budget is
+    returned 'degraded' (with only its name and the 'error').
+    """
     # gather the server data
     name = event.get('pathParameters', {}).get('name')
-    server = gather(name)
+    deadline = deadlines.Deadline.from_context(context)
+    try:
+        server = gather(name, deadline)
+    except deadlines.get_timeout_errors() as error:
+        server = degrade({'name': name}, error)
 
     # return the HTTP payload
     return {
@@ -23,19 +53,52 @@ def get_handler(event, context):  # pylint: disable=unused-argument
     }
 
 
+@myutils.emit_metrics
 @myutils.log_calls(level=logging.DEBUG)
-def post_handler(event, context):  # pylint: disable=unused-argument
-    """REST API POST method to change a Minecraft game server."""
+def post_handler(event, context):
+    """REST API POST method to change a Minecraft game server.
+
+    The JSON body holds the target 'state' and an optional 'wait' flag to
+    respond once the server reaches that state (or the invocation runs out
+    of time, in which case 'waitTimedOut' is added to the response).
+
+    The response is a 504 if the state could not be changed within the
+    invocation's time budget, or the server is 'degraded' if only its
+    latest data could not be gathered.
+    """
     # gather the server data
     name = event.get('pathParameters', {}).get('name')
-    server = gather(name)
-
-    # review/change state of the server
     body = json.loads(event.get('body'))
-    change_server_state(server, body.get('state'))
+    state = body.get('state')
+    deadline = deadlines.Deadline.from_context(context)
+    try:
+        server = gather(name, deadline)
+
+        # review/change state of the server
+        new_state = change_server_state(server, state, deadline)
+    except deadlines.get_timeout_errors() as error:
+        logger.warning('%s: state not changed (%s)', name, error)
+        return {
+            'statusCode': 504,
+            'body': json.dumps({
+                'message': deadlines.describe(error)
+            })
+        }
+
+    # wait for the new state within the invocation's time budget (less
+    # the time needed to gather the latest data)
+    reached = True
+    if body.get('wait') and new_state is not None:
+        reached = wait_for_state(server, state, deadline.remaining(1.0))
 
     # gather latest server data for HTTP response
-    server = gather(name)
+    try:
+        server = gather(name, deadline)
+    except deadlines.get_timeout_errors() as error:
+        server = degrade(
+            dict(server, state=new_state or server.get('state')), error)
+    if not reached:
+        server['waitTimedOut'] = True
 
     # return the HTTP payload
     return {
@@ -44,31 +107,160 @@ def post_handler(event, context):  # pylint: disable=unused-argument
     }
 
 
+@myutils.emit_metrics
+@myutils.log_calls(level=logging.DEBUG)
+def state_handler(event, context):
+    """REST API GET method to get only the state of a Minecraft game server."""
+    name = event.get('pathParameters', {}).get('name')
+    deadline = deadlines.Deadline.from_context(context)
+    try:
+        state = gather_state(name, deadline=deadline)
+    except deadlines.get_timeout_errors() as error:
+        state = degrade({'name': name, 'instanceId': '', 'state': ''}, error)
+    return {
+        'statusCode': 200,
+        'body': json.dumps(state)
+    }
+
+
+@myutils.log_calls
+def gather(name, deadline=None):
+    """Return a Minecraft game server data (by server short name).
+
+    Parameters
+    ----------
+    name: str, required
+        Short name of the game server
+
+    deadline: deadlines.Deadline, optional
+        Deadline of the EC2 calls (see awsclients.get_client)
+
+    Returns
+    -------
+    Server data (empty if not found): dict
+    """
+    server = SERVER_CACHE.get(name)
+    if server is None:
+        server = lookup(name, deadline=deadline)
+        SERVER_CACHE.put(name, server)
+    return dict(server)
+
+
+@myutils.log_calls
+def gather_state(name, retry=True, deadline=None):
+    """Return the state of a game server from its indexed instance ID."""
+    entry = INSTANCE_INDEX.get(name, deadline)
+    if entry is None:
+        return {'name': name, 'instanceId': '', 'state': ''}
+
+    ec2_client = awsclients.get_client('ec2', deadline=deadline)
+    try:
+        resp = ec2_client.describe_instance_status(
+            InstanceIds=[entry['instanceId']],
+            IncludeAllInstances=True
+        )
+    except ec2_client.exceptions.ClientError as error:
+        if error.response['Error']['Code'] != 'InvalidInstanceID.NotFound' \
+                or not retry:
+            raise
+        # the instance was replaced, so rebuild the index
+        logger.warning('%s: discarding indexed instance ID (%s)', name, error)
+        INSTANCE_INDEX.invalidate()
+        SERVER_CACHE.invalidate(name)
+        return gather_state(name, retry=False, deadline=deadline)
+
+    statuses = resp.get('InstanceStatuses', [])
+    state = statuses[0]['InstanceState']['Name'] if len(statuses) else ''
+    return {
+        'name': name,
+        'instanceId': entry['instanceId'],
+        'state': state
+    }
+
+
 @myutils.log_calls
-def gather(name):
-    """Return a Minecraft game server data (by server short name)."""
+def wait_for_state(server, state, budget):
+    """Wait (at most budget seconds) for the server to reach the state.
+
+    Returns
+    -------
+    True if the state was reached (or cannot be waited for): bool
+    """
+    waiter_name = WAITERS.get(state)
+    if waiter_name is None or not server.get('instanceId'):
+        return True
+    if budget is None:
+        budget = WAITER_DELAY
+
+    # pylint: disable=import-outside-toplevel
+    import botocore.exceptions
+
+    ec2_client = awsclients.get_client('ec2')
+    waiter = ec2_client.get_waiter(waiter_name)
+    try:
+        waiter.wait(
+            InstanceIds=[server.get('instanceId')],
+            WaiterConfig={
+                'Delay': WAITER_DELAY,
+                'MaxAttempts': int(budget // WAITER_DELAY) + 1
+            }
+        )
+    except botocore.exceptions.WaiterError as error:
+        logger.info('%s: %s not reached in %ss (%s)',
+                    server.get('name'), state, budget, error)
+        return False
+    return True
+
+
+def lookup(name, retry=True, deadline=None):
+    """Return a Minecraft game server data from AWS (by server short name)."""
+    entry = INSTANCE_INDEX.get(name, deadline)
+    if entry is None:
+        return {}
+
+    # gather instance details from AWS with an ID-targeted query (shared
+    # with concurrent lookups of the same instance)
+    ec2_client = awsclients.get_client('ec2', deadline=deadline)
+    params = {
+        'InstanceIds': [entry['instanceId']],
+        'Filters': [myutils.get_instance_filter()]
+    }
+    try:
+        reservations = LOOKUPS.do(
+            singleflight.make_key('ec2.describe_instances', **params),
+            ec2_client.describe_instances, **params)
+    except ec2_client.exceptions.ClientError as error:
+        if error.response['Error']['Code'] != 'InvalidInstanceID.NotFound':
+            raise
+        reservations = {}
+
+    server = process_ec2_data(reservations)
+    if server.get('name') == name:
+        return server
+    if not retry:
+        return {}
+
+    # the instance was replaced or terminated, so rebuild the index
+    logger.warning('%s: discarding indexed instance ID %s',
+                   name, entry['instanceId'])
+    INSTANCE_INDEX.invalidate()
+    return lookup(name, retry=False, deadline=deadline)
+
+
+def degrade(server, error):
+    """Return the data gathered so far of a server that ran out of time."""
+    logger.warning('%s: degraded response (%s)', server.get('name'), error)
+    return dict(server, degraded=True, error=deadlines.describe(error))
+
+
+def get_full_names(name):
+    """Return the possible 'Name' tag values of a server short name."""
     # format tag names from short name
     v1_main_name = 'minecraft-main-server-{}'.format(name)
     v1_test_name = 'minecraft-test-server-{}'.format(name)
     v2_main_name = 'mcservers-main-hosts/{}/instance'.format(name)
     v2_test_name = 'mcservers-test-hosts/{}/instance'.format(name)
-
-    # gather instance details from AWS
-    filters = []
-    filters.append(myutils.get_application_filter())
-    filters.append(myutils.get_instance_filter())
-    filters.append({
-        'Name': 'tag:Name',
-        'Values': [
-            v1_main_name, v1_test_name,
-            v2_main_name, v2_test_name
-        ]
-    })
-    ec2_client = boto3.client('ec2')
-    reservations = ec2_client.describe_instances(Filters=filters)
-
-    server = process_ec2_data(reservations)
-    return server
+    return [v1_main_name, v1_test_name, v2_main_name, v2_test_name]
 
 
 @myutils.log_calls(level=logging.DEBUG)
@@ -89,23 +281,88 @@ def process_ec2_data(reservations):
 
 
 @myutils.log_calls
-def change_server_state(server, state):
+def change_server_state(server, state, deadline=None):
     """Review state of the server."""
-    ec2_client = boto3.client('ec2')
-    server_name = server.get('name')
-    instance_id = server.get('instanceId')
+    new_states, errors = change_servers_state([server], state, deadline)
+    if server.get('instanceId') in errors:
+        raise errors[server.get('instanceId')]
+    return new_states.get(server.get('instanceId'))
 
-    new_state = None
-    if state == 'running':
-        resp = ec2_client.start_instances(InstanceIds=[instance_id])
-        new_state = resp['StartingInstances'][0]['CurrentState']['Name']
-    elif state == 'stopped':
-        resp = ec2_client.stop_instances(InstanceIds=[instance_id])
-        new_state = resp['StoppingInstances'][0]['CurrentState']['Name']
-    elif state == 'rebooting':
-        resp = ec2_client.reboot_instances(InstanceIds=[instance_id])
-        new_state = 'pending'
+
+@myutils.log_calls
+def change_servers_state(servers, state, deadline=None):
+    """Change the state of many servers with one batched EC2 call.
+
+    If the batched call fails, each instance is changed on its own so that
+    one instance in an incorrect state does not fail the others.
+
+    Parameters
+    ----------
+    servers: list, required
+        Server data (see ec2mapper.map_instance)
+
+    state: str, required
+        Target state ('running', 'stopped' or 'rebooting')
+
+    deadline: deadlines.Deadline, optional
+        Deadline of the EC2 calls (see awsclients.get_client)
+
+    Returns
+    -------
+    New state by instance ID and the error (botocore ClientError) by
+    instance ID of the failed changes: tuple
+    """
+    ec2_client = awsclients.get_client('ec2', deadline=deadline)
+    server_names = [server.get('name') for server in servers]
+    instance_ids = [
+        server.get('instanceId') for server in servers
+        if server.get('instanceId')
+    ]
+
+    new_states = {}
+    errors = {}
+    if state not in STATES:
+        logger.warning('%s: invalid state = %s', server_names, state)
+    elif len(instance_ids) == 0:
+        logger.warning('%s: no instances to change', server_names)
     else:
-        logger.warning('%s: invalid state = %s', server_name, state)
+        try:
+            new_states = request_state(ec2_client, state, instance_ids)
+        except ec2_client.exceptions.ClientError as error:
+            if len(instance_ids) == 1:
+                errors[instance_ids[0]] = error
+            else:
+                logger.warning('%s: changing one instance at a time (%s)',
+                               server_names, error)
+                for instance_id in instance_ids:
+                    try:
+                        new_states.update(
+                            request_state(ec2_client, state, [instance_id]))
+                    except ec2_client.exceptions.ClientError as failure:
+                        errors[instance_id] = failure
+        for instance_id, error in errors.items():
+            logger.warning('%s: state not changed (%s)', instance_id, error)
+
+    for server_name in server_names:
+        SERVER_CACHE.invalidate(server_name)
+    return new_states, errors
+
+
+def request_state(ec2_client, state, instance_ids):
+    """Request a state of EC2 instances and return their new state by ID."""
+    if state == 'running':
+        resp = ec2_client.start_instances(InstanceIds=instance_ids)
+        return get_current_states(resp['StartingInstances'])
+    if state == 'stopped':
+        resp = ec2_client.stop_instances(InstanceIds=instance_ids)
+        return get_current_states(resp['StoppingInstances'])
+    ec2_client.reboot_instances(InstanceIds=instance_ids)
+    return dict.fromkeys(instance_ids, 'pending')
+
 
-    return new_state
+def get_current_states(state_changes):
+    """Return the current state by instance ID of EC2 state changes."""
+    return {
+        change['InstanceId']: change['CurrentState']['Name']
+        for change in state_changes
+    }
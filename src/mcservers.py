@@ -2,21 +2,37 @@
 
 import json
 import logging
-import boto3
+import awsclients
+import deadlines
 import ec2mapper
+import jsonstream
+import mcserver
 import myutils
+import queries
+import records
+import singleflight
 
 logger = myutils.get_logger(__name__, logging.INFO)
 
+# EC2 listings shared by concurrent requests with the same filters
+LISTINGS = singleflight.SingleFlight()
 
+
+@myutils.emit_metrics
 @myutils.log_calls(level=logging.DEBUG)
-def get_handler(event, context):  # pylint: disable=unused-argument
+def get_handler(event, context):
     """REST API GET method to list Minecraft game servers.
 
+    Servers listed once the invocation's time budget runs out are returned
+    with a 'degraded' flag (and the 'error').
+
     Parameters
     ----------
     event: dict, required
-        API Event Input Format
+        API Event Input Format with optional query string parameters:
+        'state' and 'environment' (comma-separated values filtered by EC2),
+        'sort' (a field, prefixed with '-' for descending order), 'limit'
+        and 'fields' (comma-separated fields kept of each server)
 
     context: object, required
         Lambda Context runtime methods and attributes
@@ -25,29 +41,212 @@ def get_handler(event, context):  # pylint: disable=unused-argument
     -------
     API Gateway Lambda Output Format: dict
     """
-    # gather data for HTTP response
-    servers = gather()
+    params = event.get('queryStringParameters') or {}
+    try:
+        states = queries.get_values(
+            params, 'state', myutils.get_instance_filter()['Values'])
+        environments = queries.get_values(params, 'environment')
+        sort = queries.get_sort(params, records.Server)
+        limit = queries.get_limit(params)
+        fields = queries.get_fields(params, records.Server)
+    except ValueError as error:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({
+                'message': str(error)
+            })
+        }
+
+    # encode servers as each page of EC2 instances arrives (a listing of
+    # instances cannot be resumed midway, nor outgrow the payload limit)
+    # unless they have to be sorted first
+    listing = jsonstream.Listing('servers', max_bytes=float('inf'))
+    servers = iterate(
+        deadline=deadlines.Deadline.from_context(context),
+        states=states, environments=environments)
+    gathered = []
+    degraded = {}
+    try:
+        if sort is None:
+            listing.extend(queries.select(servers, None, limit, fields))
+        else:
+            gathered.extend(servers)
+    except deadlines.get_timeout_errors() as error:
+        logger.warning('degraded listing of %d servers (%s)',
+                       len(listing) + len(gathered), error)
+        degraded = {'degraded': True, 'error': deadlines.describe(error)}
+    if sort is not None:
+        listing.extend(queries.select(gathered, sort, limit, fields))
 
     # return the HTTP payload
+    return {
+        'statusCode': 200,
+        'body': listing.to_json(**degraded)
+    }
+
+
+@myutils.emit_metrics
+@myutils.log_calls(level=logging.DEBUG)
+def post_handler(event, context):
+    """REST API POST method to change many Minecraft game servers at once.
+
+    Parameters
+    ----------
+    event: dict, required
+        API Event Input Format with a JSON body of the target 'state' and
+        the server 'names' (all servers if omitted)
+
+    context: object, required
+        Lambda Context runtime methods and attributes
+
+    Returns
+    -------
+    API Gateway Lambda Output Format: dict (a 504 if the servers could not
+    be changed within the invocation's time budget)
+    """
+    body = json.loads(event.get('body') or '{}')
+    state = body.get('state')
+    message = None
+    if state not in mcserver.STATES:
+        message = 'state must be one of {}'.format(', '.join(mcserver.STATES))
+    elif not is_names(body.get('names')):
+        message = 'names must be a list of server names'
+    if message is not None:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({
+                'message': message
+            })
+        }
+
+    # change the servers and return per-server results
+    try:
+        results = change_state(
+            body.get('names'), state,
+            deadlines.Deadline.from_context(context))
+    except deadlines.get_timeout_errors() as error:
+        logger.warning('servers not changed (%s)', error)
+        return {
+            'statusCode': 504,
+            'body': json.dumps({
+                'message': deadlines.describe(error)
+            })
+        }
     return {
         'statusCode': 200,
         'body': json.dumps({
-            'servers': servers
+            'servers': results
         })
     }
 
 
 @myutils.log_calls
-def gather():
-    """Return a list of Minecraft game servers."""
-    # initialize AWS SDK query filters
+def gather(names=None, deadline=None):
+    """Return a list of Minecraft game servers (optionally by short names).
+
+    Concurrent callers with the same filters share one listing.
+    """
+    key = singleflight.make_key(
+        'ec2.describe_instances', Filters=get_filters(names))
+    return list(LISTINGS.do(key, tuple, iterate(names, deadline)))
+
+
+def iterate(names=None, deadline=None, states=None, environments=None):
+    """Yield Minecraft game servers as each page of EC2 instances arrives.
+
+    Pages are requested while the deadline (if any) has not passed, so
+    the servers yielded so far are kept when DeadlineExceeded is raised.
+    """
+    # invoke the AWS SDK to get relevant EC2 instances (page by page)
+    ec2_client = awsclients.get_client('ec2', deadline=deadline)
+    paginator = ec2_client.get_paginator('describe_instances')
+    pages = paginator.paginate(
+        Filters=get_filters(names, states, environments))
+    if deadline is not None:
+        pages = deadline.iterate(pages)
+
+    yield from ec2mapper.parse_pages(pages)
+
+
+def is_names(names):
+    """Return True if names (of a request body) lists server names or is None.
+
+    A string would otherwise be iterated one character at a time.
+    """
+    return names is None or (
+        isinstance(names, list)
+        and all(isinstance(name, str) for name in names))
+
+
+def get_filters(names=None, states=None, environments=None):
+    """Return the SDK filters of game server instances.
+
+    Parameters
+    ----------
+    names: list, optional
+        Short names of the servers
+
+    states: list, optional
+        Instance states of the servers (among the active ones)
+
+    environments: list, optional
+        Environments of the servers (e.g. 'main')
+    """
     filters = []
     filters.append(myutils.get_application_filter())
-    filters.append(myutils.get_instance_filter())
+    instance_filter = myutils.get_instance_filter()
+    if states is not None:
+        instance_filter['Values'] = [
+            state for state in instance_filter['Values'] if state in states]
+    filters.append(instance_filter)
+    if environments is not None:
+        filters.append({
+            'Name': 'tag:Environment',
+            'Values': list(environments)
+        })
+    if names is not None:
+        filters.append({
+            'Name': 'tag:Name',
+            'Values': [
+                full_name
+                for name in names
+                for full_name in mcserver.get_full_names(name)
+            ]
+        })
+    return filters
+
+
+@myutils.log_calls
+def change_state(names, state, deadline=None):
+    """Change the state of many servers (all if names is None) at once.
+
+    Returns
+    -------
+    Per-server results with the previous and new state (and the 'error'
+    of a server that could not be changed): list
+    """
+    servers = gather(names, deadline) if names is None or len(names) else []
+    new_states, errors = mcserver.change_servers_state(
+        servers, state, deadline)
 
-    # invoke the AWS SDK to get relevant EC2 instances
-    ec2_client = boto3.client('ec2')
-    reservations = ec2_client.describe_instances(Filters=filters)
+    results = []
+    for server in servers:
+        instance_id = server.get('instanceId')
+        result = {
+            'name': server.get('name'),
+            'instanceId': instance_id,
+            'previousState': server.get('state'),
+            'state': new_states.get(instance_id, server.get('state'))
+        }
+        if instance_id in errors:
+            result['error'] = str(errors[instance_id])
+        results.append(result)
 
-    servers = ec2mapper.parse(reservations)
-    return servers
+    found = {server.get('name') for server in servers}
+    for name in names or []:
+        if name not in found:
+            results.append({
+                'name': name,
+                'error': 'server not found'
+            })
+    return results
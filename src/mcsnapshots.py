@@ -1,78 +1,524 @@
 """Handlers for API operations at /snapshots level."""
 
+import bisect
+import concurrent.futures
+import contextlib
 import datetime
+import functools
 import json
 import logging
-import boto3
+import os
+import awsclients
+import deadlines
 import ebsmapper
-import mcserver
+import jsonstream
 import myutils
+import queries
+import records
+import singleflight
+import snapshotcatalog
+import ttlcache
 
 logger = myutils.get_logger(__name__, logging.INFO)
 
+# only needed to create snapshots
+aiorcon = myutils.lazy_import('aiorcon')
+asyncio = myutils.lazy_import('asyncio')
+mcserver = myutils.lazy_import('mcserver')
+mcservers = myutils.lazy_import('mcservers')
+mcusers = myutils.lazy_import('mcusers')
+
+# snapshot listings by server name (invalidated whenever one is created)
+SNAPSHOT_CACHE = ttlcache.TTLCache()
+
+# snapshot listings shared by concurrent requests with the same filters
+LISTINGS = singleflight.SingleFlight()
+
+# number of snapshots requested from EC2 per page (5 to 1000)
+PAGE_SIZE = int(os.getenv('SNAPSHOTS_PAGE_SIZE', '1000'))
+
+# days of 'Timestamp' tags filtered by EC2 at most (200 values per filter)
+MAX_FILTER_DAYS = 200
+
+# local snapshot catalog file (e.g. '/tmp/snapshots.db'; off if empty)
+CATALOG_PATH = os.getenv('SNAPSHOT_CATALOG_PATH', '')
+
+# flush and pause world saves over RCON around snapshots of running servers
+# (overridable per request with the 'consistent' flag of the JSON body)
+CONSISTENT = os.getenv('SNAPSHOT_CONSISTENT', 'false').lower() == 'true'
+SAVE_TIMEOUT_SECONDS = float(os.getenv('SNAPSHOT_SAVE_TIMEOUT_SECONDS', '3'))
+SAVE_ON_ATTEMPTS = 2
+
+# number of snapshots created or deleted at once (within the client's pool)
+CONCURRENCY = int(os.getenv('SNAPSHOTS_CONCURRENCY', '8'))
+
 # =============================================================================
 # REST API handler methods
 # =============================================================================
 
 
+@myutils.emit_metrics
 @myutils.log_calls(level=logging.DEBUG)
-def get_handler(event, context):  # pylint: disable=unused-argument
-    """REST API GET method to list Minecraft game snapshots."""
-    # gather data for http response
-    server_name = event.get('pathParameters', {}).get('name')
-    snapshots = gather(server_name)
+def get_handler(event, context):
+    """REST API GET method to list Minecraft game snapshots.
+
+    A listing cut short by the invocation's time budget is 'degraded' and
+    resumes with its 'nextToken' (like one cut by the payload limit).
+    Snapshots can be filtered by 'event' and by 'since'/'until' timestamps
+    (filtered by EC2 as much as possible), and 'fields' keeps only some
+    fields of each snapshot. A sorted listing ('sort' by a field, prefixed
+    with '-' for descending order) cannot be paged, so it is 'truncated'
+    instead at the payload limit.
+    """
+    server_name = (event.get('pathParameters') or {}).get('name')
+    params = event.get('queryStringParameters') or {}
+    next_token = params.get('nextToken')
+
+    # validate the query of the client (if any)
+    try:
+        limit = queries.get_limit(params)
+        since = queries.get_timestamp(params, 'since')
+        until = queries.get_timestamp(params, 'until')
+        sort = queries.get_sort(params, records.Snapshot)
+        fields = queries.get_fields(params, records.Snapshot)
+        if sort is not None and next_token is not None:
+            raise ValueError('nextToken cannot be combined with sort')
+    except ValueError as error:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({
+                'message': str(error)
+            })
+        }
+
+    # encode snapshots as they arrive (up to the response payload limit)
+    # unless they have to be sorted first
+    listing = jsonstream.Listing('snapshots')
+    snapshots = SnapshotStream(
+        server_name, None if sort is not None else limit, next_token,
+        deadlines.Deadline.from_context(context),
+        event=params.get('event'), since=since, until=until)
+    gathered = []
+    degraded = {}
+    try:
+        if sort is None:
+            listing.extend(queries.select(snapshots, fields=fields))
+        else:
+            gathered.extend(snapshots)
+    except deadlines.get_timeout_errors() as error:
+        logger.warning('degraded listing of %d snapshots (%s)',
+                       len(listing) + len(gathered), error)
+        degraded = {'degraded': True, 'error': deadlines.describe(error)}
+    except ValueError:
+        return {
+            'statusCode': 400,
+            'body': json.dumps({
+                'message': 'nextToken is invalid'
+            })
+        }
+    if sort is None:
+        extra = {'nextToken': snapshots.get_token(len(listing))}
+    else:
+        full = not listing.extend(
+            queries.select(gathered, sort, limit, fields))
+        extra = {'truncated': full or None}
 
     # return the HTTP payload
     return {
         'statusCode': 200,
-        'body': json.dumps({
-            'snapshots': snapshots
-        })
+        'body': listing.to_json(**extra, **degraded)
     }
 
 
+@myutils.emit_metrics
 @myutils.log_calls(level=logging.DEBUG)
-def post_handler(event, context):  # pylint: disable=unused-argument
-    """REST API POST method to create new Minecraft game snapshots."""
-    server_name = event.get('pathParameters', {}).get('name', None)
-    event_name = json.loads(event.get('body')).get('event', '')
-
-    server_data = mcserver.gather(server_name)
-    instance_id = server_data.get('instanceId')
-    server_name = server_data.get('name', '')
-    environment = server_data.get('environment', '')
+def post_handler(event, context):
+    """REST API POST method to create new Minecraft game snapshots.
 
-    volume_id = None
-    if instance_id is not None:
-        volume_id = fetch_volume_id(instance_id)
+    The JSON body holds the snapshot 'event' and an optional 'consistent'
+    flag to flush the world of a running server first (see paused_saves).
+    The response is a 504 if the snapshot could not be requested within
+    the invocation's time budget.
+    """
+    server_name = event.get('pathParameters', {}).get('name', None)
+    body = json.loads(event.get('body'))
+    event_name = body.get('event', '')
+    consistent = body.get('consistent', CONSISTENT)
+    deadline = deadlines.Deadline.from_context(context)
 
-    snapshot = None
-    if volume_id is not None:
-        snapshot = create_snapshot(
-            volume_id, event_name, server_name, environment)
+    try:
+        snapshot, flushed = snapshot_server(
+            server_name, event_name, consistent, deadline)
+    except deadlines.get_timeout_errors() as error:
+        logger.warning('%s: not snapshotted (%s)', server_name, error)
+        return {
+            'statusCode': 504,
+            'body': json.dumps({
+                'message': deadlines.describe(error)
+            })
+        }
 
     # return the HTTP payload
     response = {}
     if snapshot is not None:
-        response = {
-            'snapshotId': snapshot.get('SnapshotId', ''),
-            'description': snapshot.get('Description', ''),
-            'state': snapshot.get('State', '')
-        }
+        response = format_snapshot(snapshot)
+        if consistent:
+            response['consistent'] = flushed
     return {
         'statusCode': 200,
         'body': json.dumps(response)
     }
 
 
+@myutils.emit_metrics
+@myutils.log_calls(level=logging.DEBUG)
+def post_all_handler(event, context):
+    """REST API POST method to snapshot many Minecraft game servers at once.
+
+    Parameters
+    ----------
+    event: dict, required
+        API Event Input Format with a JSON body of the snapshot 'event',
+        the server 'names' (all servers if omitted) and an optional
+        'consistent' flag (see paused_saves)
+
+    context: object, required
+        Lambda Context runtime methods and attributes
+
+    Returns
+    -------
+    API Gateway Lambda Output Format: dict (a 504 if the servers could not
+    be listed within the invocation's time budget, whereas servers that
+    could not be snapshotted in time have an 'error')
+    """
+    body = json.loads(event.get('body') or '{}')
+    names = body.get('names')
+    if not mcservers.is_names(names):
+        return {
+            'statusCode': 400,
+            'body': json.dumps({
+                'message': 'names must be a list of server names'
+            })
+        }
+    deadline = deadlines.Deadline.from_context(context)
+    try:
+        servers = mcservers.gather(names, deadline) \
+            if names is None or len(names) else []
+    except deadlines.get_timeout_errors() as error:
+        logger.warning('servers not listed for snapshots (%s)', error)
+        return {
+            'statusCode': 504,
+            'body': json.dumps({
+                'message': deadlines.describe(error)
+            })
+        }
+
+    # snapshot the servers and report the ones that were not found
+    results = create_snapshots(
+        servers, body.get('event', ''),
+        consistent=body.get('consistent', CONSISTENT), deadline=deadline)
+    found = {server.get('name') for server in servers}
+    for name in names or []:
+        if name not in found:
+            results.append({
+                'name': name,
+                'error': 'server not found'
+            })
+
+    # return the HTTP payload
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'snapshots': results
+        })
+    }
+
+
 # =============================================================================
 # REST API helper methods
 # =============================================================================
 
 @myutils.log_calls
 def gather(server_name):
-    """Return a list of Minecraft game snapshots."""
-    # initialize AWS SDK query filters
+    """Return a list of Minecraft game snapshots.
+
+    Concurrent callers with the same filters share one listing.
+    """
+    key = singleflight.make_key(
+        'ec2.describe_snapshots', Filters=get_filters(server_name))
+    return list(LISTINGS.do(key, tuple, SnapshotStream(server_name)))
+
+
+@myutils.log_calls
+def snapshot_server(server_name, event_name, consistent, deadline=None):
+    """Snapshot the data volume of a server (by short name).
+
+    Returns
+    -------
+    Created snapshot (None if the server or its volume was not found) and
+    whether the world was flushed first (None unless consistent): tuple
+    """
+    # resolve the data volume from the instance index (no EC2 call if warm)
+    entry = mcserver.INSTANCE_INDEX.get(server_name, deadline) or {}
+    instance_id = entry.get('instanceId')
+    server_name = entry.get('name', '')
+    environment = entry.get('environment', '')
+
+    volume_id = entry.get('dataVolumeId') or None
+    if instance_id is not None and volume_id is None:
+        # e.g. the volume was attached after the index was built
+        volume_id = fetch_volume_id(instance_id, deadline)
+
+    snapshot = None
+    flushed = None
+    if volume_id is not None:
+        saves = contextlib.nullcontext()
+        if consistent:
+            saves = paused_saves(
+                mcserver.gather(server_name, deadline), deadline=deadline)
+            deadline = get_paused_deadline(deadline)
+        with saves as flushed:
+            snapshot = create_snapshot(
+                volume_id, event_name, server_name, environment, deadline)
+    return snapshot, flushed
+
+
+@myutils.log_calls
+def gather_page(server_name, limit=None, next_token=None):
+    """Return one page of Minecraft game snapshots and the next page token."""
+    snapshots = SnapshotStream(server_name, limit, next_token)
+    return list(snapshots), snapshots.get_token()
+
+
+class SnapshotStream:
+    """Minecraft game snapshots yielded as each page of EBS snapshots arrives.
+
+    Snapshots come from the catalog (if enabled), from SNAPSHOT_CACHE or
+    from EC2, and a listing can stop after any of them (e.g. at the
+    response payload limit) since get_token() resumes right after it.
+
+    Parameters
+    ----------
+    server_name: str, required
+        Name of the game server (all servers if None)
+
+    limit: int, optional
+        Number of snapshots in the page (all of them by default)
+
+    next_token: str, optional
+        Token returned with the previous page (ValueError once iterated
+        if invalid)
+
+    deadline: deadlines.Deadline, optional
+        Deadline of the EC2 calls (DeadlineExceeded is raised between pages
+        once it has passed, and get_token() still resumes the listing)
+
+    event: str, optional
+        Event of the snapshots (e.g. 'nightly')
+
+    since: str, optional
+        Earliest 'timestamp' (ISO 8601, inclusive)
+
+    until: str, optional
+        Latest 'timestamp' (ISO 8601, exclusive)
+    """
+
+    def __init__(self, server_name, limit=None, next_token=None,
+                 deadline=None, event=None, since=None, until=None):
+        """Prepare the listing (nothing is requested until iterated)."""
+        self.server_name = server_name
+        self.limit = limit
+        self.next_token = next_token
+        self.deadline = deadline
+        self.event = event
+        self.since = since
+        self.until = until
+        self.count = 0
+        self._get_token = None
+
+    def __iter__(self):
+        """Yield the snapshots (see ebsmapper.map_snapshot)."""
+        catalog = get_catalog()
+        if catalog is not None:
+            snapshots, token = catalog.query(
+                server=self.server_name, event=self.event, since=self.since,
+                until=self.until, limit=self.limit,
+                next_token=self.next_token)
+            self._get_token = functools.partial(
+                get_catalog_token, snapshots, token, self.next_token)
+            yield from self._count(snapshots)
+            return
+
+        ranged = self.since is not None or self.until is not None
+        cached = self.limit is None and self.next_token is None \
+            and self.event is None and not ranged
+        if cached:
+            entry = SNAPSHOT_CACHE.get(self.server_name)
+            if entry is not None:
+                snapshots, bounds, token = entry
+                self._get_token = functools.partial(
+                    get_ec2_token, bounds, token, len(snapshots))
+                yield from self._count(snapshots)
+                return
+
+        # remember where each page starts to resume within any of them
+        request, skipped = decode_ec2_token(self.next_token)
+        pages = paginate(
+            self.server_name, self.limit, self.next_token,
+            get_days(self.since, self.until), self.deadline, self.event)
+        bounds = [(0, request, skipped, None)]
+        snapshots = []
+        self._get_token = functools.partial(
+            get_ec2_token, bounds, None, None)
+        for page in pages if self.deadline is None \
+                else self.deadline.iterate(pages):
+            page_snapshots = list(map(
+                ebsmapper.map_snapshot, page.get('Snapshots', [])))
+            if ranged:
+                # EC2 only filters whole days, so a listing stopped within
+                # the page resumes after the last snapshot in range
+                offsets = [
+                    index for index, snapshot in enumerate(page_snapshots)
+                    if self._in_range(snapshot['timestamp'])
+                ]
+                page_snapshots = [page_snapshots[i] for i in offsets]
+                bounds[-1] = bounds[-1][:3] + (offsets,)
+            if cached:
+                snapshots.extend(page_snapshots)
+            yield from self._count(page_snapshots)
+            if page.get('NextToken') is not None:
+                # a listing stopped here resumes with the next page
+                bounds.append((self.count, page.get('NextToken'), 0, None))
+
+        self._get_token = functools.partial(
+            get_ec2_token, bounds, pages.resume_token, self.count)
+        if cached:
+            SNAPSHOT_CACHE.put(
+                self.server_name, (snapshots, bounds, pages.resume_token))
+
+    def _in_range(self, timestamp):
+        """Return True if a timestamp is between since and until."""
+        return (self.since is None or timestamp >= self.since) and \
+            (self.until is None or timestamp < self.until)
+
+    def _count(self, snapshots):
+        """Yield snapshots, counting them."""
+        for snapshot in snapshots:
+            self.count += 1
+            yield snapshot
+
+    def get_token(self, count=None):
+        """Return the token of the snapshots following the first count ones.
+
+        Parameters
+        ----------
+        count: int, optional
+            Number of snapshots listed (all those iterated by default)
+
+        Returns
+        -------
+        Token of the next page (None if there is none): str
+        """
+        count = self.count if count is None else count
+        if self._get_token is None:
+            return self.next_token
+        return self._get_token(count)
+
+
+def get_catalog_token(snapshots, token, next_token, count):
+    """Return the token following a number of cataloged snapshots."""
+    if count >= len(snapshots):
+        return token
+    if count == 0:
+        return next_token
+    last = snapshots[count - 1]
+    return snapshotcatalog.encode_token(last['timestamp'], last['snapshotId'])
+
+
+def get_ec2_token(bounds, token, total, count):
+    """Return the token following a number of snapshots paginated by EC2.
+
+    Parameters
+    ----------
+    bounds: list, required
+        Start of each page (as a count of snapshots), its request token,
+        the snapshots skipped at its start and the offsets of the listed
+        ones within it (None if all of them are listed)
+
+    token: str, required
+        Resume token of the whole pagination (None if complete)
+
+    total: int, required
+        Number of paginated snapshots (None while paginating)
+
+    count: int, required
+        Number of snapshots followed by the token
+    """
+    if total is not None and count >= total:
+        return token
+    position = bisect.bisect_right([bound[0] for bound in bounds], count) - 1
+    start, request, skipped, offsets = bounds[max(position, 0)]
+    listed = count - start
+    if offsets is not None and listed > 0:
+        listed = offsets[listed - 1] + 1
+    return encode_ec2_token(request, skipped + listed)
+
+
+def decode_ec2_token(token):
+    """Return the request token and skipped snapshots of a resume token."""
+    if token is None:
+        return None, 0
+    # pylint: disable=import-outside-toplevel
+    import botocore.paginate
+
+    try:
+        decoded = botocore.paginate.TokenDecoder().decode(token)
+        return decoded.get('NextToken'), \
+            int(decoded.get('boto_truncate_amount', 0))
+    except (AttributeError, TypeError, ValueError) as error:
+        raise ValueError('invalid page token') from error
+
+
+def encode_ec2_token(request, skipped):
+    """Return the resume token of a page request skipping some snapshots."""
+    # pylint: disable=import-outside-toplevel
+    import botocore.paginate
+
+    token = {'NextToken': request}
+    if skipped > 0:
+        token['boto_truncate_amount'] = skipped
+    return botocore.paginate.TokenEncoder().encode(token)
+
+
+def iterate(server_name, days=None):
+    """Yield Minecraft game snapshots as each page of EBS snapshots arrives."""
+    yield from ebsmapper.parse_pages(paginate(server_name, days=days))
+
+
+def paginate(server_name, limit=None, next_token=None, days=None,
+             deadline=None, event=None):
+    """Return an iterator over pages of the raw EBS snapshot data.
+
+    Snapshots can be restricted to the days (e.g. '2022-03-16') of their
+    'Timestamp' tag, which is what a delta sync of the catalog needs, and
+    to an event.
+    """
+    # invoke AWS SDK to gather EBS snapshots (page by page)
+    ec2_client = awsclients.get_client('ec2', deadline=deadline)
+    paginator = ec2_client.get_paginator('describe_snapshots')
+    return paginator.paginate(
+        OwnerIds=['self'],
+        Filters=get_filters(server_name, days, event),
+        PaginationConfig={
+            'PageSize': PAGE_SIZE,
+            'MaxItems': limit,
+            'StartingToken': next_token
+        }
+    )
+
+
+def get_filters(server_name, days=None, event=None):
+    """Return the SDK filters of game snapshots (by server, days and event)."""
     filters = []
     filters.append(myutils.get_application_filter())
     if server_name is not None:
@@ -80,36 +526,187 @@ def gather(server_name):
             'Name': 'tag:Server',
             'Values': [server_name]
         })
+    if event is not None:
+        filters.append({
+            'Name': 'tag:Event',
+            'Values': [event]
+        })
+    if days is not None:
+        filters.append({
+            'Name': 'tag:Timestamp',
+            'Values': [day + '*' for day in days]
+        })
+    return filters
+
+
+def get_days(since, until):
+    """Return the days (e.g. '2022-03-16') of timestamps from since to until.
+
+    Snapshots are not timestamped later than the current day (plus one
+    for clock skew), so a range without 'until' ends there.
+
+    Returns
+    -------
+    Days to filter by (None if unbounded or too many to filter): list
+    """
+    if since is None:
+        return None
+    start = datetime.date.fromisoformat(since[:10])
+    end = datetime.date.today() + datetime.timedelta(days=1) \
+        if until is None else datetime.date.fromisoformat(until[:10])
+    count = (end - start).days + 1
+    if count > MAX_FILTER_DAYS:
+        return None
+    return [
+        (start + datetime.timedelta(days=day)).isoformat()
+        for day in range(max(count, 1))
+    ]
 
-    # invoke AWS SDK to gather EBS snapshots
-    ec2_client = boto3.client('ec2')
-    sdk_snapshots = ec2_client.describe_snapshots(Filters=filters)
 
-    # format raw AWS SDK data to user-friendly context
-    snapshots = ebsmapper.parse(sdk_snapshots)
-    return snapshots
+def get_catalog():
+    """Return the snapshot catalog synced with EC2 (None if disabled)."""
+    catalog = snapshotcatalog.open_catalog(CATALOG_PATH)
+    if catalog is not None:
+        days = catalog.get_sync_days()
+        if days is not None and len(days) == 0:
+            catalog.replace(iterate(None))
+        elif days is not None:
+            catalog.merge(iterate(None, days), days)
+    return catalog
 
 
 @myutils.log_calls(level=logging.DEBUG)
-def fetch_volume_id(instance_id):
+def fetch_volume_id(instance_id, deadline=None):
     """Return the volume ID of the given server."""
-    ec2_client = boto3.client('ec2')
-    response = ec2_client.describe_volumes(Filters=[
+    return fetch_volume_ids([instance_id], deadline).get(instance_id)
+
+
+@myutils.log_calls(level=logging.DEBUG)
+def fetch_volume_ids(instance_ids, deadline=None):
+    """Return the data volume ID by instance ID (one paged EC2 call)."""
+    volume_ids = {}
+    if len(instance_ids) == 0:
+        return volume_ids
+
+    ec2_client = awsclients.get_client('ec2', deadline=deadline)
+    paginator = ec2_client.get_paginator('describe_volumes')
+    pages = paginator.paginate(Filters=[
         {
             'Name': 'attachment.instance-id',
-            'Values': [instance_id]
+            'Values': list(instance_ids)
         },
         {
             'Name': 'attachment.device',
             'Values': ['/dev/sdm']
         }
     ])
-    volumes = response.get('Volumes', [])
-    return volumes[0].get('VolumeId', None) if len(volumes) else None
+    for page in pages if deadline is None else deadline.iterate(pages):
+        for volume in page.get('Volumes', []):
+            for attachment in volume.get('Attachments', []):
+                if attachment.get('Device') == '/dev/sdm':
+                    volume_ids.setdefault(
+                        attachment.get('InstanceId'), volume.get('VolumeId'))
+    return volume_ids
+
+
+@myutils.log_calls
+def create_snapshots(servers, event_name, concurrency=None, consistent=False,
+                     deadline=None):
+    """Snapshot the data volume of many servers through a bounded pool.
+
+    Parameters
+    ----------
+    servers: list, required
+        Server data (see ec2mapper.map_instance)
+
+    event_name: str, required
+        Event tagged on every snapshot (e.g. 'maintenance')
+
+    concurrency: int, optional
+        Number of concurrent create_snapshot calls (CONCURRENCY)
+
+    consistent: bool, optional
+        Flush the world of running servers first (see paused_saves)
+
+    deadline: deadlines.Deadline, optional
+        Deadline of the EC2 and RCON calls (servers not snapshotted in time
+        get an 'error')
+
+    Returns
+    -------
+    Per-server results with the snapshot (or the 'error'): list
+    """
+    # pylint: disable=import-outside-toplevel
+    import botocore.exceptions
+
+    concurrency = concurrency or CONCURRENCY
+    ec2_client = awsclients.get_client('ec2', deadline=deadline)
+    try:
+        volume_ids = fetch_volume_ids([
+            server.get('instanceId') for server in servers
+            if server.get('instanceId')
+        ], deadline)
+    except deadlines.get_timeout_errors() as error:
+        logger.warning('volumes not found in time (%s)', error)
+        return [
+            {
+                'name': server.get('name'),
+                'instanceId': server.get('instanceId'),
+                'error': deadlines.describe(error)
+            }
+            for server in servers
+        ]
+
+    def snapshot(server):
+        result = {
+            'name': server.get('name'),
+            'instanceId': server.get('instanceId')
+        }
+        volume_id = volume_ids.get(server.get('instanceId'))
+        if volume_id is None:
+            result['error'] = 'data volume not found'
+            return result
+        saves = contextlib.nullcontext()
+        snapshot_deadline = deadline
+        if consistent:
+            saves = paused_saves(server, deadline=deadline)
+            snapshot_deadline = get_paused_deadline(deadline)
+        try:
+            with saves as flushed:
+                response = create_snapshot(
+                    volume_id, event_name, server.get('name', ''),
+                    server.get('environment', ''), snapshot_deadline)
+        except ec2_client.exceptions.ClientError as error:
+            logger.warning('%s: not snapshotted (%s)',
+                           server.get('name'), error)
+            result['error'] = str(error)
+            return result
+        except deadlines.get_timeout_errors() as error:
+            logger.warning('%s: not snapshotted (%s)',
+                           server.get('name'), error)
+            result['error'] = deadlines.describe(error)
+            return result
+        except (botocore.exceptions.BotoCoreError, OSError) as error:
+            # e.g. EndpointConnectionError, so one server fails on its own
+            logger.warning('%s: not snapshotted (%s)',
+                           server.get('name'), error)
+            result['error'] = str(error)
+            return result
+        result.update(format_snapshot(response))
+        if consistent:
+            result['consistent'] = flushed
+        return result
+
+    if len(servers) == 0:
+        return []
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(concurrency, len(servers))) as executor:
+        return list(executor.map(snapshot, servers))
 
 
 @myutils.log_calls(level=logging.DEBUG)
-def create_snapshot(volume_id, event_name, server_name, environment):
+def create_snapshot(volume_id, event_name, server_name, environment,
+                    deadline=None):
     """Create a snapshot for the given volume ID."""
     now = datetime.datetime.now()
     timestamp = datetime.datetime.isoformat(now)
@@ -122,7 +719,7 @@ def create_snapshot(volume_id, event_name, server_name, environment):
         now.timestamp()
     )
 
-    ec2_client = boto3.client('ec2')
+    ec2_client = awsclients.get_client('ec2', deadline=deadline)
     response = ec2_client.create_snapshot(
         Description=desc,
         VolumeId=volume_id,
@@ -141,4 +738,147 @@ def create_snapshot(volume_id, event_name, server_name, environment):
             }
         ]
     )
+    SNAPSHOT_CACHE.clear()
+    catalog = snapshotcatalog.open_catalog(CATALOG_PATH)
+    if catalog is not None:
+        catalog.upsert([ebsmapper.map_snapshot(response)])
     return response
+
+
+@contextlib.contextmanager
+def paused_saves(server, timeout=None, deadline=None):
+    """Flush the world of a running server and pause saves within the block.
+
+    'save-off' and 'save-all flush' are sent over RCON before the block and
+    'save-on' is always sent afterwards (even if the flush or the block
+    fails). An EBS snapshot is point-in-time once create_snapshot returns,
+    so saves only pause while the snapshot is being requested.
+
+    Parameters
+    ----------
+    server: dict, required
+        Server data (see ec2mapper.map_instance)
+
+    timeout: float, optional
+        Seconds allowed per RCON command (SAVE_TIMEOUT_SECONDS)
+
+    deadline: deadlines.Deadline, optional
+        Deadline of the flush, which leaves time for every attempt of
+        'save-on' (sent whatever the time left), as must the calls of the
+        block (see get_paused_deadline)
+
+    Yields
+    ------
+    True if the world on disk is consistent (flushed or stopped): bool
+    """
+    timeout = SAVE_TIMEOUT_SECONDS if timeout is None else timeout
+    name = server.get('name')
+    address = server.get('publicIpAddress')
+    if server.get('state') != 'running' or not address:
+        yield server.get('state') == 'stopped'
+        return
+
+    # DeadlineExceeded is an OSError, so a flush out of time is skipped
+    errors = (OSError, aiorcon.RconError, asyncio.TimeoutError)
+    flush_deadline = get_paused_deadline(deadline, timeout)
+    try:
+        mcusers.send_command(
+            address, 'save-off', timeout, deadline=flush_deadline)
+    except ConnectionRefusedError as error:
+        # saves were never turned off, so there is nothing to resume
+        logger.warning('%s: world not flushed (%s)', name, error)
+        yield False
+        return
+    except errors as error:
+        logger.warning('%s: world not flushed (%s)', name, error)
+        flushed = False
+    else:
+        try:
+            mcusers.send_command(
+                address, 'save-all flush', timeout, deadline=flush_deadline)
+            flushed = True
+        except errors as error:
+            logger.warning('%s: world not flushed (%s)', name, error)
+            flushed = False
+
+    try:
+        yield flushed
+    finally:
+        for attempt in range(1, SAVE_ON_ATTEMPTS + 1):
+            try:
+                mcusers.send_command(address, 'save-on', timeout)
+                break
+            except errors as error:
+                logger.error('%s: saves not resumed (attempt %d: %s)',
+                             name, attempt, error)
+
+
+def get_paused_deadline(deadline, timeout=None):
+    """Return the deadline of calls made while saves are paused.
+
+    'save-on' is sent after them whatever the time left, so they leave
+    time for every attempt of it (see paused_saves).
+
+    Parameters
+    ----------
+    deadline: deadlines.Deadline, required
+        Deadline of the invocation (None if there is none)
+
+    timeout: float, optional
+        Seconds allowed per RCON command (SAVE_TIMEOUT_SECONDS)
+    """
+    timeout = SAVE_TIMEOUT_SECONDS if timeout is None else timeout
+    if deadline is None:
+        return None
+    return deadline.shorten(SAVE_ON_ATTEMPTS * timeout)
+
+
+def format_snapshot(snapshot):
+    """Map a created EBS snapshot to response message format."""
+    return {
+        'snapshotId': snapshot.get('SnapshotId', ''),
+        'description': snapshot.get('Description', ''),
+        'state': snapshot.get('State', '')
+    }
+
+
+@myutils.log_calls
+def delete_snapshots(snapshot_ids, concurrency=None):
+    """Delete snapshots through a bounded thread pool.
+
+    Parameters
+    ----------
+    snapshot_ids: list, required
+        IDs of the EBS snapshots to delete
+
+    concurrency: int, optional
+        Number of concurrent delete_snapshot calls (CONCURRENCY)
+
+    Returns
+    -------
+    Error message by snapshot ID of the failed deletions: dict
+    """
+    concurrency = concurrency or CONCURRENCY
+    ec2_client = awsclients.get_client('ec2')
+
+    def delete(snapshot_id):
+        try:
+            ec2_client.delete_snapshot(SnapshotId=snapshot_id)
+        except ec2_client.exceptions.ClientError as error:
+            logger.warning('%s: not deleted (%s)', snapshot_id, error)
+            return str(error)
+        return None
+
+    errors = {}
+    if len(snapshot_ids) > 0:
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=min(concurrency, len(snapshot_ids))) as executor:
+            results = executor.map(delete, snapshot_ids)
+            for snapshot_id, error in zip(snapshot_ids, results):
+                if error is not None:
+                    errors[snapshot_id] = error
+        SNAPSHOT_CACHE.clear()
+        catalog = snapshotcatalog.open_catalog(CATALOG_PATH)
+        if catalog is not None:
+            catalog.delete(set(snapshot_ids) - set(errors))
+    return errors
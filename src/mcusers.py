@@ -2,19 +2,40 @@
 
 import json
 import logging
-import boto3
-import parse
-import mcrcon
+import os
+import awsclients
+import deadlines
 import mcserver
+import mcservers
 import myutils
+import ttlcache
 
 logger = myutils.get_logger(__name__, logging.INFO)
 
+# only needed once a server is actually queried
+aiorcon = myutils.lazy_import('aiorcon')
+asyncio = myutils.lazy_import('asyncio')
+parse = myutils.lazy_import('parse')
 
+# RCON settings (overridable with environment variables)
+RCON_PORT = int(os.getenv('RCON_PORT', '25575'))
+RCON_PASSWORD_PARAM = '/minecraft/mcrcon/password'
+RCON_TIMEOUT_SECONDS = float(os.getenv('RCON_TIMEOUT_SECONDS', '3'))
+RCON_CONCURRENCY = int(os.getenv('RCON_CONCURRENCY', '16'))
+
+# decrypted RCON password (re-read from SSM once the TTL expires)
+PASSWORD_CACHE = ttlcache.TTLCache(
+    ttl=float(os.getenv('RCON_PASSWORD_TTL', '300')), maxsize=1)
+
+
+@myutils.emit_metrics
 @myutils.log_calls(level=logging.DEBUG)
-def get_handler(event, context):  # pylint: disable=unused-argument
+def get_handler(event, context):
     """REST API GET method to list users on a Minecraft game server.
 
+    Users that cannot be queried within the invocation's time budget have
+    a None 'count' and an 'error' (like the servers of a census).
+
     Parameters
     ----------
     event: dict, required
@@ -29,7 +50,15 @@ def get_handler(event, context):  # pylint: disable=unused-argument
     """
     # gather the HTTP payload
     name = event.get('pathParameters', {}).get('name')
-    users = gather(name)
+    try:
+        users = gather(name, deadlines.Deadline.from_context(context))
+    except deadlines.get_timeout_errors() as error:
+        logger.warning('%s: could not query users (%s)', name, error)
+        users = {
+            'count': None,
+            'names': [],
+            'error': deadlines.describe(error)
+        }
 
     # return the HTTP payload
     return {
@@ -38,15 +67,59 @@ def get_handler(event, context):  # pylint: disable=unused-argument
     }
 
 
+@myutils.emit_metrics
+@myutils.log_calls(level=logging.DEBUG)
+def get_all_handler(event, context):
+    """REST API GET method to list users on every Minecraft game server.
+
+    If the servers cannot be listed within the invocation's time budget,
+    no users are returned and the response is 'degraded'.
+
+    Parameters
+    ----------
+    event: dict, required
+        API Event Input Format
+
+    context: object, required
+        Lambda Context runtime methods and attributes
+
+    Returns
+    ------
+    API Gateway Lambda Proxy Output Format: dict
+    """
+    # query every running server within the invocation's time budget
+    deadline = deadlines.Deadline.from_context(context)
+    servers = []
+    response = {}
+    try:
+        servers = mcservers.gather(deadline=deadline)
+    except deadlines.get_timeout_errors() as error:
+        logger.warning('servers not listed for census (%s)', error)
+        response = {'degraded': True, 'error': deadlines.describe(error)}
+    users = census(servers, budget=deadline.remaining())
+
+    # return the HTTP payload
+    return {
+        'statusCode': 200,
+        'body': json.dumps(dict({
+            'servers': users
+        }, **response))
+    }
+
+
 @myutils.log_calls
-def gather(name):
-    """Return data about the users on a Minecraft game server."""
+def gather(name, deadline=None):
+    """Return data about the users on a Minecraft game server.
+
+    The EC2 and RCON calls must fit the deadline (see deadlines.Deadline)
+    if any.
+    """
     users = {
         'count': 0,
         'names': []
     }
 
-    server = mcserver.gather(name)
+    server = mcserver.gather(name, deadline)
     state = server.get('state')
     if state is None or state != 'running':
         return users
@@ -57,18 +130,9 @@ def gather(name):
         logger.error('could not find public IP address for %s', name)
         return users
 
-    # get mcrcon from parameter store
-    ssm = boto3.client('ssm')
-    mcrcon_pw_param = ssm.get_parameter(
-        Name='/minecraft/mcrcon/password',
-        WithDecryption=True
-    )
-    mcrcon_pw = mcrcon_pw_param.get('Parameter').get('Value')
-
     # get users from the game server
-    with mcrcon.MCRcon(address, mcrcon_pw) as mcr:
-        resp = mcr.command('list')
-        logger.debug('mcrcon "list" command returned = "%s"', resp)
+    resp = send_command(address, 'list', deadline=deadline)
+    logger.debug('mcrcon "list" command returned = "%s"', resp)
     users = parse_mcrcon_list(resp)
 
     return users
@@ -96,3 +160,151 @@ def parse_mcrcon_list(response):
         'count': count,
         'names': names
     }
+
+
+@myutils.log_calls
+def census(servers, timeout=None, concurrency=None, budget=None):
+    """Return users by server name, querying running servers concurrently.
+
+    Parameters
+    ----------
+    servers: list, required
+        Server data (see mcservers.gather)
+
+    timeout: float, optional
+        Seconds allowed per server (defaults to RCON_TIMEOUT_SECONDS)
+
+    concurrency: int, optional
+        Servers queried at once (defaults to RCON_CONCURRENCY)
+
+    budget: float, optional
+        Seconds allowed for the whole census (unlimited if None)
+
+    Returns
+    -------
+    Users ('count' & 'names') by server name: dict (servers that could not
+    be queried have a None 'count' and an 'error')
+    """
+    users = {}
+    running = []
+    for server in servers:
+        users[server.get('name')] = {'count': 0, 'names': []}
+        if server.get('state') == 'running':
+            if server.get('publicIpAddress'):
+                running.append(server)
+            else:
+                logger.error('could not find public IP address for %s',
+                             server.get('name'))
+
+    if len(running) > 0:
+        users.update(asyncio.run(census_async(
+            running,
+            get_password(),
+            RCON_TIMEOUT_SECONDS if timeout is None else timeout,
+            RCON_CONCURRENCY if concurrency is None else concurrency,
+            budget
+        )))
+    return users
+
+
+async def census_async(servers, password, timeout, concurrency, budget):
+    """Query the users of the given servers with bounded concurrency."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def query(server):
+        async with semaphore:
+            with myutils.timed('rcon.list'):
+                resp = await aiorcon.command(
+                    server.get('publicIpAddress'), RCON_PORT, password,
+                    'list', timeout)
+        logger.debug('%s: "list" command returned = "%s"',
+                     server.get('name'), resp)
+        return parse_mcrcon_list(resp)
+
+    tasks = {
+        server.get('name'): asyncio.ensure_future(query(server))
+        for server in servers
+    }
+    _, pending = await asyncio.wait(tasks.values(), timeout=budget)
+    for task in pending:
+        task.cancel()
+
+    users = {}
+    for name, task in tasks.items():
+        if task in pending:
+            error = 'census time budget exceeded'
+        elif task.exception() is not None:
+            error = repr(task.exception())
+            if isinstance(task.exception(), asyncio.TimeoutError):
+                error = 'timed out after {}s'.format(timeout)
+        else:
+            users[name] = task.result()
+            continue
+        logger.warning('%s: could not query users (%s)', name, error)
+        users[name] = {'count': None, 'names': [], 'error': error}
+    return users
+
+
+# =============================================================================
+# RCON commands
+# =============================================================================
+
+def get_password(deadline=None):
+    """Return the decrypted RCON password (cached per container)."""
+    password = PASSWORD_CACHE.get(RCON_PASSWORD_PARAM)
+    if password is None:
+        ssm = awsclients.get_client('ssm', deadline=deadline)
+        mcrcon_pw_param = ssm.get_parameter(
+            Name=RCON_PASSWORD_PARAM,
+            WithDecryption=True
+        )
+        password = mcrcon_pw_param.get('Parameter').get('Value')
+        PASSWORD_CACHE.put(RCON_PASSWORD_PARAM, password)
+    return password
+
+
+def send_command(address, command, timeout=None, port=None, deadline=None):
+    """Run an RCON command over a new connection within a time limit.
+
+    The whole exchange, login included, fits the time limit (or the
+    deadline if any), so this is safe to call from worker threads. A
+    rejected login is retried once with the password re-read from SSM.
+
+    Raises asyncio.TimeoutError, OSError (e.g. deadlines.DeadlineExceeded)
+    or aiorcon.RconError on failure.
+    """
+    with myutils.timed(get_metric_name(command)):
+        try:
+            return send_once(address, command, timeout, port, deadline)
+        except aiorcon.LoginError:
+            # the password may have been rotated since it was cached
+            PASSWORD_CACHE.clear()
+            return send_once(address, command, timeout, port, deadline)
+
+
+def send_once(address, command, timeout, port, deadline):
+    """Log in and run an RCON command once (see send_command)."""
+    password = get_password(deadline)
+    return asyncio.run(aiorcon.command(
+        address,
+        port or RCON_PORT,
+        password,
+        command,
+        get_timeout(deadline, timeout)
+    ))
+
+
+def get_metric_name(command):
+    """Return the metric timing an RCON command (e.g. 'rcon.save-all')."""
+    return 'rcon.' + command.split(' ', 1)[0]
+
+
+def get_timeout(deadline=None, timeout=None):
+    """Return the seconds allowed for an RCON exchange within a deadline.
+
+    The exchange takes at most timeout seconds (RCON_TIMEOUT_SECONDS).
+    """
+    timeout = RCON_TIMEOUT_SECONDS if timeout is None else timeout
+    if deadline is None:
+        return timeout
+    return deadline.get_timeout(timeout, 'RCON command')
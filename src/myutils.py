@@ -1,7 +1,80 @@
 """Utilities for this application (e.g. logging aspects)."""
 
+import contextlib
 import functools
+import importlib.util
+import json
 import logging
+import os
+import random
+import reprlib
+import sys
+import threading
+import time
+import types
+
+# payload logging limits (overridable with environment variables)
+LOG_PAYLOAD_LIMIT = int(os.getenv('LOG_PAYLOAD_LIMIT', '1000'))
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv('LOG_PAYLOAD_SAMPLE_RATE', '1.0'))
+
+# per-request metrics (CloudWatch Embedded Metric Format log lines)
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+METRICS_NAMESPACE = os.getenv('METRICS_NAMESPACE', 'mcservers')
+
+# bounded repr() so large SDK payloads are never fully stringified
+_payload_repr = reprlib.Repr()
+_payload_repr.maxlevel = 4
+_payload_repr.maxdict = 16
+_payload_repr.maxlist = 16
+_payload_repr.maxtuple = 16
+_payload_repr.maxstring = 200
+_payload_repr.maxother = 200
+
+# lazily imported modules are executed one at a time (and only once)
+_lazy_lock = threading.RLock()
+_loading = set()
+
+
+class LazyModule(types.ModuleType):
+    """Module executed on its first attribute access (see lazy_import).
+
+    Unlike importlib.util.LazyLoader (before Python 3.12), the module is
+    executed once under a lock, so worker threads touching it at the same
+    time never see it half loaded.
+    """
+
+    def __getattr__(self, attr):
+        """Execute the module (unless another thread did) and get attr."""
+        with _lazy_lock:
+            if type(self) is LazyModule:
+                if self.__name__ in _loading:
+                    # e.g. 'from . import name' while the package executes
+                    raise AttributeError('module {!r} has no attribute '
+                                         '{!r}'.format(self.__name__, attr))
+                _loading.add(self.__name__)
+                try:
+                    self.__spec__.loader.exec_module(self)
+                finally:
+                    _loading.discard(self.__name__)
+                self.__class__ = types.ModuleType
+        return getattr(self, attr)
+
+
+def lazy_import(name):
+    """Return a module that is only loaded on first attribute access.
+
+    Keeps heavy dependencies off the Lambda cold-start path of handlers
+    that never use them.
+    """
+    with _lazy_lock:
+        module = sys.modules.get(name)
+        if module is not None:
+            return module
+        spec = importlib.util.find_spec(name)
+        module = importlib.util.module_from_spec(spec)
+        module.__class__ = LazyModule
+        sys.modules[name] = module
+    return module
 
 
 def get_logger(module_name, level):
@@ -17,21 +90,37 @@ def get_logger(module_name, level):
     return logger
 
 
-def log_calls(func=None, level=logging.INFO):
-    """Define a decorator for logging a method call (args & returns)."""
+def log_calls(func=None, level=logging.INFO, limit=None, sample_rate=None):
+    """Define a decorator for logging a method call (args & returns).
+
+    Nothing is formatted unless the module logger is enabled for the level.
+    Argument and result payloads are truncated to *limit* characters and
+    only included in a *sample_rate* fraction of calls (defaults are
+    LOG_PAYLOAD_LIMIT and LOG_PAYLOAD_SAMPLE_RATE).
+    """
     if not func:
-        return functools.partial(log_calls, level=level)
+        return functools.partial(
+            log_calls, level=level, limit=limit, sample_rate=sample_rate)
 
     logger = logging.getLogger(func.__module__)
+    method = '{}.{}'.format(func.__module__, func.__name__)
+
+    def logged(*args, **kwds):
+        if not logger.isEnabledFor(level):
+            return func(*args, **kwds)
+
+        # decide whether this call includes the payloads
+        rate = LOG_PAYLOAD_SAMPLE_RATE if sample_rate is None else sample_rate
+        sampled = rate >= 1.0 or random.random() < rate
+        size = LOG_PAYLOAD_LIMIT if limit is None else limit
 
-    @functools.wraps(func)
-    def wrapper(*args, **kwds):
         # log before entering the function
         start = {
-            'method': '{}.{}'.format(func.__module__, func.__name__),
-            'state': 'entering',
-            'args': [*args]
+            'method': method,
+            'state': 'entering'
         }
+        if sampled:
+            start['args'] = Payload(args, size)
         logger.log(level, '%s', start)
 
         # call the function
@@ -40,17 +129,243 @@ def log_calls(func=None, level=logging.INFO):
         # log after exiting the function
         if result is not None:
             end = {
-                'method': '{}.{}'.format(func.__module__, func.__name__),
-                'state': 'exited',
-                'args': [*args],
-                'result': result
+                'method': method,
+                'state': 'exited'
             }
+            if sampled:
+                end['result'] = Payload(result, size)
             logger.log(level, '%s', end)
 
         return result
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwds):
+        # time the call if a request is being measured (see emit_metrics)
+        metrics = _metrics
+        if metrics is None:
+            return logged(*args, **kwds)
+        started = time.perf_counter()
+        try:
+            return logged(*args, **kwds)
+        finally:
+            metrics.add_timing(method, time.perf_counter() - started)
+    return wrapper
+
+
+class Payload:  # pylint: disable=too-few-public-methods
+    """Logged payload that is only formatted if a handler emits the record."""
+
+    __slots__ = ('value', 'limit')
+
+    def __init__(self, value, limit):
+        """Wrap the payload value and its character limit."""
+        self.value = value
+        self.limit = limit
+
+    def __repr__(self):
+        """Return the truncated representation of the payload."""
+        return format_payload(self.value, self.limit)
+
+
+# =============================================================================
+# Request metrics
+# =============================================================================
+
+_metrics = None
+_cold_start = True
+
+
+class RequestMetrics:
+    """Timings and AWS API calls of one Lambda request.
+
+    Timings are kept by name (e.g. 'mcservers.gather' or 'rcon.list') as a
+    call count and total milliseconds, and AWS API calls (e.g.
+    'ec2.DescribeInstances') also count their retries. Worker threads of
+    the request share the same metrics.
+    """
+
+    def __init__(self):
+        """Initialize empty metrics."""
+        self.timings = {}
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def add_timing(self, name, seconds):
+        """Add one timed call."""
+        with self._lock:
+            timing = self.timings.setdefault(name, [0, 0.0])
+            timing[0] += 1
+            timing[1] += seconds * 1000
+
+    def add_call(self, name, seconds, retries):
+        """Add one AWS API call (with its retries)."""
+        with self._lock:
+            call = self.calls.setdefault(name, [0, 0, 0.0])
+            call[0] += 1
+            call[1] += retries
+            call[2] += seconds * 1000
+
+    def to_emf(self, function, duration, cold_start, properties=None):
+        """Return the Embedded Metric Format document of the request."""
+        with self._lock:
+            calls = {name: list(call) for name, call in self.calls.items()}
+            timings = {
+                name: list(timing) for name, timing in self.timings.items()
+            }
+        rcon = [timing for name, timing in timings.items()
+                if name.startswith('rcon.')]
+        values = {
+            'Duration': (round(duration * 1000, 3), 'Milliseconds'),
+            'ColdStart': (int(cold_start), 'Count'),
+            'AwsCalls': (sum(call[0] for call in calls.values()), 'Count'),
+            'AwsRetries': (sum(call[1] for call in calls.values()), 'Count'),
+            'AwsTime': (round(sum(
+                call[2] for call in calls.values()), 3), 'Milliseconds'),
+            'RconCalls': (sum(timing[0] for timing in rcon), 'Count'),
+            'RconTime': (round(sum(
+                timing[1] for timing in rcon), 3), 'Milliseconds')
+        }
+        document = {
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': METRICS_NAMESPACE,
+                    'Dimensions': [['Function']],
+                    'Metrics': [
+                        {'Name': name, 'Unit': unit}
+                        for name, (_, unit) in values.items()
+                    ]
+                }]
+            },
+            'Function': function
+        }
+        document.update(
+            (name, value) for name, (value, _) in values.items())
+        document['Calls'] = {
+            name: {'count': count, 'retries': retries, 'ms': round(ms, 3)}
+            for name, (count, retries, ms) in sorted(calls.items())
+        }
+        document['Timings'] = {
+            name: {'count': count, 'ms': round(ms, 3)}
+            for name, (count, ms) in sorted(timings.items())
+        }
+        document.update(properties or {})
+        return document
+
+
+def emit_metrics(func):
+    """Define a decorator emitting the metrics of each Lambda request.
+
+    One CloudWatch Embedded Metric Format line is printed per request with
+    its duration, cold start flag, AWS API calls (see instrument_client),
+    RCON round-trips and the time spent in each log_calls function.
+    """
+    function = '{}.{}'.format(func.__module__, func.__name__)
+
+    @functools.wraps(func)
+    def wrapper(event, context):
+        global _metrics, _cold_start  # pylint: disable=global-statement
+        if not METRICS_ENABLED:
+            return func(event, context)
+
+        metrics = RequestMetrics()
+        cold_start = _cold_start
+        _cold_start = False
+        _metrics = metrics
+        started = time.perf_counter()
+        try:
+            return func(event, context)
+        finally:
+            duration = time.perf_counter() - started
+            _metrics = None
+            properties = {
+                'RequestId': getattr(context, 'aws_request_id', None),
+                'FunctionName': getattr(context, 'function_name', None)
+            }
+            print(json.dumps(metrics.to_emf(
+                function, duration, cold_start, properties)), flush=True)
     return wrapper
 
 
+@contextlib.contextmanager
+def timed(name):
+    """Time a block in the metrics of the current request (if any)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics = _metrics
+        if metrics is not None:
+            metrics.add_timing(name, time.perf_counter() - started)
+
+
+def instrument_client(client):
+    """Count and time every API call (and retry) of an AWS SDK client."""
+    events = client.meta.events
+    events.register('before-parameter-build', start_aws_call,
+                    unique_id='myutils.start_aws_call')
+    events.register('after-call', end_aws_call,
+                    unique_id='myutils.end_aws_call')
+    events.register('after-call-error', end_aws_call,
+                    unique_id='myutils.end_aws_call_error')
+    return client
+
+
+def start_aws_call(model, context, **kwargs):
+    """Start timing an AWS API call (botocore event handler)."""
+    if _metrics is not None:
+        name = '{}.{}'.format(model.service_model.service_name, model.name)
+        context['myutils_call'] = (name, time.perf_counter())
+
+
+def end_aws_call(context, **kwargs):
+    """Stop timing an AWS API call (botocore event handler)."""
+    metrics = _metrics
+    call = context.pop('myutils_call', None)
+    if metrics is not None and call is not None:
+        name, started = call
+        attempts = context.get('retries', {}).get('attempt', 1)
+        metrics.add_call(name, time.perf_counter() - started, attempts - 1)
+
+
+def format_payload(payload, limit):
+    """Return a representation of a logged payload of at most limit chars."""
+    if is_small_payload(payload):
+        text = repr(payload)
+    else:
+        text = _payload_repr.repr(payload)
+    if len(text) > limit:
+        text = '{}...({} chars)'.format(text[:limit], len(text))
+    return text
+
+
+def is_small_payload(payload, budget=64):
+    """Return True if the payload holds at most *budget* nested items."""
+    pending = [payload]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, dict):
+            value = value.values()
+        elif not isinstance(value, (list, tuple, set)):
+            continue
+        budget -= len(value)
+        if budget < 0:
+            return False
+        pending.extend(value)
+    return True
+
+
+def get_time_budget(context, reserve=1.0):
+    """Return seconds left in the Lambda invocation (less a reserve).
+
+    Returns None when the context has no remaining time (e.g. in tests).
+    """
+    remaining = getattr(context, 'get_remaining_time_in_millis', None)
+    if remaining is None:
+        return None
+    return max(remaining() / 1000.0 - reserve, 0.0)
+
+
 def get_application_filter():
     """Return SDK filter to return Minecraft application resources."""
     return {
@@ -74,3 +389,11 @@ def get_first(key, tags):
     """Return first tag value associated with the provided tag key."""
     values = list(filter(lambda d: d.get('Key') == key, tags))
     return values[0].get('Value', '') if len(values) > 0 else ''
+
+
+def index_tags(tags):
+    """Return tag values by tag key in a single pass (first value wins)."""
+    index = {}
+    for tag in tags:
+        index.setdefault(tag.get('Key'), tag.get('Value', ''))
+    return index
@@ -0,0 +1,59 @@
+"""Parsing of the names given to game server instances and snapshots.
+
+Instances are named 'minecraft-{env}-server-{name}' (v1) or
+'mcservers-{env}-hosts/{name}/instance' (v2), and snapshots are named
+'mcservers-{env}-{name}-{timestamp}' (v2) or 'minecraft-{env}-server-{name}'
+followed by anything (legacy). Names that fit no scheme are parsed like
+their closest scheme (e.g. the last '-' separated part of an instance name).
+"""
+
+import functools
+import os
+import re
+
+# distinct instance names remembered by the parser
+NAME_CACHE_SIZE = int(os.getenv('NAME_CACHE_SIZE', '4096'))
+
+# short name of an instance: v2 name, else the last '-' separated part
+INSTANCE_PATTERN = re.compile(
+    r'mcservers-[^/]*/(?P<v2>[^/]*)|(?:.*-)?(?P<v1>[^-]*)$', re.DOTALL)
+
+
+@functools.lru_cache(maxsize=NAME_CACHE_SIZE)
+def get_instance_name(full_name):
+    """Return the short server name of an instance 'Name' tag."""
+    match = INSTANCE_PATTERN.match(full_name)
+    return match.group('v2') if match.group('v2') is not None \
+        else match.group('v1')
+
+
+def get_snapshot_server(name):
+    """Return the short server name of a snapshot 'Name' tag.
+
+    Snapshot names end with a unique timestamp, so they are not memoized
+    (and a bounded split beats a regular expression on such short names).
+    """
+    parts = name.split('-', 4)
+    position = 3 if parts[0] == 'minecraft' else 2
+    return parts[position] if len(parts) > position else ''
+
+
+def get_instance_names(full_names):
+    """Return the short server names of a page of instance 'Name' tags."""
+    return parse_many(get_instance_name, full_names)
+
+
+def get_snapshot_servers(names):
+    """Return the short server names of a page of snapshot 'Name' tags."""
+    return parse_many(get_snapshot_server, names)
+
+
+def parse_many(parser, names):
+    """Return the parsed names, parsing each distinct name only once."""
+    parsed = {name: parser(name) for name in set(names)}
+    return [parsed[name] for name in names]
+
+
+def clear_caches():
+    """Forget every memoized name."""
+    get_instance_name.cache_clear()
@@ -0,0 +1,129 @@
+"""Query string parameters of API listings (filters, sort, limit, fields).
+
+Every parser returns None for a missing parameter and raises ValueError
+with the message of a 400 response for an invalid one.
+"""
+
+import datetime
+import itertools
+import operator
+import records
+
+
+def get_values(params, key, allowed=None):
+    """Return the comma-separated values of a parameter (e.g. 'state').
+
+    Parameters
+    ----------
+    params: dict, required
+        Query string parameters of the API event
+
+    key: str, required
+        Name of the parameter
+
+    allowed: tuple, optional
+        Values accepted (any by default)
+
+    Returns
+    -------
+    Distinct values in the order given (None if missing): list
+    """
+    value = params.get(key)
+    if value is None:
+        return None
+    values = list(dict.fromkeys(
+        item.strip() for item in value.split(',') if item.strip()))
+    if len(values) == 0:
+        raise ValueError('{} must not be empty'.format(key))
+    if allowed is not None and not set(values) <= set(allowed):
+        raise ValueError('{} must be among {}'.format(
+            key, ', '.join(allowed)))
+    return values
+
+
+def get_limit(params):
+    """Return the number of items requested (None for all of them)."""
+    limit = params.get('limit')
+    if limit is None:
+        return None
+    try:
+        limit = int(limit)
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        raise ValueError('limit must be a positive integer')
+    return limit
+
+
+def get_fields(params, record_type):
+    """Return the fields to keep of each record (None for all of them)."""
+    fields = get_values(params, 'fields', record_type.__slots__)
+    return None if fields is None else tuple(fields)
+
+
+def get_sort(params, record_type):
+    """Return the field to sort records by and whether it is descending.
+
+    A field prefixed with '-' (e.g. '-timestamp') sorts in descending
+    order.
+
+    Returns
+    -------
+    Field and reverse flag (None if unsorted): tuple
+    """
+    sort = params.get('sort')
+    if sort is None:
+        return None
+    field = sort[1:] if sort.startswith('-') else sort
+    if field not in record_type.__slots__:
+        raise ValueError(
+            'sort must be one of {} (prefixed with - for descending '
+            'order)'.format(', '.join(record_type.__slots__)))
+    return field, sort.startswith('-')
+
+
+def get_timestamp(params, key):
+    """Return an ISO 8601 timestamp parameter (e.g. 'since') as tagged.
+
+    Snapshots are tagged with their local creation time (without a time
+    zone), so timestamps are normalized to compare with the tags as text.
+    """
+    value = params.get(key)
+    if value is None:
+        return None
+    try:
+        timestamp = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        timestamp = None
+    if timestamp is None or timestamp.tzinfo is not None:
+        raise ValueError('{} must be an ISO 8601 timestamp without time '
+                         'zone (e.g. 2021-04-20T06:26:40)'.format(key))
+    return timestamp.isoformat()
+
+
+def select(items, sort=None, limit=None, fields=None):
+    """Return an iterator over sorted, limited and projected records.
+
+    Parameters
+    ----------
+    items: iterable, required
+        Records of a listing (consumed lazily unless sorted)
+
+    sort: tuple, optional
+        Field and reverse flag (see get_sort)
+
+    limit: int, optional
+        Number of records at most
+
+    fields: tuple, optional
+        Fields kept of each record (see records.get_projection)
+    """
+    if sort is not None:
+        field, reverse = sort
+        items = sorted(items, key=operator.itemgetter(field),
+                       reverse=reverse)
+    if limit is not None:
+        items = itertools.islice(items, limit)
+    if fields is not None:
+        items = map(records.get_projection(fields), items)
+    return iter(items)
@@ -0,0 +1,126 @@
+"""Compact records of game servers and snapshots (read like dicts)."""
+
+import collections.abc
+import functools
+import json
+import operator
+
+# JSON encoding of strings matching json.dumps defaults (ensure_ascii)
+encode_string = json.encoder.encode_basestring_ascii
+
+
+class Record(collections.abc.Mapping):
+    """Slotted record with a read-only dict-like interface.
+
+    Records compare equal to dicts of the same items, convert with dict()
+    and encode with to_json() exactly like json.dumps() of that dict.
+    Subclasses only declare their fields with __slots__.
+    """
+
+    __slots__ = ()
+
+    def __init_subclass__(cls, **kwargs):
+        """Precompute the fields and JSON template of a record type."""
+        super().__init_subclass__(**kwargs)
+        cls._fields = frozenset(cls.__slots__)
+        cls._values = operator.attrgetter(*cls.__slots__)
+        if len(cls.__slots__) == 1:
+            # attrgetter of a single field returns its value, not a tuple
+            field = cls.__slots__[0]
+            cls._values = staticmethod(
+                lambda record: (getattr(record, field),))
+        cls._template = '{' + ', '.join(
+            encode_string(field) + ': %s' for field in cls.__slots__) + '}'
+
+    def __init__(self, *values):
+        """Set the fields (in declaration order)."""
+        for field, value in zip(self.__slots__, values):
+            setattr(self, field, value)
+
+    def __getitem__(self, key):
+        """Return the value of a field (KeyError if there is no such field)."""
+        if key in self._fields:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        """Iterate over the field names."""
+        return iter(self.__slots__)
+
+    def __len__(self):
+        """Return the number of fields."""
+        return len(self.__slots__)
+
+    def __repr__(self):
+        """Return a readable representation (e.g. for logs)."""
+        return '{}({})'.format(type(self).__name__, ', '.join(
+            '{}={!r}'.format(field, getattr(self, field))
+            for field in self.__slots__))
+
+    def get(self, key, default=None):
+        """Return the value of a field (or default if there is no field)."""
+        if key in self._fields:
+            return getattr(self, key)
+        return default
+
+    def to_json(self):
+        """Return the JSON document of the record (as json.dumps(dict))."""
+        values = self._values(self)
+        try:
+            # fields are nearly always strings
+            return self._template % tuple(map(encode_string, values))
+        except TypeError:
+            return self._template % tuple(
+                encode_string(value) if isinstance(value, str)
+                else json.dumps(value) for value in values)
+
+
+class Server(Record):
+    """Game server data (see ec2mapper.map_instance)."""
+
+    __slots__ = ('name', 'fullName', 'environment', 'instanceId', 'state',
+                 'publicIpAddress')
+
+
+class Snapshot(Record):
+    """Game snapshot data (see ebsmapper.map_snapshot)."""
+
+    __slots__ = ('name', 'server', 'snapshotId', 'event', 'timestamp')
+
+
+@functools.lru_cache(maxsize=None)
+def get_projection(fields):
+    """Return a function keeping only some fields of records (in order).
+
+    Projected records are records too, so they are encoded just as fast
+    (and with fewer fields to encode).
+
+    Parameters
+    ----------
+    fields: tuple, required
+        Names of the fields to keep (e.g. ('name', 'state'))
+    """
+    projection = type('Projection', (Record,), {'__slots__': fields})
+    values = operator.attrgetter(*fields)
+    if len(fields) == 1:
+        return lambda record: projection(values(record))
+    return lambda record: projection(*values(record))
+
+
+def dumps(payload):
+    """Return the JSON document of a payload that may hold records.
+
+    The document is byte-compatible with json.dumps() of the payload with
+    every record replaced by the equivalent dict.
+    """
+    if isinstance(payload, Record):
+        return payload.to_json()
+    if isinstance(payload, dict):
+        return '{' + ', '.join(
+            encode_string(key if isinstance(key, str) else json.dumps(key))
+            + ': ' + dumps(value) for key, value in payload.items()) + '}'
+    if isinstance(payload, (list, tuple)):
+        return '[' + ', '.join([
+            value.to_json() if isinstance(value, Record) else dumps(value)
+            for value in payload]) + ']'
+    return json.dumps(payload)
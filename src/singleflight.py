@@ -0,0 +1,91 @@
+"""Coalescing of concurrent identical lookups within a container."""
+
+import threading
+
+
+class SingleFlight:
+    """Lookups shared by the threads asking for the same key at once.
+
+    The first caller of a key runs the lookup while later callers of the
+    same key wait for it and get the same result (or the same error).
+    Nothing is kept once the lookup is over (see ttlcache for that), so
+    the result must be treated as read-only by every caller.
+    """
+
+    def __init__(self):
+        """Initialize without lookups in flight."""
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Return the number of lookups in flight."""
+        return len(self._calls)
+
+    def do(self, key, func, *args, **kwds):
+        """Return func(*args, **kwds), sharing it with concurrent callers.
+
+        Parameters
+        ----------
+        key: object, required
+            Hashable key of the lookup (see make_key)
+
+        func: callable, required
+            Lookup run by the first caller of the key
+
+        Returns
+        -------
+        Result of the lookup (raises its error in every caller)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Call()
+
+        if not leader:
+            call.done.wait()
+        else:
+            try:
+                call.result = func(*args, **kwds)
+            except BaseException as error:
+                call.error = error
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+
+class Call:  # pylint: disable=too-few-public-methods
+    """Lookup in flight (result or error set once done)."""
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        """Initialize a pending lookup."""
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def make_key(operation, **params):
+    """Return the key of an SDK call whatever the order of its parameters.
+
+    Filters (e.g. myutils.get_application_filter) and their values match in
+    any order, like other lists of values (e.g. 'InstanceIds').
+    """
+    return (operation, normalize(params))
+
+
+def normalize(value):
+    """Return a hashable value equal for any order of keys and lists."""
+    if isinstance(value, dict):
+        return tuple(sorted(
+            (key, normalize(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return tuple(sorted((normalize(item) for item in value), key=repr))
+    return value
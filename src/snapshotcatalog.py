@@ -0,0 +1,282 @@
+"""Local catalog of Minecraft game snapshots kept in sync with EC2."""
+
+import base64
+import datetime
+import json
+import logging
+import os
+import threading
+import time
+import myutils
+import records
+
+logger = myutils.get_logger(__name__, logging.INFO)
+
+# only needed once a catalog is opened
+sqlite3 = myutils.lazy_import('sqlite3')
+
+# catalog settings (overridable with environment variables)
+SYNC_SECONDS = float(os.getenv('SNAPSHOT_CATALOG_SYNC_SECONDS', '60'))
+FULL_SYNC_SECONDS = float(
+    os.getenv('SNAPSHOT_CATALOG_FULL_SYNC_SECONDS', '3600'))
+MAX_DELTA_DAYS = int(os.getenv('SNAPSHOT_CATALOG_MAX_DELTA_DAYS', '31'))
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+class SnapshotCatalog:
+    """Snapshot data (see ebsmapper.map_snapshot) kept in a SQLite file.
+
+    Queries walk an index ordered by 'timestamp' (then 'snapshotId'), so a
+    page costs O(log n) however many snapshots the application owns.
+
+    Parameters
+    ----------
+    path: str, required
+        SQLite database file (e.g. under /tmp to last a Lambda container)
+
+    timer: callable, optional
+        Clock returning epoch seconds (defaults to time.time)
+    """
+
+    def __init__(self, path, timer=time.time):
+        """Open (and initialize) the SQLite database."""
+        self.timer = timer
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS snapshots ('
+                'snapshot_id TEXT PRIMARY KEY, name TEXT NOT NULL, '
+                'server TEXT NOT NULL, event TEXT NOT NULL, '
+                'timestamp TEXT NOT NULL)'
+            )
+            self.connection.execute(
+                'CREATE INDEX IF NOT EXISTS snapshots_by_time '
+                'ON snapshots (timestamp, snapshot_id)'
+            )
+            self.connection.execute(
+                'CREATE INDEX IF NOT EXISTS snapshots_by_server '
+                'ON snapshots (server, timestamp, snapshot_id)'
+            )
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS sync ('
+                'key TEXT PRIMARY KEY, value REAL NOT NULL)'
+            )
+
+    def __len__(self):
+        """Return the number of cataloged snapshots."""
+        with self._lock:
+            (count,) = self.connection.execute(
+                'SELECT COUNT(*) FROM snapshots').fetchone()
+        return count
+
+    def upsert(self, snapshots):
+        """Add (or update) snapshots in the catalog."""
+        with self._lock, self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?)',
+                map(to_row, snapshots)
+            )
+
+    def delete(self, snapshot_ids):
+        """Remove snapshots from the catalog."""
+        with self._lock, self.connection:
+            self.connection.executemany(
+                'DELETE FROM snapshots WHERE snapshot_id = ?',
+                [(snapshot_id,) for snapshot_id in snapshot_ids]
+            )
+
+    def replace(self, snapshots):
+        """Replace every snapshot of the catalog (i.e. a full sync)."""
+        rows = list(map(to_row, snapshots))
+        now = self.timer()
+        with self._lock, self.connection:
+            self.connection.execute('DELETE FROM snapshots')
+            self.connection.executemany(
+                'INSERT INTO snapshots VALUES (?, ?, ?, ?, ?)', rows)
+            self._mark_synced(now, full=True)
+        logger.info('cataloged %d snapshots (full sync)', len(rows))
+
+    def merge(self, snapshots, days=None):
+        """Add snapshots found by a delta sync of some days.
+
+        Snapshots of those days (see get_sync_days) that the delta sync did
+        not find were deleted elsewhere (e.g. by the snapshot reaper), so
+        they are removed from the catalog.
+        """
+        rows = list(map(to_row, snapshots))
+        now = self.timer()
+        with self._lock, self.connection:
+            if days:
+                until = datetime.date.fromisoformat(max(days)) \
+                    + datetime.timedelta(days=1)
+                self.connection.execute(
+                    'DELETE FROM snapshots '
+                    'WHERE timestamp >= ? AND timestamp < ?',
+                    (min(days), until.isoformat()))
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?)',
+                rows)
+            self._mark_synced(now, full=False)
+        logger.info('cataloged %d snapshots (delta sync)', len(rows))
+
+    def get_sync_days(self):
+        """Return what needs syncing with EC2.
+
+        Returns
+        -------
+        None if the catalog is fresh, an empty list if a full sync is due,
+        or else the days (e.g. '2022-03-16') with possibly new snapshots
+        """
+        with self._lock:
+            synced = dict(self.connection.execute(
+                'SELECT key, value FROM sync'))
+            (latest,) = self.connection.execute(
+                'SELECT MAX(timestamp) FROM snapshots').fetchone()
+
+        now = self.timer()
+        if now - synced.get('full', float('-inf')) >= FULL_SYNC_SECONDS:
+            return []
+        if now - synced['delta'] < SYNC_SECONDS:
+            return None
+
+        # snapshots are tagged with their (local) creation time, so new
+        # ones carry a 'Timestamp' from the latest cataloged day onwards
+        today = datetime.datetime.fromtimestamp(now).date()
+        try:
+            start = min(datetime.date.fromisoformat(latest[:10]), today)
+        except (TypeError, ValueError):
+            start = today
+        if (today - start).days >= MAX_DELTA_DAYS:
+            return []
+        return [
+            (start + datetime.timedelta(days=day)).isoformat()
+            for day in range((today - start).days + 1)
+        ]
+
+    def query(self, server=None, event=None, since=None, until=None,
+              limit=None, next_token=None):
+        """Return one page of cataloged snapshots and the next page token.
+
+        Parameters
+        ----------
+        server: str, optional
+            Name of the game server
+
+        event: str, optional
+            Event of the snapshots (e.g. 'nightly')
+
+        since: str, optional
+            Earliest 'timestamp' (ISO 8601, inclusive)
+
+        until: str, optional
+            Latest 'timestamp' (ISO 8601, exclusive)
+
+        limit: int, optional
+            Number of snapshots in the page (all of them by default)
+
+        next_token: str, optional
+            Token returned with the previous page
+
+        Returns
+        -------
+        Snapshots ordered by 'timestamp' and the next page token (None on
+        the last page): tuple
+        """
+        clauses = []
+        values = []
+        for column, value in (('server', server), ('event', event)):
+            if value is not None:
+                clauses.append(column + ' = ?')
+                values.append(value)
+        if since is not None:
+            clauses.append('timestamp >= ?')
+            values.append(since)
+        if until is not None:
+            clauses.append('timestamp < ?')
+            values.append(until)
+        if next_token is not None:
+            timestamp, snapshot_id = decode_token(next_token)
+            clauses.append('(timestamp > ? OR '
+                           '(timestamp = ? AND snapshot_id > ?))')
+            values.extend([timestamp, timestamp, snapshot_id])
+
+        sql = 'SELECT name, server, snapshot_id, event, timestamp ' \
+            'FROM snapshots'
+        if len(clauses) > 0:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY timestamp, snapshot_id'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            values.append(limit + 1)
+
+        with self._lock:
+            rows = self.connection.execute(sql, values).fetchall()
+        token = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            token = encode_token(rows[-1][4], rows[-1][2])
+        return [from_row(row) for row in rows], token
+
+    def _mark_synced(self, now, full):
+        """Record the time of a sync (with the lock held)."""
+        keys = ['full', 'delta'] if full else ['delta']
+        self.connection.executemany(
+            'INSERT OR REPLACE INTO sync VALUES (?, ?)',
+            [(key, now) for key in keys]
+        )
+
+
+def open_catalog(path):
+    """Return the (shared) catalog of a SQLite file (None if no path)."""
+    if not path:
+        return None
+    catalog = _catalogs.get(path)
+    if catalog is None:
+        with _catalogs_lock:
+            catalog = _catalogs.get(path)
+            if catalog is None:
+                catalog = SnapshotCatalog(path)
+                _catalogs[path] = catalog
+    return catalog
+
+
+def close_all():
+    """Close every open catalog."""
+    with _catalogs_lock:
+        for catalog in _catalogs.values():
+            catalog.connection.close()
+        _catalogs.clear()
+
+
+def to_row(snapshot):
+    """Return the catalog row of snapshot data."""
+    return (
+        snapshot.get('snapshotId', ''),
+        snapshot.get('name', ''),
+        snapshot.get('server', ''),
+        snapshot.get('event', ''),
+        snapshot.get('timestamp', '')
+    )
+
+
+def from_row(row):
+    """Return the snapshot data of a catalog row."""
+    return records.Snapshot(*row)
+
+
+def encode_token(timestamp, snapshot_id):
+    """Return the page token following a snapshot."""
+    key = json.dumps([timestamp, snapshot_id]).encode('utf8')
+    return base64.urlsafe_b64encode(key).decode('ascii')
+
+
+def decode_token(token):
+    """Return the (timestamp, snapshot ID) of a page token (or ValueError)."""
+    try:
+        timestamp, snapshot_id = json.loads(base64.urlsafe_b64decode(token))
+    except (TypeError, ValueError) as error:
+        raise ValueError('invalid page token') from error
+    return str(timestamp), str(snapshot_id)
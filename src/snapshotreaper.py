@@ -0,0 +1,194 @@
+"""Handler for pruning old Minecraft game snapshots (scheduled workflow)."""
+
+import datetime
+import json
+import logging
+import os
+import mcsnapshots
+import myutils
+
+logger = myutils.get_logger(__name__, logging.INFO)
+
+# report expired snapshots without deleting them (overridable per event)
+DRY_RUN = os.getenv('SNAPSHOT_REAPER_DRY_RUN', 'false').lower() == 'true'
+
+# retention policies matched (first match wins) by 'server' and/or 'event',
+# none by default so snapshots are only pruned once explicitly configured
+# (e.g. '[{"keepLast": 7, "keepWeekly": 8}]')
+RETENTION_POLICIES = json.loads(os.getenv(
+    'SNAPSHOT_RETENTION_POLICIES', '[]'))
+
+# snapshots deleted per invocation (the rest wait for the next schedule)
+MAX_DELETES = int(os.getenv('SNAPSHOT_REAPER_MAX_DELETES', '200'))
+
+
+@myutils.emit_metrics
+@myutils.log_calls(level=logging.DEBUG)
+def handler(event, context):  # pylint: disable=unused-argument
+    """Delete every Minecraft game snapshot outside its retention policy.
+
+    Parameters
+    ----------
+    event: dict, required
+        Optional 'policies' overriding RETENTION_POLICIES and an optional
+        'dryRun' flag
+
+    context: object, required
+        Lambda Context runtime methods and attributes
+
+    Returns
+    -------
+    Structured report of the expired snapshots: dict
+    """
+    event = event or {}
+    policies = event.get('policies', RETENTION_POLICIES)
+    dry_run = event.get('dryRun', DRY_RUN)
+
+    return prune(mcsnapshots.iterate(None), policies, dry_run)
+
+
+@myutils.log_calls
+def prune(snapshots, policies, dry_run=False, now=None, max_deletes=None):
+    """Delete (concurrently) the snapshots expired by the retention policies.
+
+    Parameters
+    ----------
+    snapshots: iterable, required
+        Snapshot data (see ebsmapper.map_snapshot), e.g. one page at a time
+
+    policies: list, required
+        Retention policies (see plan)
+
+    dry_run: bool, optional
+        Report expired snapshots without deleting them
+
+    now: datetime.datetime, optional
+        Reference time of the retention periods (defaults to now)
+
+    max_deletes: int, optional
+        Number of snapshots deleted at most (MAX_DELETES)
+
+    Returns
+    -------
+    Report of the checked, expired (the oldest up to max_deletes, the
+    newest being deferred), deleted and failed snapshots: dict
+    """
+    max_deletes = MAX_DELETES if max_deletes is None else max_deletes
+    checked, expired = plan(snapshots, policies, now)
+    doomed = expired[:max_deletes]
+
+    deleted = []
+    failed = []
+    if len(doomed) > 0 and not dry_run:
+        errors = mcsnapshots.delete_snapshots(
+            [entry['snapshotId'] for entry in doomed])
+        for entry in doomed:
+            if entry['snapshotId'] in errors:
+                failed.append({
+                    'snapshotId': entry['snapshotId'],
+                    'error': errors[entry['snapshotId']]
+                })
+            else:
+                deleted.append(entry['snapshotId'])
+
+    logger.info('expired snapshots = %d, deleted = %d (dry run = %s)',
+                len(expired), len(deleted), dry_run)
+    return {
+        'dryRun': dry_run,
+        'checked': checked,
+        'expired': doomed,
+        'deferred': len(expired) - len(doomed),
+        'deleted': deleted,
+        'failed': failed
+    }
+
+
+def plan(snapshots, policies, now=None):
+    """Return the snapshots outside their retention policy (in one pass).
+
+    Snapshots are grouped by server and event, and a group is kept by the
+    first policy matching its 'server' and 'event' (a missing key matches
+    anything). A policy keeps the newest 'keepLast' snapshots (at least
+    one), the newest snapshot of each of the last 'keepDaily' days and the
+    newest snapshot of each of the last 'keepWeekly' weeks. Snapshots
+    without a matching policy or a readable timestamp are always kept.
+
+    Returns
+    -------
+    Number of checked snapshots and the expired snapshots (oldest first,
+    each with the 'reason' of the deletion): tuple
+    """
+    now = now or datetime.datetime.now()
+    checked = 0
+    groups = {}
+    for snapshot in snapshots:
+        checked += 1
+        policy = match_policy(policies, snapshot)
+        taken = parse_timestamp(snapshot.get('timestamp'))
+        if policy is None or taken is None:
+            continue
+        key = (snapshot.get('server'), snapshot.get('event'))
+        groups.setdefault(key, (policy, []))[1].append((taken, snapshot))
+
+    expired = []
+    for policy, members in groups.values():
+        members.sort(key=lambda member: member[0], reverse=True)
+        kept = select(policy, [taken for taken, _ in members], now)
+        for position, (taken, snapshot) in enumerate(members):
+            if position not in kept:
+                entry = dict(snapshot)
+                entry['reason'] = 'outside retention policy {}'.format(
+                    json.dumps(policy, sort_keys=True))
+                expired.append((taken, entry))
+    expired.sort(key=lambda member: member[0])
+    return checked, [entry for _, entry in expired]
+
+
+def match_policy(policies, snapshot):
+    """Return the first retention policy matching a snapshot (if any)."""
+    for policy in policies:
+        if policy.get('server', snapshot.get('server')) \
+                == snapshot.get('server') \
+                and policy.get('event', snapshot.get('event')) \
+                == snapshot.get('event'):
+            return policy
+    return None
+
+
+def select(policy, times, now):
+    """Return the positions kept by a policy of times (newest first)."""
+    kept = set(range(max(policy.get('keepLast', 0), 1)))
+    periods = [
+        (policy.get('keepDaily', 0), get_day),
+        (policy.get('keepWeekly', 0), get_week)
+    ]
+    for count, get_period in periods:
+        current = get_period(now)
+        seen = set()
+        for position, taken in enumerate(times):
+            period = get_period(taken)
+            if period not in seen and 0 <= current - period < count:
+                seen.add(period)
+                kept.add(position)
+    return kept
+
+
+def get_day(value):
+    """Return the ordinal of the day of a time."""
+    return value.toordinal()
+
+
+def get_week(value):
+    """Return the ordinal of the week (starting on Monday) of a time."""
+    return (value.toordinal() - value.weekday()) // 7
+
+
+def parse_timestamp(value):
+    """Return the (local) time of a snapshot 'Timestamp' (None if invalid)."""
+    try:
+        taken = datetime.datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if taken.tzinfo is not None:
+        taken = taken.astimezone().replace(tzinfo=None)
+    return taken
@@ -0,0 +1,81 @@
+"""In-memory cache with time-to-live expiry and LRU eviction."""
+
+import collections
+import os
+import threading
+import time
+
+# default cache limits (overridable with environment variables)
+CACHE_TTL_SECONDS = float(os.getenv('CACHE_TTL_SECONDS', '10'))
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '128'))
+
+_caches = []
+
+
+class TTLCache:
+    """Per-container cache of values that expire after a time-to-live.
+
+    Parameters
+    ----------
+    ttl: float, optional
+        Seconds before an entry expires (defaults to CACHE_TTL_SECONDS)
+
+    maxsize: int, optional
+        Number of entries kept before the least recently used one is
+        evicted (defaults to CACHE_MAX_ENTRIES)
+
+    timer: callable, optional
+        Clock returning seconds (defaults to time.monotonic)
+    """
+
+    def __init__(self, ttl=None, maxsize=None, timer=time.monotonic):
+        """Initialize an empty cache."""
+        self.ttl = CACHE_TTL_SECONDS if ttl is None else ttl
+        self.maxsize = CACHE_MAX_ENTRIES if maxsize is None else maxsize
+        self.timer = timer
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        _caches.append(self)
+
+    def __len__(self):
+        """Return the number of entries (including expired ones)."""
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """Return the cached value for the key (or default if expired)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires <= self.timer():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        """Cache the value for the key."""
+        if self.ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (self.timer() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        """Discard the cached value for the key (if any)."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Discard all cached values."""
+        with self._lock:
+            self._entries.clear()
+
+
+def clear_all():
+    """Discard the values of every cache in this container."""
+    for cache in _caches:
+        cache.clear()
@@ -2,6 +2,7 @@
 
 import sys
 import os
+import pytest
 
 
 def updatepath():
@@ -11,3 +12,30 @@ def updatepath():
 
 
 updatepath()
+
+import awsclients  # noqa: E402 pylint: disable=wrong-import-position
+import mcserver  # noqa: E402 pylint: disable=wrong-import-position
+import mcusers  # noqa: E402 pylint: disable=wrong-import-position
+import snapshotcatalog  # noqa: E402 pylint: disable=wrong-import-position
+import ttlcache  # noqa: E402 pylint: disable=wrong-import-position
+from tests import fakercon  # noqa: E402 pylint: disable=wrong-import-position
+
+
+@pytest.fixture(autouse=True)
+def reset_container_state():
+    """Discard per-container state (e.g. shared clients) after each test."""
+    yield
+    awsclients.reset()
+    ttlcache.clear_all()
+    mcserver.INSTANCE_INDEX.clear()
+    snapshotcatalog.close_all()
+
+
+@pytest.fixture(name='fake_rcon')
+def fixture_fake_rcon(monkeypatch):
+    """Serve a fake RCON endpoint that mcusers connects to by default."""
+    with fakercon.FakeRconServer(responses={
+        'list': 'There are 1 of a max of 20 players online: Steve'
+    }) as server:
+        monkeypatch.setattr(mcusers, 'RCON_PORT', server.port)
+        yield server
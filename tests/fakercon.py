@@ -0,0 +1,156 @@
+"""Local fake of a Minecraft server's RCON endpoint for testing."""
+
+import socketserver
+import struct
+import threading
+import time
+
+LOGIN = 3
+COMMAND = 2
+RESPONSE = 0
+
+
+class FakeRconServer(socketserver.ThreadingTCPServer):
+    """Threaded TCP server speaking the Minecraft RCON protocol.
+
+    Parameters
+    ----------
+    password: str, optional
+        Password expected in login packets
+
+    responses: dict, optional
+        Response text by command (unknown commands echo an empty string)
+
+    latency: float, optional
+        Seconds to wait before answering each packet
+
+    host: str, optional
+        Local address to bind (e.g. '127.0.0.2' to share a port number)
+
+    port: int, optional
+        Local port to bind (a free port by default)
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+    # concurrent clients (e.g. a census) overflow the default backlog of 5
+    request_queue_size = 128
+
+    def __init__(self, password='foobar', responses=None, latency=0.0,
+                 host='127.0.0.1', port=0):
+        """Bind to a local port (call start() to begin serving)."""
+        super().__init__((host, port), RconHandler)
+        self.password = password
+        self.responses = dict(responses or {})
+        self.latency = latency
+        self.logins = 0
+        self.commands = []
+        self.connections = []
+        self._thread = None
+
+    @property
+    def port(self):
+        """Return the local port of the server."""
+        return self.server_address[1]
+
+    def start(self):
+        """Serve requests on a background thread."""
+        self._thread = threading.Thread(target=self.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and drop every open client connection."""
+        self.shutdown()
+        self.drop_connections()
+        self.server_close()
+
+    def drop_connections(self):
+        """Close every open client connection (e.g. a server restart)."""
+        for connection in self.connections:
+            try:
+                connection.close()
+            except OSError:
+                pass
+        self.connections = []
+
+    def respond(self, command):
+        """Return the response text for a command."""
+        response = self.responses.get(command, '')
+        return response(command) if callable(response) else response
+
+    def __enter__(self):
+        """Start serving."""
+        return self.start()
+
+    def __exit__(self, *args):
+        """Stop serving."""
+        self.stop()
+
+
+class RconHandler(socketserver.BaseRequestHandler):
+    """Handle one client connection of the fake RCON server."""
+
+    def handle(self):
+        """Answer login and command packets until the client disconnects."""
+        self.server.connections.append(self.request)
+        authenticated = False
+        while True:
+            packet = self.read_packet()
+            if packet is None:
+                return
+            request_id, packet_type, payload = packet
+            if self.server.latency:
+                time.sleep(self.server.latency)
+
+            if packet_type == LOGIN:
+                authenticated = payload == self.server.password
+                self.server.logins += 1
+                self.write_packet(
+                    request_id if authenticated else -1, COMMAND, '')
+            elif not authenticated:
+                self.write_packet(-1, RESPONSE, '')
+            elif packet_type == COMMAND:
+                self.server.commands.append(payload)
+                self.write_packet(
+                    request_id, RESPONSE, self.server.respond(payload))
+            else:
+                # vanilla servers answer other packet types like this
+                self.write_packet(
+                    request_id, RESPONSE,
+                    'Unknown request {:x}'.format(packet_type))
+
+    def read_packet(self):
+        """Return (request ID, type, payload) of the next packet."""
+        header = self.read(4)
+        if header is None:
+            return None
+        (length,) = struct.unpack('<i', header)
+        body = self.read(length)
+        if body is None:
+            return None
+        request_id, packet_type = struct.unpack('<ii', body[:8])
+        return request_id, packet_type, body[8:-2].decode('utf8')
+
+    def read(self, length):
+        """Return exactly length bytes (or None if the client is gone)."""
+        data = b''
+        while len(data) < length:
+            try:
+                chunk = self.request.recv(length - len(data))
+            except OSError:
+                return None
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    def write_packet(self, request_id, packet_type, payload):
+        """Send a packet to the client."""
+        body = struct.pack('<ii', request_id, packet_type) \
+            + payload.encode('utf8') + b'\x00\x00'
+        try:
+            self.request.sendall(struct.pack('<i', len(body)) + body)
+        except OSError:
+            pass
@@ -0,0 +1,75 @@
+"""Helpers shared by unit tests (fake Lambda context, AWS fixtures)."""
+
+import concurrent.futures
+import threading
+import boto3
+import instanceindex
+
+THREADS = 32
+
+
+class FakeContext:  # pylint: disable=too-few-public-methods
+    """Define a Lambda context with a fixed remaining time."""
+
+    def __init__(self, millis):
+        """Set the remaining time."""
+        self.millis = millis
+
+    def get_remaining_time_in_millis(self):
+        """Return the remaining time."""
+        return self.millis
+
+
+def run_concurrently(func, threads=THREADS):
+    """Return the results (or errors) of func called by threads at once."""
+    barrier = threading.Barrier(threads)
+
+    def call(index):
+        barrier.wait()
+        try:
+            return func(index)
+        except Exception as error:  # pylint: disable=broad-except
+            return error
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(call, range(threads)))
+
+
+def run_server(name, environment='main'):
+    """Launch an EC2 instance tagged as a Minecraft game server."""
+    ec2_client = boto3.client('ec2')
+    image_id = ec2_client.describe_images()['Images'][0]['ImageId']
+    reservation = ec2_client.run_instances(
+        ImageId=image_id, MinCount=1, MaxCount=1,
+        TagSpecifications=[{
+            'ResourceType': 'instance',
+            'Tags': [
+                {'Key': 'Name', 'Value': 'minecraft-main-server-' + name},
+                {'Key': 'Application', 'Value': 'minecraft'},
+                {'Key': 'Environment', 'Value': environment}
+            ]
+        }])
+    return reservation['Instances'][0]['InstanceId']
+
+
+def attach_data_volume(instance_id):
+    """Attach a new EBS volume to an EC2 instance as its data device."""
+    ec2_client = boto3.client('ec2')
+    volume = ec2_client.create_volume(AvailabilityZone='us-east-1a', Size=4)
+    ec2_client.attach_volume(
+        VolumeId=volume['VolumeId'],
+        InstanceId=instance_id,
+        Device=instanceindex.DATA_DEVICE
+    )
+    return volume['VolumeId']
+
+
+def put_password(value):
+    """Store the RCON password in the (mocked) parameter store."""
+    ssm = boto3.client('ssm')
+    ssm.put_parameter(
+        Name='/minecraft/mcrcon/password',
+        Value=value,
+        Type='SecureString',
+        Overwrite=True
+    )
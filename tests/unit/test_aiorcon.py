@@ -0,0 +1,33 @@
+"""Unit testing for 'aiorcon' module."""
+
+import asyncio
+import pytest
+import aiorcon
+from tests import fakercon
+
+
+def test_command():
+    """Test command() function."""
+    long_text = 'x' * 10000
+    with fakercon.FakeRconServer(responses={'long': long_text}) as server:
+        response = asyncio.run(aiorcon.command(
+            '127.0.0.1', server.port, 'foobar', 'long', 1))
+        assert response == long_text
+        assert server.commands == ['long']
+
+
+def test_command_login_failed():
+    """Test command() function with the wrong password."""
+    with fakercon.FakeRconServer() as server:
+        with pytest.raises(aiorcon.LoginError):
+            asyncio.run(aiorcon.command(
+                '127.0.0.1', server.port, 'wrong', 'list', 1))
+        assert server.commands == []
+
+
+def test_command_timeout():
+    """Test command() function against a slow server."""
+    with fakercon.FakeRconServer(latency=1) as server:
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(aiorcon.command(
+                '127.0.0.1', server.port, 'foobar', 'list', 0.1))
@@ -0,0 +1,70 @@
+"""Unit testing for 'awsclients' module."""
+
+import boto3
+import botocore.stub
+import pytest
+import awsclients
+import deadlines
+import mcservers
+
+
+def test_get_client():
+    """Test get_client() function."""
+    client = awsclients.get_client('ec2', region_name='us-east-1')
+    assert client is awsclients.get_client('ec2', region_name='us-east-1')
+    assert client is not awsclients.get_client('ec2', region_name='us-west-2')
+    assert client is not awsclients.get_client('ssm', region_name='us-east-1')
+    assert client is not awsclients.get_client(
+        'ec2', region_name='us-east-1', max_pool_connections=1)
+    assert client.meta.config.retries['mode'] == awsclients.RETRY_MODE
+
+
+def test_set_client():
+    """Test set_client() function with a Stubber-backed client."""
+    client = boto3.client('ec2', region_name='us-east-1')
+    awsclients.set_client('ec2', client)
+    assert awsclients.get_client('ec2', region_name='us-west-2') is client
+
+    with botocore.stub.Stubber(client) as stubber:
+        stubber.add_response('describe_instances', {'Reservations': []})
+        assert mcservers.gather() == []
+        stubber.assert_no_pending_responses()
+
+
+def test_reset():
+    """Test reset() function."""
+    client = boto3.client('ec2', region_name='us-east-1')
+    awsclients.set_client('ec2', client)
+    awsclients.reset()
+    assert awsclients.get_client('ec2', region_name='us-east-1') is not client
+
+
+def test_get_deadline_config():
+    """Test get_deadline_config() function fits calls to the time left."""
+    assert awsclients.get_deadline_config(deadlines.Deadline()) == {}
+
+    config = awsclients.get_deadline_config(deadlines.Deadline(5.0))
+    assert config['retries']['mode'] == awsclients.DEADLINE_RETRY_MODE
+    assert config['connect_timeout'] < 1.0
+    assert config['read_timeout'] == awsclients.MIN_READ_TIMEOUT_SECONDS
+
+    config = awsclients.get_deadline_config(deadlines.Deadline(20.0))
+    attempts = config['retries']['max_attempts']
+    assert (config['connect_timeout'] + config['read_timeout']) * \
+        attempts == 16.0
+
+    # a service has one client per budget, whatever the time left
+    clients = {
+        id(awsclients.get_client('ec2', region_name='us-east-1',
+                                 deadline=deadlines.Deadline(seconds)))
+        for seconds in (0.5, 1.0, 2.5, 5.0, 8.0, 12.0, 17.0, 25.0)
+    }
+    assert len(clients) == len(awsclients.DEADLINE_BUDGETS)
+    client = awsclients.get_client(
+        'ec2', region_name='us-east-1', deadline=deadlines.Deadline(20.0))
+    assert client.meta.config.read_timeout == config['read_timeout']
+
+    # even injected clients are not returned once the deadline has passed
+    awsclients.set_client('ec2', client)
+    with pytest.raises(deadlines.DeadlineExceeded):
+        awsclients.get_client('ec2', deadline=deadlines.Deadline(0))
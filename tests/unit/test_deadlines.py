@@ -0,0 +1,78 @@
+"""Unit testing for 'deadlines' module."""
+
+import pytest
+import deadlines
+from tests.helpers import FakeContext
+
+
+class FakeTimer:  # pylint: disable=too-few-public-methods
+    """Define a clock that only moves when told to."""
+
+    def __init__(self):
+        """Start the clock."""
+        self.now = 100.0
+
+    def __call__(self):
+        """Return the current time."""
+        return self.now
+
+
+def test_deadline():
+    """Test Deadline class."""
+    timer = FakeTimer()
+    deadline = deadlines.Deadline(5, timer=timer)
+    assert deadline.remaining() == 5
+    assert deadline.remaining(reserve=2) == 3
+    assert deadline.get_timeout(3) == 3
+    assert deadline.get_timeout() == 5
+
+    timer.now += 4
+    assert deadline.get_timeout(3) == 1
+    assert not deadline.expired()
+    assert deadline.shorten(1).expired()
+
+    timer.now += 1
+    assert deadline.expired()
+    with pytest.raises(deadlines.DeadlineExceeded):
+        deadline.get_timeout(3)
+
+
+def test_deadline_unlimited():
+    """Test Deadline class without a deadline."""
+    deadline = deadlines.Deadline.from_context({})
+    assert deadline.remaining() is None
+    assert not deadline.expired()
+    assert deadline.get_timeout(3) == 3
+    assert deadline.get_timeout() is None
+    assert deadline.shorten(10).remaining() is None
+
+    deadline = deadlines.Deadline.from_context(FakeContext(3000), reserve=1)
+    assert 1.9 < deadline.remaining() <= 2
+
+
+def test_iterate():
+    """Test Deadline.iterate() stops between items once the deadline passes."""
+    timer = FakeTimer()
+    deadline = deadlines.Deadline(1, timer=timer)
+
+    def pages():
+        yield 'page-1'
+        timer.now += 2
+        yield 'page-2'
+        yield 'page-3'
+
+    listed = []
+    with pytest.raises(deadlines.DeadlineExceeded):
+        listed.extend(deadline.iterate(pages()))
+    assert listed == ['page-1', 'page-2']
+    assert list(deadlines.Deadline().iterate(range(3))) == [0, 1, 2]
+
+
+def test_get_timeout_errors():
+    """Test get_timeout_errors() function."""
+    errors = deadlines.get_timeout_errors()
+    assert issubclass(deadlines.DeadlineExceeded, errors)
+    assert issubclass(deadlines.DeadlineExceeded, OSError)
+    assert not issubclass(ValueError, errors)
+    assert deadlines.describe(deadlines.DeadlineExceeded('no time left')) \
+        == 'deadline exceeded (no time left)'
@@ -1,5 +1,6 @@
 """Unit testing for 'ebsmapper' module."""
 import ebsmapper
+import myutils
 
 
 def test_parse():
@@ -7,6 +8,14 @@ def test_parse():
     assert len(ebsmapper.parse({'Snapshots': [{}, {}]})) == 2
 
 
+def test_parse_pages():
+    """Test parse_pages() function."""
+    pages = iter([{'Snapshots': [{}, {}]}, {}, {'Snapshots': [{}]}])
+    snapshots = ebsmapper.parse_pages(pages)
+    assert next(snapshots)['snapshotId'] == ''
+    assert len(list(snapshots)) == 2
+
+
 def test_map_snapshot():
     """Test map_snapshot() function."""
     assert ebsmapper.map_snapshot({}) == {
@@ -34,16 +43,17 @@ def test_map_snapshot():
 
 def test_get_server_name():
     """Test get_server_name() function."""
-    assert ebsmapper.get_server_name([]) == ''
-    assert ebsmapper.get_server_name([{}]) == ''
-    assert ebsmapper.get_server_name([{'Key': 'Server'}]) == ''
-    assert ebsmapper.get_server_name([
-        {'Key': 'Server', 'Value': 'foobar'}]) == 'foobar'
-    assert ebsmapper.get_server_name([{
+    assert ebsmapper.get_server_name(myutils.index_tags([])) == ''
+    assert ebsmapper.get_server_name(myutils.index_tags([{}])) == ''
+    assert ebsmapper.get_server_name(
+        myutils.index_tags([{'Key': 'Server'}])) == ''
+    assert ebsmapper.get_server_name(myutils.index_tags([
+        {'Key': 'Server', 'Value': 'foobar'}])) == 'foobar'
+    assert ebsmapper.get_server_name(myutils.index_tags([{
         'Key': 'Name',
         'Value': 'minecraft-test-servers-foobar'
-    }]) == 'foobar'
-    assert ebsmapper.get_server_name([{
+    }])) == 'foobar'
+    assert ebsmapper.get_server_name(myutils.index_tags([{
         'Key': 'Name',
         'Value': 'mcservers-test-foobar'
-    }]) == 'foobar'
+    }])) == 'foobar'
@@ -66,3 +66,35 @@ def test_process_instance_data(inst_jenny, srvr_jenny):
             'Instances': [inst_jenny]
         }]
     }) == [srvr_jenny]
+
+
+def test_parse_pages(inst_jenny, srvr_jenny):
+    """Test parse_pages() function."""
+    pages = iter([
+        {'Reservations': [{'Instances': [inst_jenny]}]},
+        {'Reservations': []},
+        {'Reservations': [{'Instances': [inst_jenny, inst_jenny]}]}
+    ])
+    servers = ec2mapper.parse_pages(pages)
+    assert next(servers) == srvr_jenny
+    assert list(servers) == [srvr_jenny, srvr_jenny]
+
+
+def test_map_volumes():
+    """Test map_volumes() function."""
+    assert ec2mapper.map_volumes({}, '/dev/sdm') == {
+        'rootVolumeId': '',
+        'dataVolumeId': ''
+    }
+    instance = {
+        'RootDeviceName': '/dev/xvda',
+        'BlockDeviceMappings': [
+            {'DeviceName': '/dev/xvda', 'Ebs': {'VolumeId': 'vol-root'}},
+            {'DeviceName': '/dev/sdf', 'Ebs': {'VolumeId': 'vol-other'}},
+            {'DeviceName': '/dev/sdm', 'Ebs': {'VolumeId': 'vol-data'}}
+        ]
+    }
+    assert ec2mapper.map_volumes(instance, '/dev/sdm') == {
+        'rootVolumeId': 'vol-root',
+        'dataVolumeId': 'vol-data'
+    }
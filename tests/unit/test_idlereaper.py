@@ -0,0 +1,81 @@
+"""Unit testing for 'idlereaper' module."""
+
+import datetime
+import mock
+import moto
+import idlereaper
+import idletracker
+import mcservers
+from tests.helpers import run_server
+
+
+@moto.mock_ec2
+def test_reap():
+    """Test reap() function."""
+    run_server('busy')
+    run_server('idle')
+    run_server('lost')
+    servers = mcservers.gather()
+    census = {
+        'busy': {'count': 2, 'names': ['User1', 'User2']},
+        'idle': {'count': 0, 'names': []},
+        'lost': {'count': None, 'names': [], 'error': 'timed out'}
+    }
+
+    store = idletracker.get_store('sqlite::memory:')
+    grace = datetime.timedelta(0)
+
+    with mock.patch('idlereaper.mcusers.census', return_value=census):
+        report = idlereaper.reap(servers, True, grace=grace, store=store)
+        assert report['idle'] == ['idle']
+        assert report['stopped'] == []
+        assert {s['state'] for s in mcservers.gather()} == {'running'}
+
+        report = idlereaper.reap(servers, grace=grace, store=store)
+    assert report['checked'] == 3
+    assert report['stopped'] == ['idle']
+    actions = {
+        s['name']: (s['action'], s['reason']) for s in report['servers']
+    }
+    assert actions == {
+        'busy': ('keep', 'active users'),
+        'idle': ('stop', 'no users'),
+        'lost': ('keep', 'timed out')
+    }
+    states = {s['name']: s['state'] for s in mcservers.gather()}
+    assert states == {'busy': 'running', 'idle': 'stopped', 'lost': 'running'}
+
+
+@moto.mock_ec2
+def test_reap_grace_period():
+    """Test reap() function keeps servers idle for less than the grace."""
+    run_server('idle')
+    servers = mcservers.gather()
+    store = idletracker.get_store('sqlite::memory:')
+    census = {'idle': {'count': 0, 'names': []}}
+    grace = datetime.timedelta(minutes=30)
+
+    with mock.patch('idlereaper.mcusers.census', return_value=census):
+        report = idlereaper.reap(servers, grace=grace, store=store)
+        assert report['stopped'] == []
+        assert report['servers'][0]['reason'].startswith('idle for 0s')
+
+        last_hour = idletracker.utcnow() - datetime.timedelta(hours=1)
+        store.save({servers[0]['instanceId']: last_hour})
+        report = idlereaper.reap(servers, grace=grace, store=store)
+        assert report['stopped'] == ['idle']
+
+
+@moto.mock_ec2
+def test_handler():
+    """Test handler() function."""
+    servers = [{'name': 'foobar', 'instanceId': 'i-0', 'state': 'stopped'}]
+    report = idlereaper.handler({'servers': servers}, {})
+    assert report['idle'] == []
+    assert report['servers'][0]['reason'] == 'not running'
+
+    report = idlereaper.handler({'dryRun': True}, {})
+    assert report == {
+        'dryRun': True, 'checked': 0, 'idle': [], 'stopped': [],
+        'servers': []
+    }
@@ -0,0 +1,105 @@
+"""Unit testing for 'idletracker' module."""
+
+import datetime
+import moto
+import idletracker
+from tests.helpers import run_server
+
+NOW = datetime.datetime(2021, 4, 20, 6, 0, tzinfo=datetime.timezone.utc)
+HOUR = datetime.timedelta(hours=1)
+
+
+def make_servers(*states):
+    """Return server data for instances in the given states."""
+    return [{
+        'name': 'world{}'.format(i),
+        'instanceId': 'i-{}'.format(i),
+        'state': state
+    } for i, state in enumerate(states)]
+
+
+def test_observe():
+    """Test observe() function."""
+    store = idletracker.get_store('sqlite::memory:')
+    servers = make_servers('running', 'running', 'running', 'stopped')
+    users = {
+        'world0': {'count': 0},
+        'world1': {'count': 3},
+        'world2': {'count': None}
+    }
+
+    idle = idletracker.observe(servers, users, NOW, store)
+    assert idle == {'i-0': datetime.timedelta(0), 'i-1': datetime.timedelta(0)}
+
+    idle = idletracker.observe(servers, users, NOW + HOUR, store)
+    assert idle == {'i-0': HOUR, 'i-1': datetime.timedelta(0)}
+
+    # a stopped server starts a fresh idle period once it runs again
+    servers[0]['state'] = 'stopped'
+    idle = idletracker.observe(servers, users, NOW + 2 * HOUR, store)
+    assert 'i-0' not in idle
+    servers[0]['state'] = 'running'
+    idle = idletracker.observe(servers, users, NOW + 3 * HOUR, store)
+    assert idle['i-0'] == datetime.timedelta(0)
+
+
+def test_observe_hourly_checks():
+    """Test observe() function measures idle time from the first empty check.
+
+    With hourly checks and a 30 minute grace period, a server that had
+    users an hour ago is kept at its first empty check.
+    """
+    store = idletracker.get_store('sqlite::memory:')
+    servers = make_servers('running')
+    grace = idletracker.get_grace_period(30)
+
+    idle = idletracker.observe(servers, {'world0': {'count': 2}}, NOW, store)
+    assert idle == {'i-0': datetime.timedelta(0)}
+    idle = idletracker.observe(
+        servers, {'world0': {'count': 0}}, NOW + HOUR, store)
+    assert idle['i-0'] < grace
+    idle = idletracker.observe(
+        servers, {'world0': {'count': 0}}, NOW + 2 * HOUR, store)
+    assert idle['i-0'] == HOUR > grace
+
+    # users coming back end the idle period
+    idle = idletracker.observe(
+        servers, {'world0': {'count': 1}}, NOW + 3 * HOUR, store)
+    assert idle == {'i-0': datetime.timedelta(0)}
+    assert store.load(['i-0']) == {}
+    idle = idletracker.observe(
+        servers, {'world0': {'count': 0}}, NOW + 4 * HOUR, store)
+    assert idle == {'i-0': datetime.timedelta(0)}
+
+
+def test_observe_without_saving():
+    """Test observe() function in dry-run mode."""
+    store = idletracker.get_store('sqlite::memory:')
+    servers = make_servers('running')
+    users = {'world0': {'count': 1}}
+    idle = idletracker.observe(servers, users, NOW, store, save=False)
+    assert idle == {'i-0': datetime.timedelta(0)}
+    assert store.load(['i-0']) == {}
+
+
+@moto.mock_ec2
+def test_ec2_tag_store():
+    """Test Ec2TagStore class."""
+    foo_id = run_server('foo')
+    bar_id = run_server('bar')
+    store = idletracker.get_store('ec2')
+    assert store.load([]) == {}
+    assert store.load([foo_id, bar_id]) == {}
+
+    store.save({foo_id: NOW, bar_id: NOW})
+    assert store.load([foo_id, bar_id]) == {foo_id: NOW, bar_id: NOW}
+
+    store.delete([foo_id])
+    assert store.load([foo_id, bar_id]) == {bar_id: NOW}
+
+
+def test_parse_time():
+    """Test parse_time() function."""
+    assert idletracker.parse_time(idletracker.format_time(NOW)) == NOW
+    assert idletracker.parse_time('') is None
+    assert idletracker.parse_time('foobar') is None
@@ -0,0 +1,93 @@
+"""Unit testing for 'instanceindex' module."""
+
+import boto3
+import botocore.stub
+import moto
+import awsclients
+import instanceindex
+from tests.helpers import attach_data_volume, run_server
+
+
+class FakeTimer:  # pylint: disable=too-few-public-methods
+    """Define a clock that only moves when told to."""
+
+    def __init__(self):
+        """Start the clock."""
+        self.now = 0.0
+
+    def __call__(self):
+        """Return the current time."""
+        return self.now
+
+
+@moto.mock_ec2
+def test_get():
+    """Test get() method."""
+    index = instanceindex.InstanceIndex()
+    assert index.get('foobar') is None
+
+    instance_id = run_server('foobar')
+    volume_id = attach_data_volume(instance_id)
+    index.refresh()
+    entry = index.get('foobar')
+    assert entry['instanceId'] == instance_id
+    assert entry['environment'] == 'main'
+    assert entry['dataVolumeId'] == volume_id
+    assert entry['rootVolumeId'].startswith('vol-')
+
+    entry['instanceId'] = 'mutated'
+    assert index.get('foobar')['instanceId'] == instance_id
+
+
+def test_refresh_interval():
+    """Test get() method refreshes in one batch only when stale."""
+    client = boto3.client('ec2', region_name='us-east-1')
+    awsclients.set_client('ec2', client)
+    timer = FakeTimer()
+    index = instanceindex.InstanceIndex(
+        refresh=100, miss_refresh=10, timer=timer)
+    instance = {
+        'InstanceId': 'i-0123456789',
+        'Tags': [{'Key': 'Name', 'Value': 'minecraft-main-server-foobar'}]
+    }
+    with botocore.stub.Stubber(client) as stubber:
+        stubber.add_response('describe_instances', {
+            'Reservations': [{'Instances': [instance]}]
+        })
+        assert index.get('foobar')['instanceId'] == 'i-0123456789'
+        assert index.get('missing') is None
+        timer.now = 50
+        assert index.get('foobar')['instanceId'] == 'i-0123456789'
+        stubber.assert_no_pending_responses()
+
+        # misses rebuild the index once it is older than miss_refresh
+        stubber.add_response('describe_instances', {'Reservations': []})
+        assert index.get('missing') is None
+        stubber.assert_no_pending_responses()
+        assert len(index) == 0
+
+        # stale or invalidated indexes are rebuilt on any lookup
+        stubber.add_response('describe_instances', {
+            'Reservations': [{'Instances': [instance]}]
+        })
+        timer.now = 200
+        assert index.get('foobar') is not None
+        stubber.add_response('describe_instances', {'Reservations': []})
+        index.invalidate()
+        assert index.get('foobar') is None
+        stubber.assert_no_pending_responses()
+
+
+def test_build():
+    """Test build() function ignores duplicate names."""
+    first = {
+        'InstanceId': 'i-1',
+        'Tags': [{'Key': 'Name', 'Value': 'minecraft-main-server-foobar'}]
+    }
+    second = dict(first, InstanceId='i-2')
+    entries = instanceindex.build([
+        {'Reservations': [{'Instances': [first]}]},
+        {'Reservations': [{'Instances': [second]}]}
+    ])
+    assert list(entries) == ['foobar']
+    assert entries['foobar']['instanceId'] == 'i-1'
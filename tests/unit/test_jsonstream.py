@@ -0,0 +1,61 @@
+"""Unit testing for 'jsonstream' module."""
+
+import json
+import sys
+import jsonstream
+import records
+
+SERVER = records.Server(
+    'foobar', 'minecraft-test-server-foobar', 'test', 'i-0123456789',
+    'running', '')
+
+
+def test_listing():
+    """Test Listing class."""
+    listing = jsonstream.Listing('servers')
+    assert listing.to_json() == json.dumps({'servers': []})
+    assert listing.extend([SERVER, dict(SERVER, name='fööbar')])
+    assert len(listing) == 2
+    assert listing.to_json(nextToken='abc', count=None) == json.dumps({
+        'servers': [dict(SERVER), dict(SERVER, name='fööbar')],
+        'nextToken': 'abc'
+    })
+
+
+def test_listing_limit():
+    """Test Listing class stops at the response payload limit."""
+    size = jsonstream.get_size(SERVER.to_json()) + 2
+    listing = jsonstream.Listing(
+        'servers', max_bytes=jsonstream.RESERVE_BYTES + 2 * size)
+    items = iter([SERVER] * 5)
+    assert not listing.extend(items)
+    assert len(listing) == 2
+    assert len(list(items)) == 2
+
+    # the first item is listed whatever its size
+    listing = jsonstream.Listing('servers', max_bytes=0)
+    assert not listing.extend([SERVER, SERVER])
+    assert len(listing) == 1
+
+
+def test_get_size():
+    """Test get_size() function."""
+    for value in ['', 'a"b', {'a\\b': 'ü\n'}, ['\U0001F600']]:
+        text = json.dumps(value, ensure_ascii=False)
+        assert jsonstream.get_size(text) == len(json.dumps(text)) - 2
+
+
+def test_get_encoder(monkeypatch):
+    """Test get_encoder() function falls back to the standard library."""
+    jsonstream.get_encoder.cache_clear()
+    monkeypatch.setitem(sys.modules, 'orjson', None)
+    assert jsonstream.get_encoder('orjson') is records.dumps
+    assert jsonstream.get_encoder('auto') is records.dumps
+    jsonstream.get_encoder.cache_clear()
+    monkeypatch.undo()
+
+    encode = jsonstream.get_encoder('json')
+    assert encode(SERVER) == json.dumps(dict(SERVER))
+    encode = jsonstream.get_encoder('auto')
+    assert json.loads(encode(SERVER)) == SERVER
+    jsonstream.get_encoder.cache_clear()
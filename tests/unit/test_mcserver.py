@@ -1,8 +1,15 @@
 """Unit testing for 'mcserver' module."""
 
+import json
+import time
 import boto3
+import botocore.exceptions
+import botocore.stub
 import moto
+import pytest
+import awsclients
 import mcserver
+from tests.helpers import FakeContext, run_concurrently
 
 
 @moto.mock_ec2
@@ -12,6 +19,35 @@ def test_gather():
     assert server == {}
 
 
+def test_gather_cache():
+    """Test gather() function caches lookups until the state changes."""
+    client = make_stubbed_client()
+    instance = {
+        'InstanceId': 'i-0123456789',
+        'State': {'Name': 'stopped'},
+        'Tags': [{'Key': 'Name', 'Value': 'minecraft-main-server-foobar'}]
+    }
+    with botocore.stub.Stubber(client) as stubber:
+        for _ in range(2):
+            stubber.add_response('describe_instances', {
+                'Reservations': [{'Instances': [instance]}]
+            })
+        server = mcserver.gather('foobar')
+        server['state'] = 'mutated'
+        assert mcserver.gather('foobar')['state'] == 'stopped'
+        stubber.assert_no_pending_responses()
+
+        stubber.add_response('start_instances', {'StartingInstances': [{
+            'InstanceId': 'i-0123456789',
+            'CurrentState': {'Code': 0, 'Name': 'pending'}
+        }]})
+        for _ in range(2):
+            stubber.add_response('describe_instances', {'Reservations': []})
+        mcserver.change_server_state(server, 'running')
+        assert mcserver.gather('foobar') == {}
+        stubber.assert_no_pending_responses()
+
+
 def test_process_ec2_data():
     """Test gather_server_data() function."""
     reservations = {'Reservations': []}
@@ -52,3 +88,180 @@ def test_change_server_state():
 
     new_state = mcserver.change_server_state(server, 'foobar')
     assert new_state is None
+
+
+def test_change_servers_state():
+    """Test change_servers_state() function gives each server its result."""
+    client = make_stubbed_client()
+    servers = [
+        {'name': 'foo', 'instanceId': 'i-foo', 'state': 'running'},
+        {'name': 'bar', 'instanceId': 'i-bar', 'state': 'stopped'},
+        {'name': 'baz', 'instanceId': 'i-baz', 'state': 'stopping'}
+    ]
+    with botocore.stub.Stubber(client) as stubber:
+        stubber.add_client_error('start_instances', 'IncorrectInstanceState',
+                                 expected_params={
+                                     'InstanceIds': ['i-foo', 'i-bar',
+                                                     'i-baz']})
+        stubber.add_response('start_instances', {'StartingInstances': [{
+            'InstanceId': 'i-foo',
+            'CurrentState': {'Code': 16, 'Name': 'running'}
+        }]}, {'InstanceIds': ['i-foo']})
+        stubber.add_response('start_instances', {'StartingInstances': [{
+            'InstanceId': 'i-bar',
+            'CurrentState': {'Code': 0, 'Name': 'pending'}
+        }]}, {'InstanceIds': ['i-bar']})
+        stubber.add_client_error('start_instances', 'IncorrectInstanceState',
+                                 expected_params={'InstanceIds': ['i-baz']})
+        new_states, errors = mcserver.change_servers_state(
+            servers, 'running')
+        assert new_states == {'i-foo': 'running', 'i-bar': 'pending'}
+        assert list(errors) == ['i-baz']
+        stubber.assert_no_pending_responses()
+
+        stubber.add_client_error('stop_instances', 'IncorrectInstanceState')
+        with pytest.raises(botocore.exceptions.ClientError):
+            mcserver.change_server_state(servers[0], 'stopped')
+        stubber.assert_no_pending_responses()
+
+
+def make_stubbed_client():
+    """Return an EC2 client injected for all AWS calls of the test."""
+    client = boto3.client('ec2', region_name='us-east-1')
+    awsclients.set_client('ec2', client)
+    return client
+
+
+def test_gather_concurrently():
+    """Test gather() function shares EC2 lookups among many threads."""
+    client = make_stubbed_client()
+    client.meta.events.register(
+        'before-parameter-build.ec2', lambda **kwargs: time.sleep(0.2))
+    instance = {
+        'InstanceId': 'i-0123456789',
+        'State': {'Name': 'running'},
+        'Tags': [{'Key': 'Name', 'Value': 'minecraft-main-server-foobar'}]
+    }
+    with botocore.stub.Stubber(client) as stubber:
+        # one call to build the index, one to look the instance up
+        for _ in range(2):
+            stubber.add_response('describe_instances', {
+                'Reservations': [{'Instances': [instance]}]
+            })
+        results = run_concurrently(lambda index: mcserver.gather('foobar'))
+        stubber.assert_no_pending_responses()
+    assert all(server['instanceId'] == 'i-0123456789' for server in results)
+
+
+def test_gather_state():
+    """Test gather_state() function uses the indexed instance ID."""
+    client = make_stubbed_client()
+    instance = {
+        'InstanceId': 'i-0123456789',
+        'State': {'Name': 'stopped'},
+        'Tags': [{'Key': 'Name', 'Value': 'minecraft-main-server-foobar'}]
+    }
+    with botocore.stub.Stubber(client) as stubber:
+        stubber.add_response('describe_instances', {
+            'Reservations': [{'Instances': [instance]}]
+        })
+        stubber.add_response('describe_instance_status', {
+            'InstanceStatuses': [{
+                'InstanceId': 'i-0123456789',
+                'InstanceState': {'Code': 80, 'Name': 'stopped'}
+            }]
+        })
+        assert mcserver.gather_state('foobar') == {
+            'name': 'foobar', 'instanceId': 'i-0123456789', 'state': 'stopped'
+        }
+
+        stubber.add_response('describe_instance_status', {
+            'InstanceStatuses': [{
+                'InstanceId': 'i-0123456789',
+                'InstanceState': {'Code': 0, 'Name': 'pending'}
+            }]
+        }, {'InstanceIds': ['i-0123456789'], 'IncludeAllInstances': True})
+        assert mcserver.gather_state('foobar')['state'] == 'pending'
+
+        stubber.add_client_error(
+            'describe_instance_status', 'InvalidInstanceID.NotFound')
+        stubber.add_response('describe_instances', {'Reservations': []})
+        assert mcserver.gather_state('foobar') == {
+            'name': 'foobar', 'instanceId': '', 'state': ''
+        }
+        stubber.assert_no_pending_responses()
+
+
+@moto.mock_ec2
+def test_state_handler():
+    """Test state_handler() function."""
+    event = {'pathParameters': {'name': 'foobar'}}
+    response = mcserver.state_handler(event, {})
+    assert response.get('statusCode') == 200
+    assert json.loads(response.get('body'))['state'] == ''
+
+
+def test_post_handler_wait():
+    """Test post_handler() function waits for the new state."""
+    client = make_stubbed_client()
+    instance = {
+        'InstanceId': 'i-0123456789',
+        'State': {'Name': 'running'},
+        'Tags': [{'Key': 'Name', 'Value': 'minecraft-main-server-foobar'}]
+    }
+    stopped = dict(instance, State={'Name': 'stopped'})
+    event = {
+        'pathParameters': {'name': 'foobar'},
+        'body': json.dumps({'state': 'stopped', 'wait': True})
+    }
+    with botocore.stub.Stubber(client) as stubber:
+        for _ in range(2):
+            stubber.add_response('describe_instances', {
+                'Reservations': [{'Instances': [instance]}]
+            })
+        stubber.add_response('stop_instances', {'StoppingInstances': [{
+            'InstanceId': 'i-0123456789',
+            'CurrentState': {'Code': 64, 'Name': 'stopping'}
+        }]})
+        for _ in range(2):
+            stubber.add_response('describe_instances', {
+                'Reservations': [{'Instances': [stopped]}]
+            })
+        response = mcserver.post_handler(event, FakeContext(3000))
+        assert json.loads(response['body'])['state'] == 'stopped'
+        stubber.assert_no_pending_responses()
+
+
+def test_wait_for_state():
+    """Test wait_for_state() function gives up within the budget."""
+    client = make_stubbed_client()
+    server = {'name': 'foobar', 'instanceId': 'i-0123456789'}
+    assert mcserver.wait_for_state(server, 'rebooting', 10)
+    with botocore.stub.Stubber(client) as stubber:
+        stubber.add_response('describe_instances', {'Reservations': [{
+            'Instances': [{
+                'InstanceId': 'i-0123456789',
+                'State': {'Name': 'stopping'}
+            }]
+        }]})
+        assert not mcserver.wait_for_state(server, 'stopped', 0)
+        stubber.assert_no_pending_responses()
+
+
+def test_handlers_deadline():
+    """Test handlers respond without AWS calls once out of time."""
+    client = make_stubbed_client()
+    event = {
+        'pathParameters': {'name': 'foobar'},
+        'body': json.dumps({'state': 'running'})
+    }
+    with botocore.stub.Stubber(client) as stubber:
+        response = mcserver.post_handler(event, FakeContext(500))
+        assert response['statusCode'] == 504
+        assert 'deadline exceeded' in json.loads(response['body'])['message']
+
+        response = mcserver.get_handler(event, FakeContext(500))
+        assert json.loads(response['body'])['degraded']
+        response = mcserver.state_handler(event, FakeContext(500))
+        assert json.loads(response['body'])['state'] == ''
+        stubber.assert_no_pending_responses()
@@ -1,7 +1,14 @@
 """Unit testing for 'mcservers' module."""
 
+import json
+import time
+import boto3
+import botocore.stub
 import moto
+import awsclients
 import mcservers
+import myutils
+from tests.helpers import FakeContext, run_concurrently, run_server
 
 
 @moto.mock_ec2
@@ -9,3 +16,143 @@ def test_gather():
     """Test gather() function."""
     servers = mcservers.gather()
     assert servers == []
+
+    run_server('foo')
+    run_server('bar')
+    assert len(mcservers.gather()) == 2
+    assert [s['name'] for s in mcservers.gather(['bar', 'baz'])] == ['bar']
+
+
+@moto.mock_ec2
+def test_change_state():
+    """Test change_state() function."""
+    foo_id = run_server('foo')
+    bar_id = run_server('bar')
+
+    results = mcservers.change_state(['foo', 'baz'], 'stopped')
+    assert results == [{
+        'name': 'foo',
+        'instanceId': foo_id,
+        'previousState': 'running',
+        'state': 'stopping'
+    }, {
+        'name': 'baz',
+        'error': 'server not found'
+    }]
+
+    results = mcservers.change_state(None, 'stopped')
+    assert {r['instanceId'] for r in results} == {foo_id, bar_id}
+
+    assert mcservers.change_state([], 'stopped') == []
+
+
+@moto.mock_ec2
+def test_post_handler():
+    """Test post_handler() function."""
+    run_server('foo')
+
+    event = {'body': json.dumps({'state': 'foobar'})}
+    response = mcservers.post_handler(event, {})
+    assert response.get('statusCode') == 400
+    for names in ('foo', ['foo', 1], {'foo': True}):
+        event = {'body': json.dumps({'names': names, 'state': 'stopped'})}
+        response = mcservers.post_handler(event, {})
+        assert response.get('statusCode') == 400
+
+    event = {'body': json.dumps({'names': ['foo'], 'state': 'stopped'})}
+    response = mcservers.post_handler(event, {})
+    assert response.get('statusCode') == 200
+    servers = json.loads(response.get('body'))['servers']
+    assert servers[0]['name'] == 'foo'
+    assert servers[0]['state'] == 'stopping'
+
+
+@moto.mock_ec2
+def test_get_handler_query():
+    """Test get_handler() function filters, sorts and projects servers."""
+    foo_id = run_server('foo')
+    run_server('bar', 'test')
+    run_server('baz')
+    boto3.client('ec2').stop_instances(InstanceIds=[foo_id])
+
+    def get_servers(**params):
+        response = mcservers.get_handler(
+            {'queryStringParameters': params}, {})
+        assert response['statusCode'] == 200
+        return json.loads(response['body'])['servers']
+
+    assert [s['name'] for s in get_servers(state='running', sort='name')] \
+        == ['bar', 'baz']
+    assert [s['name'] for s in get_servers(environment='main,dev')] \
+        == ['foo', 'baz']
+    assert get_servers(sort='-name', limit='2', fields='name,state') == [
+        {'name': 'foo', 'state': 'stopped'},
+        {'name': 'baz', 'state': 'running'}
+    ]
+    assert get_servers(state='stopping, stopped', fields='instanceId') == [
+        {'instanceId': foo_id}
+    ]
+
+    for params in ({'state': 'terminated'}, {'sort': 'size'},
+                   {'fields': 'name,size'}, {'limit': '0'},
+                   {'environment': ','}):
+        response = mcservers.get_handler(
+            {'queryStringParameters': params}, {})
+        assert response['statusCode'] == 400
+
+
+def test_get_filters():
+    """Test get_filters() function pushes the state filter down to EC2."""
+    filters = mcservers.get_filters(['foo'], ['stopped'], ['main'])
+    assert {'Name': 'instance-state-name', 'Values': ['stopped']} in filters
+    assert {'Name': 'tag:Environment', 'Values': ['main']} in filters
+    assert mcservers.get_filters()[1] == myutils.get_instance_filter()
+
+
+def make_instance(name):
+    """Return the EC2 data of a game server instance."""
+    return {
+        'InstanceId': 'i-' + name,
+        'State': {'Name': 'running'},
+        'Tags': [{'Key': 'Name', 'Value': 'minecraft-main-server-' + name}]
+    }
+
+
+def test_get_handler_deadline():
+    """Test get_handler() function lists the servers gathered in time."""
+    client = boto3.client('ec2', region_name='us-east-1')
+    client.meta.events.register(
+        'before-parameter-build.ec2', lambda **kwargs: time.sleep(0.6))
+    awsclients.set_client('ec2', client)
+    with botocore.stub.Stubber(client) as stubber:
+        stubber.add_response('describe_instances', {
+            'Reservations': [{'Instances': [make_instance('foo')]}],
+            'NextToken': 'page-2'
+        })
+        stubber.add_response('describe_instances', {
+            'Reservations': [{'Instances': [make_instance('bar')]}]
+        })
+        response = mcservers.get_handler({}, FakeContext(1500))
+
+        # the second page would have been requested too late
+        assert len(stubber._queue) == 1  # pylint: disable=protected-access
+    body = json.loads(response['body'])
+    assert [server['name'] for server in body['servers']] == ['foo']
+    assert body['degraded']
+
+
+def test_gather_concurrently():
+    """Test gather() function shares one EC2 listing among many threads."""
+    client = boto3.client('ec2', region_name='us-east-1')
+    client.meta.events.register(
+        'before-parameter-build.ec2', lambda **kwargs: time.sleep(0.2))
+    awsclients.set_client('ec2', client)
+    with botocore.stub.Stubber(client) as stubber:
+        stubber.add_response('describe_instances', {
+            'Reservations': [{'Instances': [make_instance('foo')]}]
+        })
+        results = run_concurrently(lambda index: mcservers.gather())
+        stubber.assert_no_pending_responses()
+    assert all(
+        [server['name'] for server in servers] == ['foo']
+        for servers in results)
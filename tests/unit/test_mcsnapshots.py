@@ -1,10 +1,26 @@
 """Unit testing for 'mcsnapshots' module."""
 
+import datetime
 import json
+import socket
+import time
 import boto3
+import botocore.exceptions
+import botocore.stub
 import moto
+import pytest
+import awsclients
+import deadlines
+import ebsmapper
+import jsonstream
 import mcsnapshots
+import mcusers
 import myutils
+import records
+import snapshotcatalog
+from tests.helpers import (
+    FakeContext, attach_data_volume, put_password, run_concurrently,
+    run_server)
 
 
 @moto.mock_ec2
@@ -17,6 +33,244 @@ def test_gather():
     assert snapshots == []
 
 
+def test_gather_page():
+    """Test gather_page() function."""
+    client = boto3.client('ec2', region_name='us-east-1')
+    awsclients.set_client('ec2', client)
+    with botocore.stub.Stubber(client) as stubber:
+        stubber.add_response('describe_snapshots', {
+            'Snapshots': [{'SnapshotId': 'snap-1'}, {'SnapshotId': 'snap-2'}],
+            'NextToken': 'page-2'
+        })
+        stubber.add_response('describe_snapshots', {
+            'Snapshots': [{'SnapshotId': 'snap-3'}]
+        }, {
+            'OwnerIds': ['self'],
+            'Filters': botocore.stub.ANY,
+            'MaxResults': botocore.stub.ANY,
+            'NextToken': 'page-2'
+        })
+
+        snapshots, next_token = mcsnapshots.gather_page('foobar', 3)
+        assert [s['snapshotId'] for s in snapshots] == [
+            'snap-1', 'snap-2', 'snap-3']
+        assert next_token is None
+        stubber.assert_no_pending_responses()
+
+
+@moto.mock_ec2
+def test_gather_page_limit():
+    """Test gather_page() function with a truncated page."""
+    ec2 = boto3.resource('ec2')
+    volume = ec2.create_volume(AvailabilityZone='', Size=4)
+    for _ in range(3):
+        mcsnapshots.create_snapshot(volume.id, 'unittest', 'foobar', 'pytest')
+
+    snapshots, next_token = mcsnapshots.gather_page('foobar', 2)
+    assert len(snapshots) == 2
+    assert next_token is not None
+
+    snapshots, next_token = mcsnapshots.gather_page('foobar', 2, next_token)
+    assert len(snapshots) == 1
+    assert next_token is None
+
+
+def test_get_handler_payload_limit(monkeypatch):
+    """Test get_handler() function cuts pages short at the payload limit."""
+    item = ebsmapper.map_snapshot({'SnapshotId': 'snap-1'}).to_json()
+    monkeypatch.setattr(jsonstream, 'MAX_RESPONSE_BYTES', 3 * (
+        jsonstream.get_size(item) + 2) + jsonstream.RESERVE_BYTES)
+    client = boto3.client('ec2', region_name='us-east-1')
+    awsclients.set_client('ec2', client)
+    with botocore.stub.Stubber(client) as stubber:
+        stubber.add_response('describe_snapshots', {
+            'Snapshots': [{'SnapshotId': 'snap-1'}, {'SnapshotId': 'snap-2'}],
+            'NextToken': 'page-2'
+        })
+        stubber.add_response('describe_snapshots', {
+            'Snapshots': [{'SnapshotId': 'snap-3'}, {'SnapshotId': 'snap-4'}]
+        })
+        stubber.add_response('describe_snapshots', {
+            'Snapshots': [{'SnapshotId': 'snap-3'}, {'SnapshotId': 'snap-4'}]
+        }, {
+            'OwnerIds': ['self'],
+            'Filters': botocore.stub.ANY,
+            'MaxResults': botocore.stub.ANY,
+            'NextToken': 'page-2'
+        })
+
+        response = mcsnapshots.get_handler({}, {})
+        body = json.loads(response['body'])
+        assert [s['snapshotId'] for s in body['snapshots']] == [
+            'snap-1', 'snap-2', 'snap-3']
+
+        # resumes within the second page
+        event = {'queryStringParameters': {'nextToken': body['nextToken']}}
+        response = mcsnapshots.get_handler(event, {})
+        body = json.loads(response['body'])
+        assert [s['snapshotId'] for s in body['snapshots']] == ['snap-4']
+        assert 'nextToken' not in body
+        stubber.assert_no_pending_responses()
+
+    event = {'queryStringParameters': {'nextToken': 'foobar'}}
+    assert mcsnapshots.get_handler(event, {})['statusCode'] == 400
+
+
+def test_get_handler_deadline():
+    """Test get_handler() function resumes a listing cut short in time."""
+    client = boto3.client('ec2', region_name='us-east-1')
+    client.meta.events.register(
+        'before-parameter-build.ec2', lambda **kwargs: time.sleep(0.6))
+    awsclients.set_client('ec2', client)
+    with botocore.stub.Stubber(client) as stubber:
+        stubber.add_response('describe_snapshots', {
+            'Snapshots': [{'SnapshotId': 'snap-1'}, {'SnapshotId': 'snap-2'}],
+            'NextToken': 'page-2'
+        })
+        stubber.add_response('describe_snapshots', {
+            'Snapshots': [{'SnapshotId': 'snap-3'}]
+        }, {
+            'OwnerIds': ['self'],
+            'Filters': botocore.stub.ANY,
+            'MaxResults': botocore.stub.ANY,
+            'NextToken': 'page-2'
+        })
+
+        response = mcsnapshots.get_handler({}, FakeContext(1500))
+        body = json.loads(response['body'])
+        assert [s['snapshotId'] for s in body['snapshots']] == [
+            'snap-1', 'snap-2']
+        assert body['degraded']
+
+        event = {'queryStringParameters': {'nextToken': body['nextToken']}}
+        response = mcsnapshots.get_handler(event, {})
+        body = json.loads(response['body'])
+        assert [s['snapshotId'] for s in body['snapshots']] == ['snap-3']
+        assert 'degraded' not in body
+        stubber.assert_no_pending_responses()
+
+
+def test_get_handler_query(monkeypatch):
+    """Test get_handler() function filters snapshots in and out of EC2."""
+    item = records.get_projection(('snapshotId',))(
+        ebsmapper.map_snapshot({'SnapshotId': 'snap-1'})).to_json()
+    monkeypatch.setattr(jsonstream, 'MAX_RESPONSE_BYTES', (
+        jsonstream.get_size(item) + 2) + jsonstream.RESERVE_BYTES)
+    client = boto3.client('ec2', region_name='us-east-1')
+    awsclients.set_client('ec2', client)
+
+    def make_snapshot(snapshot_id, timestamp):
+        return {'SnapshotId': snapshot_id, 'Tags': [
+            {'Key': 'Timestamp', 'Value': timestamp}]}
+
+    page_1 = {
+        'Snapshots': [
+            make_snapshot('snap-1', '2021-04-19T23:00:00'),
+            make_snapshot('snap-2', '2021-04-20T07:00:00'),
+            make_snapshot('snap-3', '2021-04-20T05:00:00'),
+            make_snapshot('snap-4', '2021-04-20T08:00:00')
+        ],
+        'NextToken': 'page-2'
+    }
+    page_2 = {'Snapshots': [make_snapshot('snap-5', '2021-04-20T09:00:00')]}
+    with botocore.stub.Stubber(client) as stubber:
+        stubber.add_response('describe_snapshots', page_1, {
+            'OwnerIds': ['self'],
+            'Filters': [
+                myutils.get_application_filter(),
+                {'Name': 'tag:Event', 'Values': ['nightly']},
+                {'Name': 'tag:Timestamp',
+                 'Values': ['2021-04-20*', '2021-04-21*']}
+            ],
+            'MaxResults': botocore.stub.ANY
+        })
+        stubber.add_response('describe_snapshots', page_1)
+        stubber.add_response('describe_snapshots', page_2)
+        stubber.add_response('describe_snapshots', page_2)
+
+        # one snapshot per response, resumed past those out of range
+        params = {
+            'event': 'nightly',
+            'since': '2021-04-20T06:00',
+            'until': '2021-04-21',
+            'fields': 'snapshotId'
+        }
+        listed = []
+        while params.get('nextToken', '') is not None:
+            response = mcsnapshots.get_handler(
+                {'queryStringParameters': params}, {})
+            body = json.loads(response['body'])
+            listed.extend(body['snapshots'])
+            params['nextToken'] = body.get('nextToken')
+        assert listed == [
+            {'snapshotId': 'snap-2'},
+            {'snapshotId': 'snap-4'},
+            {'snapshotId': 'snap-5'}
+        ]
+        stubber.assert_no_pending_responses()
+
+
+@moto.mock_ec2
+def test_get_handler_sort():
+    """Test get_handler() function sorts snapshots by any field."""
+    ec2 = boto3.resource('ec2')
+    volume = ec2.create_volume(AvailabilityZone='', Size=4)
+    for event_name in ('nightly', 'maintenance', 'nightly', 'nightly'):
+        mcsnapshots.create_snapshot(volume.id, event_name, 'foobar', 'main')
+    timestamps = sorted(
+        snapshot['timestamp'] for snapshot in mcsnapshots.gather('foobar'))
+
+    event = {'queryStringParameters': {
+        'event': 'nightly',
+        'sort': '-timestamp',
+        'limit': '2',
+        'fields': 'timestamp,event'
+    }}
+    response = mcsnapshots.get_handler(event, {})
+    assert json.loads(response['body']) == {'snapshots': [
+        {'timestamp': timestamps[3], 'event': 'nightly'},
+        {'timestamp': timestamps[2], 'event': 'nightly'}
+    ]}
+
+    event = {'queryStringParameters': {'since': timestamps[1]}}
+    response = mcsnapshots.get_handler(event, {})
+    assert len(json.loads(response['body'])['snapshots']) == 3
+
+    for params in ({'sort': 'timestamp', 'nextToken': 'foobar'},
+                   {'sort': 'state'}, {'fields': ''},
+                   {'since': 'yesterday'}, {'until': '2021-04-20T06:00Z'}):
+        event = {'queryStringParameters': params}
+        assert mcsnapshots.get_handler(event, {})['statusCode'] == 400
+
+
+def test_get_days():
+    """Test get_days() function."""
+    assert mcsnapshots.get_days('2022-02-27T06:00:00', '2022-03-01') == [
+        '2022-02-27', '2022-02-28', '2022-03-01']
+    assert mcsnapshots.get_days('2022-03-01', '2022-02-27') == ['2022-03-01']
+    assert mcsnapshots.get_days(None, '2022-03-01') is None
+    assert mcsnapshots.get_days('2000-01-01', None) is None
+    assert len(mcsnapshots.get_days(
+        datetime.date.today().isoformat(), None)) == 2
+
+
+def test_gather_concurrently():
+    """Test gather() function shares one listing among many threads."""
+    client = boto3.client('ec2', region_name='us-east-1')
+    client.meta.events.register(
+        'before-parameter-build.ec2', lambda **kwargs: time.sleep(0.2))
+    awsclients.set_client('ec2', client)
+    with botocore.stub.Stubber(client) as stubber:
+        stubber.add_response('describe_snapshots', {
+            'Snapshots': [{'SnapshotId': 'snap-1'}]
+        })
+        results = run_concurrently(lambda index: mcsnapshots.gather('foo'))
+        stubber.assert_no_pending_responses()
+    assert all(
+        [snapshot['snapshotId'] for snapshot in snapshots] == ['snap-1']
+        for snapshots in results)
+
+
 @moto.mock_ec2
 def test_fetch_volume_id():
     """Test fetch_volume_id() function."""
@@ -33,6 +287,7 @@ def test_create_snapshot():
     """Test create_snapshot() function."""
     ec2 = boto3.resource('ec2')
     volume = ec2.create_volume(AvailabilityZone='', Size=4)
+    assert mcsnapshots.gather('foobar') == []
 
     snapshot = mcsnapshots.create_snapshot(
         volume.id, 'unittest', 'foobar', 'pytest')
@@ -44,6 +299,7 @@ def test_create_snapshot():
     assert myutils.get_first('Environment', tags) == 'pytest'
     assert myutils.get_first('Event', tags) == 'unittest'
     assert myutils.get_first('Server', tags) == 'foobar'
+    assert len(mcsnapshots.gather('foobar')) == 1
 
 
 @moto.mock_ec2
@@ -56,6 +312,15 @@ def test_get_handler():
     response = mcsnapshots.get_handler(event, {})
     assert response.get('statusCode') == 200
 
+    event = {'pathParameters': None, 'queryStringParameters': {'limit': '5'}}
+    response = mcsnapshots.get_handler(event, {})
+    assert response.get('statusCode') == 200
+    assert json.loads(response.get('body')) == {'snapshots': []}
+
+    event = {'queryStringParameters': {'limit': 'foobar'}}
+    response = mcsnapshots.get_handler(event, {})
+    assert response.get('statusCode') == 400
+
 
 @moto.mock_ec2
 def test_post_handler():
@@ -69,3 +334,229 @@ def test_post_handler():
     event = {'body': body, 'pathParameters': {'name': 'foobar'}}
     response = mcsnapshots.post_handler(event, {})
     assert response.get('statusCode') == 200
+
+
+@moto.mock_ec2
+def test_post_handler_indexed_volume():
+    """Test post_handler() function snapshots the indexed data volume."""
+    volume_id = attach_data_volume(run_server('foobar'))
+    event = {
+        'body': json.dumps({'event': 'unittest'}),
+        'pathParameters': {'name': 'foobar'}
+    }
+    response = mcsnapshots.post_handler(event, {})
+    snapshot_id = json.loads(response['body'])['snapshotId']
+
+    snapshots = boto3.client('ec2').describe_snapshots(
+        SnapshotIds=[snapshot_id])['Snapshots']
+    assert snapshots[0]['VolumeId'] == volume_id
+
+
+@moto.mock_ec2
+def test_gather_catalog(monkeypatch):
+    """Test gather() function serves snapshots from the catalog."""
+    monkeypatch.setattr(mcsnapshots, 'CATALOG_PATH', ':memory:')
+    ec2 = boto3.resource('ec2')
+    volume = ec2.create_volume(AvailabilityZone='', Size=4)
+    mcsnapshots.create_snapshot(volume.id, 'unittest', 'foobar', 'pytest')
+    assert len(mcsnapshots.gather('foobar')) == 1
+
+    # created here (cataloged at once) and elsewhere (found by delta sync)
+    mcsnapshots.create_snapshot(volume.id, 'unittest', 'foobar', 'pytest')
+    elsewhere = volume.create_snapshot(TagSpecifications=[{
+        'ResourceType': 'snapshot',
+        'Tags': [
+            {'Key': 'Application', 'Value': 'mcservers'},
+            {'Key': 'Server', 'Value': 'foobar'},
+            {'Key': 'Timestamp', 'Value': datetime.datetime.now().isoformat()}
+        ]
+    }])
+    assert len(mcsnapshots.gather('foobar')) == 2
+    catalog = mcsnapshots.get_catalog()
+    monkeypatch.setattr(
+        catalog, 'timer', lambda: time.time() + snapshotcatalog.SYNC_SECONDS)
+    assert len(mcsnapshots.gather('foobar')) == 3
+
+    snapshots, next_token = mcsnapshots.gather_page('foobar', 2)
+    assert len(snapshots) == 2
+    event = {'queryStringParameters': {'limit': '2', 'nextToken': next_token}}
+    response = mcsnapshots.get_handler(event, {})
+    assert len(json.loads(response['body'])['snapshots']) == 1
+
+    # the one created elsewhere has no event
+    event = {'queryStringParameters': {'event': 'unittest', 'fields': 'event'}}
+    response = mcsnapshots.get_handler(event, {})
+    assert json.loads(response['body'])['snapshots'] == [
+        {'event': 'unittest'}, {'event': 'unittest'}]
+
+    event = {'queryStringParameters': {'nextToken': 'foobar'}}
+    assert mcsnapshots.get_handler(event, {})['statusCode'] == 400
+
+    # deleted elsewhere (dropped by the next delta sync)
+    elsewhere.delete()
+    monkeypatch.setattr(
+        catalog, 'timer',
+        lambda: time.time() + 2 * snapshotcatalog.SYNC_SECONDS)
+    assert len(mcsnapshots.gather('foobar')) == 2
+
+
+@moto.mock_ec2
+def test_post_all_handler():
+    """Test post_all_handler() function."""
+    volume_id = attach_data_volume(run_server('foo'))
+    run_server('bar')
+    event = {'body': json.dumps({
+        'names': ['foo', 'bar', 'baz'],
+        'event': 'maintenance'
+    })}
+    response = mcsnapshots.post_all_handler(event, {})
+    results = {r['name']: r for r in json.loads(response['body'])['snapshots']}
+    assert results['foo']['snapshotId'].startswith('snap-')
+    assert results['bar']['error'] == 'data volume not found'
+    assert results['baz']['error'] == 'server not found'
+
+    snapshots = mcsnapshots.gather('foo')
+    assert [s['event'] for s in snapshots] == ['maintenance']
+    assert mcsnapshots.fetch_volume_ids([results['foo']['instanceId']]) == {
+        results['foo']['instanceId']: volume_id
+    }
+
+    event = {'body': json.dumps({'names': 'foo', 'event': 'maintenance'})}
+    response = mcsnapshots.post_all_handler(event, {})
+    assert response['statusCode'] == 400
+
+    response = mcsnapshots.post_all_handler({'body': None}, {})
+    assert len(json.loads(response['body'])['snapshots']) == 2
+
+
+def test_create_snapshots():
+    """Test create_snapshots() function reports partial failures."""
+    client = boto3.client('ec2', region_name='us-east-1')
+    awsclients.set_client('ec2', client)
+    servers = [{'name': 'foobar', 'instanceId': 'i-1'}]
+    with botocore.stub.Stubber(client) as stubber:
+        stubber.add_response('describe_volumes', {'Volumes': [{
+            'VolumeId': 'vol-1',
+            'Attachments': [{'InstanceId': 'i-1', 'Device': '/dev/sdm'}]
+        }]})
+        stubber.add_client_error(
+            'create_snapshot', 'SnapshotCreationPerVolumeRateExceeded')
+        results = mcsnapshots.create_snapshots(servers, 'maintenance')
+        assert 'SnapshotCreationPerVolumeRateExceeded' in results[0]['error']
+        stubber.assert_no_pending_responses()
+
+
+def test_create_snapshots_errors(monkeypatch):
+    """Test create_snapshots() function keeps errors to their server."""
+    servers = [{'name': name, 'instanceId': 'i-' + name}
+               for name in ('foo', 'bar', 'baz')]
+    failures = {
+        'foo': botocore.exceptions.EndpointConnectionError(
+            endpoint_url='https://ec2.us-east-1.amazonaws.com'),
+        'bar': ConnectionRefusedError('connection refused')
+    }
+
+    def create_snapshot(volume_id, event_name, server_name, *args):
+        if server_name in failures:
+            raise failures[server_name]
+        return {'SnapshotId': 'snap-' + server_name, 'State': 'pending'}
+
+    monkeypatch.setattr(mcsnapshots, 'fetch_volume_ids', lambda ids, _: {
+        instance_id: 'vol-' + instance_id for instance_id in ids})
+    monkeypatch.setattr(mcsnapshots, 'create_snapshot', create_snapshot)
+    results = mcsnapshots.create_snapshots(servers, 'maintenance')
+    assert 'Could not connect' in results[0]['error']
+    assert results[1]['error'] == 'connection refused'
+    assert results[2]['snapshotId'] == 'snap-baz'
+
+
+RUNNING_SERVER = {
+    'name': 'foobar',
+    'state': 'running',
+    'publicIpAddress': '127.0.0.1'
+}
+
+
+@moto.mock_ssm
+def test_paused_saves(fake_rcon):
+    """Test paused_saves() function flushes and always resumes saves."""
+    put_password('foobar')
+    with mcsnapshots.paused_saves(RUNNING_SERVER) as flushed:
+        assert flushed
+        assert fake_rcon.commands == ['save-off', 'save-all flush']
+    assert fake_rcon.commands[-1] == 'save-on'
+
+    fake_rcon.commands.clear()
+    with pytest.raises(RuntimeError):
+        with mcsnapshots.paused_saves(RUNNING_SERVER):
+            raise RuntimeError('snapshot failed')
+    assert fake_rcon.commands == ['save-off', 'save-all flush', 'save-on']
+
+    with mcsnapshots.paused_saves({'state': 'stopped'}) as flushed:
+        assert flushed
+    with mcsnapshots.paused_saves({'state': 'pending'}) as flushed:
+        assert not flushed
+
+
+@moto.mock_ssm
+def test_paused_saves_timeout(fake_rcon):
+    """Test paused_saves() function resumes saves after a slow flush."""
+    put_password('foobar')
+    fake_rcon.responses['save-all flush'] = \
+        lambda command: time.sleep(0.5) or 'Saved the game'
+    with mcsnapshots.paused_saves(RUNNING_SERVER, timeout=0.2) as flushed:
+        assert not flushed
+    assert fake_rcon.commands == ['save-off', 'save-all flush', 'save-on']
+
+
+@moto.mock_ec2
+@moto.mock_ssm
+def test_create_snapshots_deadline(fake_rcon, monkeypatch):
+    """Test create_snapshots() function leaves time to resume saves."""
+    put_password('foobar')
+    instance_id = run_server('foobar')
+    attach_data_volume(instance_id)
+    server = dict(RUNNING_SERVER, instanceId=instance_id)
+    monkeypatch.setattr(mcsnapshots, 'SAVE_TIMEOUT_SECONDS', 0.2)
+    deadline = deadlines.Deadline(1.5)
+    left = []
+    fake_rcon.responses['save-on'] = \
+        lambda command: left.append(deadline.remaining()) or ''
+
+    def create_snapshot(*args):
+        # the snapshot call runs until its deadline
+        time.sleep(args[-1].remaining())
+        return {'SnapshotId': 'snap-1', 'State': 'pending'}
+
+    monkeypatch.setattr(mcsnapshots, 'create_snapshot', create_snapshot)
+    results = mcsnapshots.create_snapshots(
+        [server], 'maintenance', consistent=True, deadline=deadline)
+    assert results[0]['snapshotId'] == 'snap-1'
+    assert fake_rcon.commands == ['save-off', 'save-all flush', 'save-on']
+    assert left[0] > mcsnapshots.SAVE_ON_ATTEMPTS * 0.2 - 0.1
+
+
+@moto.mock_ssm
+def test_paused_saves_refused(monkeypatch):
+    """Test paused_saves() function without a reachable RCON port."""
+    put_password('foobar')
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    monkeypatch.setattr(mcusers, 'RCON_PORT', port)
+    with mcsnapshots.paused_saves(RUNNING_SERVER) as flushed:
+        assert not flushed
+
+
+@moto.mock_ec2
+@moto.mock_ssm
+def test_create_snapshots_consistent(fake_rcon):
+    """Test create_snapshots() function flushes running servers."""
+    put_password('foobar')
+    instance_id = run_server('foobar')
+    attach_data_volume(instance_id)
+    server = dict(RUNNING_SERVER, instanceId=instance_id)
+    results = mcsnapshots.create_snapshots(
+        [server], 'maintenance', consistent=True)
+    assert results[0]['consistent']
+    assert fake_rcon.commands == ['save-off', 'save-all flush', 'save-on']
@@ -1,9 +1,14 @@
 """Unit testing for 'mcusers' module."""
 
+import json
+import time
 import boto3
 import mock
 import moto
 import mcusers
+import myutils
+from tests import fakercon
+from tests.helpers import FakeContext, put_password
 
 
 def test_parse_mcrcon_list():
@@ -26,10 +31,13 @@ def test_gather():
     ssm = boto3.client('ssm')
     ssm.put_parameter(
         Name='/minecraft/mcrcon/password',
-        Value='foobar'
+        Value='foobar',
+        Type='SecureString'
     )
 
-    with mock.patch('mcusers.mcrcon.MCRcon'):
+    with mock.patch(
+            'mcusers.send_command',
+            return_value='There are 0 of a max of 20 players online:'):
 
         with mock.patch(
                 'mcusers.mcserver.gather',
@@ -66,3 +74,135 @@ def test_gather():
             users = mcusers.gather('')
             assert users['count'] == 0
             assert users['names'] == []
+
+
+@moto.mock_ssm
+def test_gather_fake_rcon(fake_rcon):
+    """Test gather() function against a fake RCON server."""
+    put_password('foobar')
+    with mock.patch(
+            'mcusers.mcserver.gather',
+            return_value={
+                'state': 'running',
+                'publicIpAddress': '127.0.0.1'
+            }):
+        users = mcusers.gather('')
+        assert users == {'count': 1, 'names': ['Steve']}
+        users = mcusers.gather('')
+        assert users == {'count': 1, 'names': ['Steve']}
+    # each query logs in within its own time limit
+    assert fake_rcon.logins == 2
+    assert fake_rcon.commands == ['list', 'list']
+
+
+@moto.mock_ssm
+def test_send_command_metrics(fake_rcon, monkeypatch):
+    """Test send_command() function times RCON round-trips."""
+    put_password('foobar')
+    metrics = myutils.RequestMetrics()
+    monkeypatch.setattr(myutils, '_metrics', metrics)
+    fake_rcon.responses['save-all flush'] = 'Saved the game'
+    assert mcusers.send_command('127.0.0.1', 'save-all flush') == \
+        'Saved the game'
+    assert mcusers.send_command('127.0.0.1', 'list').startswith('There are')
+    assert metrics.timings['rcon.save-all'][0] == 1
+    assert metrics.timings['rcon.list'][0] == 1
+
+
+@moto.mock_ssm
+def test_get_handler_slow_rcon(monkeypatch):
+    """Test get_handler() function gives up on a slow RCON server in time."""
+    put_password('foobar')
+    event = {'pathParameters': {'name': 'foobar'}}
+    with fakercon.FakeRconServer(latency=2.0) as slow, mock.patch(
+            'mcusers.mcserver.gather',
+            return_value={
+                'state': 'running',
+                'publicIpAddress': '127.0.0.1'
+            }):
+        monkeypatch.setattr(mcusers, 'RCON_PORT', slow.port)
+        start = time.monotonic()
+        response = mcusers.get_handler(event, FakeContext(1500))
+        assert time.monotonic() - start < 1.0
+    users = json.loads(response['body'])
+    assert users['count'] is None
+    assert users['error'] == 'timed out'
+
+
+@moto.mock_ssm
+def test_get_password(fake_rcon):
+    """Test get_password() function caches and refreshes the password."""
+    put_password('stale')
+    assert mcusers.get_password() == 'stale'
+
+    put_password('foobar')
+    assert mcusers.get_password() == 'stale'
+    assert mcusers.send_command('127.0.0.1', 'list').startswith('There are 1')
+    assert mcusers.get_password() == 'foobar'
+    assert fake_rcon.logins == 2
+
+
+def make_fleet(latencies):
+    """Start fake RCON servers on distinct loopback addresses (same port)."""
+    fleet = []
+    port = 0
+    for i, latency in enumerate(latencies):
+        fake = fakercon.FakeRconServer(
+            host='127.0.0.{}'.format(i + 2),
+            port=port,
+            latency=latency,
+            responses={'list': 'There are {} of a max of 20 players '
+                               'online: {}'.format(i, ', '.join(
+                                   'User{}'.format(n) for n in range(i)))}
+        ).start()
+        port = fake.port
+        fleet.append(fake)
+    return fleet
+
+
+@moto.mock_ssm
+def test_census():
+    """Test census() function against several fake RCON servers."""
+    put_password('foobar')
+    fleet = make_fleet([0.3, 0.3, 0.3, 2])
+    try:
+        servers = [{
+            'name': 'world{}'.format(i),
+            'state': 'running',
+            'publicIpAddress': fake.server_address[0]
+        } for i, fake in enumerate(fleet)]
+        servers.append({'name': 'stopped', 'state': 'stopped'})
+
+        with mock.patch('mcusers.RCON_PORT', fleet[0].port):
+            start = time.monotonic()
+            users = mcusers.census(servers, timeout=1, concurrency=4)
+            elapsed = time.monotonic() - start
+
+        assert elapsed < 1.5
+        assert users['world0'] == {'count': 0, 'names': []}
+        assert users['world2'] == {'count': 2, 'names': ['User0', 'User1']}
+        assert users['world3']['count'] is None
+        assert 'timed out' in users['world3']['error']
+        assert users['stopped'] == {'count': 0, 'names': []}
+
+        with mock.patch('mcusers.RCON_PORT', fleet[0].port):
+            users = mcusers.census(servers[:3], concurrency=1, budget=1.2)
+        assert users['world0']['count'] == 0
+        assert users['world2']['count'] is None
+        assert 'budget' in users['world2']['error']
+    finally:
+        for fake in fleet:
+            fake.stop()
+
+
+@moto.mock_ec2
+def test_get_all_handler():
+    """Test get_all_handler() function."""
+    with mock.patch(
+            'mcusers.mcservers.gather',
+            return_value=[{'name': 'foobar', 'state': 'stopped'}]):
+        response = mcusers.get_all_handler({}, {})
+    assert response.get('statusCode') == 200
+    assert json.loads(response.get('body')) == {
+        'servers': {'foobar': {'count': 0, 'names': []}}
+    }
@@ -1,5 +1,89 @@
 """Unit testing for 'myutils' module."""
+import json
+import logging
+import sys
+import types
+import boto3
+import botocore.stub
+import awsclients
 import myutils
+from tests.helpers import run_concurrently
+
+
+class Unprintable:
+    """Define a payload that fails the test if it is ever formatted."""
+
+    def __repr__(self):
+        """Fail when formatted."""
+        raise AssertionError('payload was formatted')
+
+
+@myutils.log_calls(level=logging.DEBUG)
+def echo_debug(value):
+    """Return the given value (logged at DEBUG level)."""
+    return value
+
+
+@myutils.log_calls(limit=10)
+def echo_truncated(value):
+    """Return the given value (logged with truncated payloads)."""
+    return value
+
+
+@myutils.log_calls(sample_rate=0)
+def echo_unsampled(value):
+    """Return the given value (logged without payloads)."""
+    return value
+
+
+@myutils.emit_metrics
+@myutils.log_calls
+def measured_handler(event, context):  # pylint: disable=unused-argument
+    """Call EC2 and time an RCON command as a handler would."""
+    awsclients.get_client('ec2').describe_instances()
+    with myutils.timed('rcon.list'):
+        echo_debug(event)
+    return {'statusCode': 200}
+
+
+def test_log_calls_disabled(caplog):
+    """Test log_calls() decorator when its level is disabled."""
+    caplog.set_level(logging.INFO, logger=__name__)
+    payload = Unprintable()
+    assert echo_debug(payload) is payload
+    assert caplog.records == []
+
+
+def test_log_calls_enabled(caplog):
+    """Test log_calls() decorator when its level is enabled."""
+    caplog.set_level(logging.DEBUG, logger=__name__)
+    assert echo_debug('foobar') == 'foobar'
+    assert len(caplog.records) == 2
+    assert __name__ + '.echo_debug' in caplog.records[0].getMessage()
+    assert "'entering'" in caplog.records[0].getMessage()
+    assert "'exited'" in caplog.records[1].getMessage()
+    assert 'foobar' in caplog.records[1].getMessage()
+
+
+def test_log_calls_payloads(caplog):
+    """Test log_calls() decorator payload truncation & sampling."""
+    caplog.set_level(logging.INFO, logger=__name__)
+    echo_truncated('x' * 100)
+    assert 'x' * 11 not in caplog.records[0].getMessage()
+    assert '(105 chars)' in caplog.records[0].getMessage()
+
+    caplog.clear()
+    echo_unsampled(Unprintable())
+    assert len(caplog.records) == 2
+    assert 'args' not in caplog.records[0].getMessage()
+    assert 'result' not in caplog.records[1].getMessage()
+
+
+def test_format_payload():
+    """Test format_payload() function."""
+    assert myutils.format_payload({'a': 1}, 100) == "{'a': 1}"
+    assert myutils.format_payload(list(range(1000)), 1000).endswith('...]')
+    assert myutils.format_payload('abcdef', 3) == "'ab...(8 chars)"
 
 
 def test_get_first():
@@ -18,3 +102,121 @@ def test_get_first():
             {'Key': 'Hello', 'Value': 'Bizarro'}
         ]
     ) == 'World'
+
+
+def test_index_tags():
+    """Test index_tags() function."""
+    assert myutils.index_tags([]) == {}
+    assert myutils.index_tags([{'Key': 'Hello'}]) == {'Hello': ''}
+    assert myutils.index_tags([
+        {'Key': 'Hello', 'Value': 'World'},
+        {'Key': 'Hello', 'Value': 'Bizarro'},
+        {'Key': 'Foo', 'Value': 'Bar'}
+    ]) == {'Hello': 'World', 'Foo': 'Bar'}
+    assert myutils.index_tags([{}]).get('Hello', '') == ''
+
+
+def test_is_small_payload():
+    """Test is_small_payload() function."""
+    assert myutils.is_small_payload(None)
+    assert myutils.is_small_payload({'a': [1, 2, 3]})
+    assert not myutils.is_small_payload({'a': list(range(100))})
+    assert not myutils.is_small_payload([[1, 2]] * 30)
+
+
+def test_lazy_import(tmp_path, monkeypatch):
+    """Test lazy_import() function."""
+    assert myutils.lazy_import('json') is json
+
+    (tmp_path / 'lazyexample.py').write_text(
+        'LOADS = {}\nLOADS["lazyexample"] = True\nVALUE = 42\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, 'lazyexample', raising=False)
+    try:
+        module = myutils.lazy_import('lazyexample')
+        assert 'LOADS' not in vars(module)
+        assert module.VALUE == 42
+        assert vars(module)['LOADS'] == {'lazyexample': True}
+        assert type(module) is types.ModuleType
+    finally:
+        sys.modules.pop('lazyexample', None)
+
+
+def test_lazy_import_concurrently(tmp_path, monkeypatch):
+    """Test lazy_import() modules load once when first used by threads."""
+    loads = tmp_path / 'loads.txt'
+    (tmp_path / 'lazythreads.py').write_text('\n'.join([
+        'import time',
+        'with open({!r}, "a") as loads:'.format(str(loads)),
+        '    loads.write("loaded\\n")',
+        'time.sleep(0.1)',
+        'VALUE = 42',
+        ''
+    ]))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, 'lazythreads', raising=False)
+    try:
+        module = myutils.lazy_import('lazythreads')
+        results = run_concurrently(lambda index: module.VALUE)
+        assert results == [42] * len(results)
+        assert loads.read_text() == 'loaded\n'
+    finally:
+        sys.modules.pop('lazythreads', None)
+
+
+def test_emit_metrics(capsys, monkeypatch):
+    """Test emit_metrics() decorator prints one EMF document per request."""
+    monkeypatch.setattr(myutils, '_cold_start', True)
+    client = boto3.client('ec2', region_name='us-east-1')
+    awsclients.set_client('ec2', client)
+    try:
+        with botocore.stub.Stubber(client) as stubber:
+            for _ in range(2):
+                stubber.add_response(
+                    'describe_instances', {'Reservations': []})
+            assert measured_handler({}, None) == {'statusCode': 200}
+            assert measured_handler({}, None) == {'statusCode': 200}
+    finally:
+        awsclients.reset()
+
+    lines = capsys.readouterr().out.splitlines()
+    first, second = [json.loads(line) for line in lines]
+    directive = first['_aws']['CloudWatchMetrics'][0]
+    assert directive['Namespace'] == myutils.METRICS_NAMESPACE
+    assert directive['Dimensions'] == [['Function']]
+    assert {metric['Name'] for metric in directive['Metrics']} <= set(first)
+    assert first['Function'] == __name__ + '.measured_handler'
+    assert (first['ColdStart'], second['ColdStart']) == (1, 0)
+    assert first['AwsCalls'] == 1 and first['AwsRetries'] == 0
+    assert first['Calls']['ec2.DescribeInstances']['count'] == 1
+    assert first['RconCalls'] == 1
+    assert first['Timings']['rcon.list']['count'] == 1
+    assert first['Timings'][__name__ + '.echo_debug']['count'] == 1
+    assert first['Duration'] >= first['Timings']['rcon.list']['ms']
+    assert first['RequestId'] is None
+    assert myutils._metrics is None  # pylint: disable=protected-access
+
+
+def test_emit_metrics_disabled(capsys, monkeypatch):
+    """Test emit_metrics() decorator can be turned off."""
+    monkeypatch.setattr(myutils, 'METRICS_ENABLED', False)
+    with myutils.timed('rcon.list'):
+        pass
+    assert myutils.emit_metrics(lambda event, context: event)(1, None) == 1
+    assert capsys.readouterr().out == ''
+
+
+def test_end_aws_call(monkeypatch):
+    """Test end_aws_call() function counts the retries of a call."""
+    metrics = myutils.RequestMetrics()
+    context = {
+        'myutils_call': ('ec2.StartInstances', 0.0),
+        'retries': {'attempt': 3}
+    }
+    monkeypatch.setattr(myutils, '_metrics', metrics)
+    myutils.end_aws_call(context)
+    myutils.end_aws_call(context)
+    assert metrics.calls['ec2.StartInstances'][:2] == [1, 2]
+    document = metrics.to_emf('handler', 0.5, False)
+    assert document['AwsRetries'] == 2
+    assert document['Duration'] == 500.0
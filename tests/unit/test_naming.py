@@ -0,0 +1,97 @@
+"""Unit testing for 'naming' module."""
+
+import random
+import naming
+
+# parts used to generate names, including separators and odd pieces
+PARTS = [
+    'minecraft', 'mcservers', 'main', 'test', 'server', 'servers', 'hosts',
+    'instance', 'foobar', 'world1', '', '/', 'a/b', '1618900000.0'
+]
+
+
+def legacy_instance_name(full_name):
+    """Parse an instance name like the original ec2mapper code."""
+    if full_name.startswith('mcservers-'):
+        return full_name.split('/')[1]
+    return full_name.split('-')[-1]
+
+
+def legacy_snapshot_server(name):
+    """Parse a snapshot name like the original ebsmapper code."""
+    name_parts = name.split('-')
+    prefix = name_parts[0] if len(name_parts) > 0 else ''
+    if prefix == 'minecraft':
+        return name_parts[3] if len(name_parts) > 3 else ''
+    return name_parts[2] if len(name_parts) > 2 else ''
+
+
+def make_corpus(size, seed=42):
+    """Return reproducible random names of every shape."""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        name = '-'.join(
+            rng.choice(PARTS) for _ in range(rng.randint(0, 6)))
+        if rng.random() < 0.3:
+            name = name.replace('-', '/', 1)
+        corpus.append(name)
+    return corpus
+
+
+def make_server_name(rng):
+    """Return a random short server name (no separators)."""
+    alphabet = 'abcdefghijklmnopqrstuvwxyz0123456789_.'
+    return ''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 12)))
+
+
+def test_corpus_matches_legacy():
+    """Test parsers agree with the original code on any name."""
+    for name in make_corpus(20000):
+        if not name.startswith('mcservers-') or '/' in name:
+            assert naming.get_instance_name(name) == \
+                legacy_instance_name(name), name
+        assert naming.get_snapshot_server(name) == \
+            legacy_snapshot_server(name), name
+
+
+def test_schemes_round_trip():
+    """Test parsers recover the server of each naming scheme."""
+    rng = random.Random(7)
+    for _ in range(2000):
+        server = make_server_name(rng)
+        env = rng.choice(['main', 'test'])
+        timestamp = str(rng.uniform(0, 2e9))
+        assert naming.get_instance_name(
+            'minecraft-{}-server-{}'.format(env, server)) == server
+        assert naming.get_instance_name(
+            'mcservers-{}-hosts/{}/instance'.format(env, server)) == server
+        assert naming.get_snapshot_server(
+            'mcservers-{}-{}-{}'.format(env, server, timestamp)) == server
+        assert naming.get_snapshot_server(
+            'minecraft-{}-server-{}-{}'.format(env, server, timestamp)) \
+            == server
+
+
+def test_get_instance_name():
+    """Test get_instance_name() function."""
+    assert naming.get_instance_name('') == ''
+    assert naming.get_instance_name('foobar') == 'foobar'
+    assert naming.get_instance_name('mcservers-main-foobar') == 'foobar'
+
+    naming.clear_caches()
+    for _ in range(3):
+        naming.get_instance_name('minecraft-main-server-foobar')
+    assert naming.get_instance_name.cache_info().hits == 2
+
+
+def test_batch():
+    """Test batch functions match parsing names one at a time."""
+    corpus = make_corpus(1000) * 2
+    instances = [name for name in corpus if '/' in name
+                 or not name.startswith('mcservers-')]
+    assert naming.get_instance_names(instances) == \
+        [naming.get_instance_name(name) for name in instances]
+    assert naming.get_snapshot_servers(corpus) == \
+        [naming.get_snapshot_server(name) for name in corpus]
+    assert naming.get_snapshot_servers([]) == []
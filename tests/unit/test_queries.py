@@ -0,0 +1,64 @@
+"""Unit testing for 'queries' module."""
+
+import pytest
+import queries
+import records
+
+SERVERS = [
+    records.Server('foo', 'minecraft-main-server-foo', 'main', 'i-1',
+                   'running', ''),
+    records.Server('bar', 'minecraft-test-server-bar', 'test', 'i-2',
+                   'stopped', ''),
+    records.Server('baz', 'minecraft-main-server-baz', 'main', 'i-3',
+                   'running', '')
+]
+
+
+def test_get_values():
+    """Test get_values() function."""
+    assert queries.get_values({}, 'state') is None
+    assert queries.get_values({'state': 'running, stopped,running'},
+                              'state') == ['running', 'stopped']
+    with pytest.raises(ValueError, match='state must not be empty'):
+        queries.get_values({'state': ' , '}, 'state')
+    with pytest.raises(ValueError, match='state must be among running'):
+        queries.get_values({'state': 'stopped'}, 'state', ('running',))
+
+
+def test_get_sort():
+    """Test get_sort() and get_fields() functions."""
+    assert queries.get_sort({}, records.Server) is None
+    assert queries.get_sort({'sort': 'name'}, records.Server) == \
+        ('name', False)
+    assert queries.get_sort({'sort': '-state'}, records.Server) == \
+        ('state', True)
+    with pytest.raises(ValueError):
+        queries.get_sort({'sort': '-'}, records.Server)
+
+    assert queries.get_fields({'fields': 'state,name'}, records.Server) == \
+        ('state', 'name')
+    with pytest.raises(ValueError):
+        queries.get_fields({'fields': 'event'}, records.Server)
+
+
+def test_get_timestamp():
+    """Test get_timestamp() function normalizes timestamps as tagged."""
+    assert queries.get_timestamp({}, 'since') is None
+    assert queries.get_timestamp({'since': '2021-04-20'}, 'since') == \
+        '2021-04-20T00:00:00'
+    assert queries.get_timestamp({'until': '2021-04-20 06:26'}, 'until') \
+        == '2021-04-20T06:26:00'
+    for value in ('yesterday', '2021-04-20T06:26:40+00:00'):
+        with pytest.raises(ValueError):
+            queries.get_timestamp({'since': value}, 'since')
+
+
+def test_select():
+    """Test select() function."""
+    assert list(queries.select(SERVERS)) == SERVERS
+    assert list(queries.select(SERVERS, limit=2)) == SERVERS[:2]
+    selected = queries.select(SERVERS, ('state', True), 2, ('name',))
+    assert list(selected) == [{'name': 'bar'}, {'name': 'foo'}]
+    assert queries.get_limit({'limit': '3'}) == 3
+    with pytest.raises(ValueError):
+        queries.get_limit({'limit': '-1'})
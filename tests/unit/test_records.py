@@ -0,0 +1,77 @@
+"""Unit testing for 'records' module."""
+
+import json
+import pytest
+import records
+
+SNAPSHOT = {
+    'name': 'mcservers-test-foobar-1955-11-12T06:00Z',
+    'server': 'foobar',
+    'snapshotId': 'snap-0123456789',
+    'event': 'test.unit',
+    'timestamp': '1955-11-12T06:00Z'
+}
+
+
+def test_mapping():
+    """Test the dict-like interface of records."""
+    snapshot = records.Snapshot(*SNAPSHOT.values())
+    assert snapshot == SNAPSHOT
+    assert dict(snapshot) == SNAPSHOT
+    assert list(snapshot) == list(SNAPSHOT)
+    assert len(snapshot) == 5
+    assert snapshot['server'] == 'foobar'
+    assert snapshot.get('server') == 'foobar'
+    assert snapshot.get('state') is None
+    assert snapshot.get('state', '') == ''
+    assert 'state' not in snapshot
+    with pytest.raises(KeyError):
+        snapshot['state']  # pylint: disable=pointless-statement
+    with pytest.raises(AttributeError):
+        snapshot.state = 'running'  # pylint: disable=assigning-non-slot
+    assert not hasattr(snapshot, '__dict__')
+    assert repr(snapshot).startswith("Snapshot(name='mcservers-test-")
+
+
+def test_to_json():
+    """Test to_json() method and dumps() function."""
+    server = records.Server(
+        'föö"bar', 'minecraft-test-server-föö"bar',
+        'test', 'i-0123456789', 'running', '')
+    assert server.to_json() == json.dumps(dict(server))
+    assert json.loads(server.to_json()) == server
+
+    snapshot = records.Snapshot(*SNAPSHOT.values())
+    payload = {
+        'snapshots': [snapshot, snapshot],
+        'nextToken': None,
+        'count': 2,
+        'error': {'message': 'emoji \U0001F600'}
+    }
+    assert records.dumps(payload) == json.dumps({
+        'snapshots': [SNAPSHOT, SNAPSHOT],
+        'nextToken': None,
+        'count': 2,
+        'error': {'message': 'emoji \U0001F600'}
+    })
+    assert records.dumps({1: [True], None: 0.5}) == \
+        json.dumps({1: [True], None: 0.5})
+    assert records.dumps([]) == '[]'
+    assert records.dumps({}) == '{}'
+
+
+def test_get_projection():
+    """Test get_projection() function."""
+    snapshot = records.Snapshot(*SNAPSHOT.values())
+    project = records.get_projection(('timestamp', 'snapshotId'))
+    projected = project(snapshot)
+    assert projected == {
+        'timestamp': '1955-11-12T06:00Z',
+        'snapshotId': 'snap-0123456789'
+    }
+    assert projected.to_json() == json.dumps(dict(projected))
+    projected = records.get_projection(('name',))(snapshot)
+    assert projected == {'name': SNAPSHOT['name']}
+    assert projected.to_json() == json.dumps({'name': SNAPSHOT['name']})
+    assert records.get_projection(('name',)) is records.get_projection(
+        ('name',))
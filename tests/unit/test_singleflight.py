@@ -0,0 +1,72 @@
+"""Unit testing for 'singleflight' module."""
+
+import threading
+import time
+import pytest
+import singleflight
+from tests.helpers import run_concurrently
+
+
+def test_do():
+    """Test do() function runs lookups again once they are over."""
+    flights = singleflight.SingleFlight()
+    assert flights.do('foo', lambda value: [value], 1) == [1]
+    assert flights.do('foo', lambda value: [value], 2) == [2]
+    assert len(flights) == 0
+
+    with pytest.raises(KeyError):
+        flights.do('foo', {}.__getitem__, 'bar')
+    assert len(flights) == 0
+
+
+def test_do_concurrently():
+    """Test do() function shares one lookup per key among many threads."""
+    flights = singleflight.SingleFlight()
+    calls = []
+    lock = threading.Lock()
+
+    def lookup(key):
+        with lock:
+            calls.append(key)
+        time.sleep(0.2)
+        return {'key': key}
+
+    results = run_concurrently(
+        lambda index: flights.do(index % 2, lookup, index % 2))
+    assert sorted(calls) == [0, 1]
+    assert all(result is results[index % 2]
+               for index, result in enumerate(results))
+    assert len(flights) == 0
+
+
+def test_do_concurrently_error():
+    """Test do() function raises the error of a lookup in every caller."""
+    flights = singleflight.SingleFlight()
+    calls = []
+
+    def lookup():
+        calls.append(None)
+        time.sleep(0.2)
+        raise ConnectionError('lookup failed')
+
+    errors = run_concurrently(lambda index: flights.do('foo', lookup))
+    assert len(calls) == 1
+    assert all(isinstance(error, ConnectionError) for error in errors)
+    assert len(flights) == 0
+
+
+def test_make_key():
+    """Test make_key() function ignores the order of filters and values."""
+    key = singleflight.make_key('ec2.describe_instances', Filters=[
+        {'Name': 'tag:Application', 'Values': ['minecraft', 'mcservers']},
+        {'Name': 'instance-state-name', 'Values': ['running', 'stopped']}
+    ])
+    assert key == singleflight.make_key('ec2.describe_instances', Filters=[
+        {'Values': ['stopped', 'running'], 'Name': 'instance-state-name'},
+        {'Name': 'tag:Application', 'Values': ['mcservers', 'minecraft']}
+    ])
+    assert key != singleflight.make_key('ec2.describe_snapshots', Filters=[
+        {'Name': 'tag:Application', 'Values': ['minecraft', 'mcservers']},
+        {'Name': 'instance-state-name', 'Values': ['running', 'stopped']}
+    ])
+    assert hash(key) is not None
@@ -0,0 +1,97 @@
+"""Unit testing for 'snapshotcatalog' module."""
+
+import datetime
+import pytest
+import snapshotcatalog
+
+
+class FakeTimer:  # pylint: disable=too-few-public-methods
+    """Define a clock that only moves when told to."""
+
+    def __init__(self, now):
+        """Start the clock."""
+        self.now = now
+
+    def __call__(self):
+        """Return the current time."""
+        return self.now
+
+
+def make_snapshot(number, server='foobar', event='nightly'):
+    """Return snapshot data taken on a day of March 2022."""
+    return {
+        'name': 'mcservers-main-{}-{}'.format(server, number),
+        'server': server,
+        'snapshotId': 'snap-{:02d}'.format(number),
+        'event': event,
+        'timestamp': '2022-03-{:02d}T05:00:00'.format(number)
+    }
+
+
+def test_query():
+    """Test query() method."""
+    catalog = snapshotcatalog.SnapshotCatalog(':memory:')
+    catalog.upsert(make_snapshot(number) for number in range(20, 0, -1))
+    catalog.upsert([make_snapshot(21, server='other', event='manual')])
+    assert len(catalog) == 21
+
+    snapshots, token = catalog.query()
+    assert [s['snapshotId'] for s in snapshots][:2] == ['snap-01', 'snap-02']
+    assert snapshots[0] == make_snapshot(1)
+    assert token is None
+
+    snapshots, _ = catalog.query(
+        server='foobar', since='2022-03-05', until='2022-03-08')
+    assert [s['snapshotId'] for s in snapshots] == [
+        'snap-05', 'snap-06', 'snap-07']
+    snapshots, _ = catalog.query(event='manual')
+    assert [s['snapshotId'] for s in snapshots] == ['snap-21']
+
+    pages = []
+    token = None
+    while True:
+        snapshots, token = catalog.query(
+            server='foobar', limit=8, next_token=token)
+        pages.append([s['snapshotId'] for s in snapshots])
+        if token is None:
+            break
+    assert [len(page) for page in pages] == [8, 8, 4]
+    assert sum(pages, []) == ['snap-{:02d}'.format(n) for n in range(1, 21)]
+
+    catalog.delete(['snap-01', 'snap-02'])
+    assert catalog.query(limit=1)[0][0]['snapshotId'] == 'snap-03'
+    with pytest.raises(ValueError):
+        catalog.query(next_token='foobar')
+
+
+def test_get_sync_days():
+    """Test get_sync_days() method."""
+    today = datetime.datetime(2022, 3, 16, 12, 0)
+    timer = FakeTimer(today.timestamp())
+    catalog = snapshotcatalog.SnapshotCatalog(':memory:', timer=timer)
+    assert catalog.get_sync_days() == []
+
+    catalog.replace([make_snapshot(14)])
+    assert catalog.get_sync_days() is None
+
+    timer.now += snapshotcatalog.SYNC_SECONDS
+    assert catalog.get_sync_days() == [
+        '2022-03-14', '2022-03-15', '2022-03-16']
+    catalog.merge([make_snapshot(15)])
+    assert catalog.get_sync_days() is None
+    assert len(catalog) == 2
+
+    # snapshots of the synced days that were not found have been deleted
+    catalog.upsert([make_snapshot(16), make_snapshot(13)])
+    timer.now += snapshotcatalog.SYNC_SECONDS
+    days = catalog.get_sync_days()
+    assert days == ['2022-03-16']
+    catalog.merge([], days)
+    assert [s['snapshotId'] for s in catalog.query()[0]] == [
+        'snap-13', 'snap-14', 'snap-15']
+
+    timer.now += snapshotcatalog.FULL_SYNC_SECONDS
+    assert catalog.get_sync_days() == []
+    catalog.replace([])
+    timer.now += snapshotcatalog.SYNC_SECONDS
+    assert catalog.get_sync_days() == ['2022-03-16']
@@ -0,0 +1,106 @@
+"""Unit testing for 'snapshotreaper' module."""
+
+import datetime
+import boto3
+import botocore.stub
+import moto
+import awsclients
+import mcsnapshots
+import snapshotreaper
+
+NOW = datetime.datetime(2022, 3, 16, 12, 0)
+
+
+def make_snapshot(snapshot_id, days_ago, server='foobar', event='nightly'):
+    """Return snapshot data taken a number of days before NOW."""
+    taken = NOW - datetime.timedelta(days=days_ago)
+    return {
+        'name': 'mcservers-main-{}-{}'.format(server, taken.timestamp()),
+        'server': server,
+        'snapshotId': snapshot_id,
+        'event': event,
+        'timestamp': taken.isoformat()
+    }
+
+
+def test_plan():
+    """Test plan() function."""
+    snapshots = [make_snapshot('snap-{}'.format(day), day)
+                 for day in range(0, 100, 2)]
+    snapshots.append(make_snapshot('snap-other', 99, event='manual'))
+    snapshots.append(dict(make_snapshot('snap-bad', 99), timestamp=''))
+
+    policies = [{'event': 'nightly', 'keepLast': 3, 'keepWeekly': 8}]
+    checked, expired = snapshotreaper.plan(iter(snapshots), policies, NOW)
+    assert checked == 52
+    kept = {s['snapshotId'] for s in snapshots} \
+        - {s['snapshotId'] for s in expired}
+
+    # last 3, then the newest of each of the 8 weeks (Monday 2022-01-24 on)
+    assert kept == {
+        'snap-0', 'snap-2', 'snap-4', 'snap-10', 'snap-18', 'snap-24',
+        'snap-32', 'snap-38', 'snap-46', 'snap-other', 'snap-bad'
+    }
+    assert expired[0]['reason'].startswith('outside retention policy')
+
+
+def test_plan_keeps_newest():
+    """Test plan() function always keeps the newest snapshot of a group."""
+    snapshots = [make_snapshot('snap-old', 100), make_snapshot('snap-new', 90)]
+    _, expired = snapshotreaper.plan(snapshots, [{'keepDaily': 7}], NOW)
+    assert [s['snapshotId'] for s in expired] == ['snap-old']
+
+
+@moto.mock_ec2
+def test_prune():
+    """Test prune() function."""
+    ec2 = boto3.resource('ec2')
+    volume = ec2.create_volume(AvailabilityZone='', Size=4)
+    for _ in range(4):
+        mcsnapshots.create_snapshot(volume.id, 'nightly', 'foobar', 'pytest')
+    snapshots = mcsnapshots.gather('foobar')
+    newest = max(snapshots, key=lambda snapshot: snapshot['timestamp'])
+
+    report = snapshotreaper.handler({}, {})
+    assert report['checked'] == 4
+    assert report['expired'] == []
+    policies = [{'keepLast': 1}]
+
+    report = snapshotreaper.prune(snapshots, policies, True)
+    assert len(report['expired']) == 3
+    assert report['deleted'] == []
+    assert len(mcsnapshots.gather('foobar')) == 4
+
+    report = snapshotreaper.prune(snapshots, policies, max_deletes=2)
+    assert report['checked'] == 4
+    assert report['deferred'] == 1
+    assert len(report['deleted']) == 2
+    assert len(mcsnapshots.gather('foobar')) == 2
+
+    report = snapshotreaper.handler({'policies': policies}, {})
+    assert len(report['deleted']) == 1
+    assert mcsnapshots.gather('foobar') == [newest]
+
+
+def test_prune_oldest_first():
+    """Test prune() function defers the newest expired snapshots."""
+    snapshots = [make_snapshot('snap-{}'.format(day), day)
+                 for day in (3, 10, 1, 7, 0)]
+    report = snapshotreaper.prune(snapshots, [{'keepLast': 1}], True,
+                                  NOW, max_deletes=2)
+    assert [s['snapshotId'] for s in report['expired']] == \
+        ['snap-10', 'snap-7']
+    assert report['deferred'] == 2
+
+
+def test_delete_snapshots():
+    """Test delete_snapshots() function reports partial failures."""
+    client = boto3.client('ec2', region_name='us-east-1')
+    awsclients.set_client('ec2', client)
+    with botocore.stub.Stubber(client) as stubber:
+        stubber.add_client_error('delete_snapshot', 'InvalidSnapshot.InUse')
+        errors = mcsnapshots.delete_snapshots(['snap-1'])
+        assert list(errors) == ['snap-1']
+        assert 'InvalidSnapshot.InUse' in errors['snap-1']
+        assert mcsnapshots.delete_snapshots([]) == {}
+        stubber.assert_no_pending_responses()
@@ -0,0 +1,65 @@
+"""Unit testing for 'ttlcache' module."""
+
+import ttlcache
+
+
+class FakeTimer:
+    """Define a clock that only moves when told to."""
+
+    def __init__(self):
+        """Start the clock at zero."""
+        self.now = 0.0
+
+    def __call__(self):
+        """Return the current time."""
+        return self.now
+
+
+def test_get_put():
+    """Test get() and put() functions."""
+    timer = FakeTimer()
+    cache = ttlcache.TTLCache(ttl=10, maxsize=4, timer=timer)
+    assert cache.get('foo') is None
+    assert cache.get('foo', {}) == {}
+
+    cache.put('foo', 'bar')
+    timer.now = 9.9
+    assert cache.get('foo') == 'bar'
+    timer.now = 10.0
+    assert cache.get('foo') is None
+    assert len(cache) == 0
+
+
+def test_lru_eviction():
+    """Test least recently used entries are evicted first."""
+    cache = ttlcache.TTLCache(ttl=10, maxsize=2, timer=FakeTimer())
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+
+def test_disabled():
+    """Test a cache with no time-to-live keeps nothing."""
+    cache = ttlcache.TTLCache(ttl=0, maxsize=2)
+    cache.put('a', 1)
+    assert cache.get('a') is None
+
+
+def test_invalidate():
+    """Test invalidate(), clear() and clear_all() functions."""
+    cache = ttlcache.TTLCache(ttl=10, maxsize=4)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.invalidate('a')
+    cache.invalidate('z')
+    assert cache.get('a') is None
+    assert cache.get('b') == 2
+    cache.clear()
+    assert cache.get('b') is None
+    cache.put('c', 3)
+    ttlcache.clear_all()
+    assert cache.get('c') is None